@@ -0,0 +1,112 @@
+"""
+Lead extraction over large transcript backfills
+
+Seeds a SQLite database with many conversations (a fraction of guests leave
+an email or phone number, some of them already captured through the lead
+form), runs the backfill, then runs it again to show deduplication makes it
+idempotent. Also times the per-message cost /chat pays to queue messages.
+
+    python benchmarks/bench_lead_backfill.py --conversations 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+GUEST_LINES = [
+    "Which wineries are open late on Saturday?",
+    "We'd love a dinner reservation near downtown.",
+    "Is the hot air balloon ride worth it?",
+    "Can you recommend a spa for two?",
+    "How do we get to Calistoga without a car?",
+]
+
+
+def contact_line(i: int) -> str:
+    return random.choice([
+        f"My name is Guest {chr(65 + i % 26)}. You can reach me at guest{i}@example.com",
+        f"Sure, my email is Guest{i}@Example.com",
+        f"I'm Sam, call me at (707) 555-{i % 10000:04d}",
+        f"this is Alex, text 415.555.{i % 10000:04d} or email alex{i}@example.org",
+    ])
+
+
+def seed(database_url: str, conversations: int, businesses: int, contact_rate: float, form_rate: float):
+    os.environ["DATABASE_URL"] = database_url
+    from database import engine, init_db, Business, Conversation, Lead
+
+    init_db()
+    now = datetime.utcnow()
+    random.seed(5)
+    with engine.begin() as conn:
+        conn.execute(Business.__table__.insert(), [
+            {"id": b, "name": f"Inn {b}", "api_key": f"nc_backfill_{b}", "is_active": True} for b in range(1, businesses + 1)
+        ])
+        form_leads = []
+        for start in range(0, conversations, 10000):
+            rows = []
+            for i in range(start, min(start + 10000, conversations)):
+                business_id = 1 + i % businesses
+                messages = []
+                for line in random.sample(GUEST_LINES, 2):
+                    messages += [{"role": "user", "content": line}, {"role": "assistant", "content": "Happy to help with that!"}]
+                if random.random() < contact_rate:
+                    line = contact_line(i)
+                    messages.append({"role": "user", "content": line})
+                    if f"guest{i}@example.com" in line.lower() and random.random() < form_rate:
+                        form_leads.append({"business_id": business_id, "email": f"guest{i}@example.com", "created_at": now})
+                rows.append({"business_id": business_id, "session_id": f"bf_{i}", "started_at": now, "last_message_at": now,
+                             "message_count": len(messages), "messages": messages})
+            conn.execute(Conversation.__table__.insert(), rows)
+        if form_leads:
+            conn.execute(Lead.__table__.insert(), form_leads)
+    return len(form_leads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=100000)
+    parser.add_argument("--businesses", type=int, default=20)
+    parser.add_argument("--contact-rate", type=float, default=0.15, help="Share of conversations where the guest leaves contact details")
+    parser.add_argument("--form-rate", type=float, default=0.3, help="Share of those already captured through the lead form")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='napa_leads_'), 'leads.db')}"
+    print(f"Seeding {args.conversations} conversations...")
+    form_leads = seed(database_url, args.conversations, args.businesses, args.contact_rate, args.form_rate)
+
+    from leads import LeadExtractor, backfill
+
+    print(f"\n{'run':<14}{'conversations':>14}{'leads created':>15}{'seconds':>9}{'conv/s':>10}")
+    for label in ("backfill", "second run"):
+        started = time.perf_counter()
+        result = backfill(batch_size=args.batch_size)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<14}{result['conversations_scanned']:>14}{result['leads_created']:>15}{elapsed:>9.1f}{result['conversations_scanned'] / elapsed:>10,.0f}")
+    print(f"({form_leads} guests were already captured through the lead form)")
+
+    extractor = LeadExtractor(buffer_size=1000)
+    history = [GUEST_LINES[0], GUEST_LINES[1]]
+    samples = [history + [line] for line in GUEST_LINES * 2000]
+    started = time.perf_counter()
+    for messages in samples:
+        extractor.submit(1, 1, messages)
+    plain_ns = 1e9 * (time.perf_counter() - started) / len(samples)
+    samples = [history + [contact_line(i)] for i in range(10000)]
+    started = time.perf_counter()
+    for messages in samples:
+        extractor.submit(1, 1, messages)
+    contact_ns = 1e9 * (time.perf_counter() - started) / len(samples)
+    print(f"\n/chat cost of LeadExtractor.submit(): {plain_ns:.0f} ns (no contact details), {contact_ns:.0f} ns (queued)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Lead export serialization: ORM objects + jsonable_encoder vs row tuples + orjson
+
+Seeds one business with many leads and times GET /admin/businesses/{id}/leads
+both the way it used to work (full Lead objects, a dict per row, FastAPI's
+jsonable_encoder and JSONResponse) and the way it works now (with_entities
+row tuples rendered by ORJSONResponse), split into query and serialization,
+then requests the endpoint itself.
+
+    python benchmarks/bench_lead_export.py --leads 10000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='napa_export_'), 'export.db')}"
+os.environ.setdefault("ADMIN_API_KEY", "bench-admin")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from database import engine, init_db, SessionLocal, Business, Lead
+from responses import ORJSONResponse
+from main import app
+
+INTERESTS = ["wine tasting", "spa", "dinner reservation", "balloon ride", "transportation"]
+
+
+def seed(leads: int):
+    init_db()
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(Business.__table__.insert(), [{"id": 1, "name": "Export Inn", "api_key": "nc_export", "is_active": True}])
+        conn.execute(Lead.__table__.insert(), [
+            {"business_id": 1, "name": f"Guest {i}", "email": f"guest{i}@example.com", "phone": f"(707) 555-{i % 10000:04d}",
+             "interest": INTERESTS[i % len(INTERESTS)], "notes": "Asked about weekend availability for two", "created_at": now - timedelta(minutes=i)}
+            for i in range(leads)
+        ])
+
+
+def before(db):
+    leads = db.query(Lead).filter(Lead.business_id == 1).order_by(Lead.created_at.desc()).all()
+    queried = time.perf_counter()
+    content = [
+        {"id": l.id, "name": l.name, "email": l.email, "phone": l.phone, "interest": l.interest, "notes": l.notes, "created_at": l.created_at}
+        for l in leads
+    ]
+    return queried, JSONResponse(jsonable_encoder(content)).body
+
+
+def after(db):
+    rows = db.query(Lead).with_entities(
+        Lead.id, Lead.name, Lead.email, Lead.phone, Lead.interest, Lead.notes, Lead.created_at
+    ).filter(Lead.business_id == 1).order_by(Lead.created_at.desc()).all()
+    queried = time.perf_counter()
+    return queried, ORJSONResponse([row._asdict() for row in rows]).body
+
+
+def timed(fn, repeat):
+    query = serialize = 0.0
+    for _ in range(repeat):
+        db = SessionLocal()
+        started = time.perf_counter()
+        queried, body = fn(db)
+        query += queried - started
+        serialize += time.perf_counter() - queried
+        db.close()
+    return 1000 * query / repeat, 1000 * serialize / repeat, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leads", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seed(args.leads)
+    print(f"{args.leads} leads\n{'':<34}{'query ms':>10}{'serialize ms':>14}{'total ms':>10}{'bytes':>10}")
+    results = {}
+    for label, fn in (("before: ORM + jsonable_encoder", before), ("after: with_entities + orjson", after)):
+        query, serialize, body = timed(fn, args.repeat)
+        results[label] = body
+        print(f"{label:<34}{query:>10.1f}{serialize:>14.1f}{query + serialize:>10.1f}{len(body):>10}")
+    old, new = results.values()
+    print(f"same records: {json.loads(old) == json.loads(new)}")
+
+    client = TestClient(app)
+    headers = {"X-Admin-Key": os.environ["ADMIN_API_KEY"]}
+    client.get("/admin/businesses/1/leads", headers=headers)
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        response = client.get("/admin/businesses/1/leads", headers=headers)
+    print(f"GET /admin/businesses/1/leads: {1000 * (time.perf_counter() - started) / args.repeat:.1f} ms, {len(response.json())} leads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Resilient LLM client benchmark
+
+Sends a batch of chats through the bare Anthropic client and through
+ResilientLLMClient while the fake Anthropic API injects overloaded errors and
+slow responses. Reports success rate, latency percentiles and attempts per call.
+
+    python benchmarks/bench_llm_client.py --error-rate 0.2 --slow-rate 0.05 --hedge-after 1.5
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from anthropic import AsyncAnthropic
+
+from benchmarks.bench_scheduler import percentile
+from benchmarks.fake_anthropic import start_fake_anthropic
+from llm import ResilientLLMClient
+
+
+def report(label, latencies, failures, attempts=None):
+    total = len(latencies) + failures
+    print(f"\n{label}")
+    print(f"  success  {len(latencies)}/{total} ({100 * len(latencies) / total:.1f}%)")
+    if latencies:
+        print(
+            f"  latency  p50={1000 * statistics.median(latencies):.0f}ms "
+            f"p95={1000 * percentile(latencies, 95):.0f}ms p99={1000 * percentile(latencies, 99):.0f}ms"
+        )
+    if attempts:
+        print(f"  attempts per call  {dict(sorted(Counter(attempts).items()))}")
+
+
+async def main(args):
+    server, base_url = start_fake_anthropic(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.latency_ms / 5,
+        error_rate=args.error_rate,
+        slow_rate=args.slow_rate,
+        slow_ms=args.slow_ms
+    )
+    client = AsyncAnthropic(api_key="test", base_url=base_url, max_retries=0)
+    request = dict(max_tokens=256, messages=[{"role": "user", "content": "What time does Oxbow open?"}])
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bare():
+        async with semaphore:
+            return await client.messages.create(model="claude-sonnet-4-20250514", **request)
+
+    resilient_client = ResilientLLMClient(
+        client,
+        fallback_model="claude-3-5-haiku-20241022",
+        max_retries=args.max_retries,
+        deadline=args.deadline,
+        attempt_timeout=args.attempt_timeout,
+        hedge_after=args.hedge_after
+    )
+    attempts = []
+
+    async def resilient():
+        async with semaphore:
+            result = await resilient_client.create(model="claude-sonnet-4-20250514", **request)
+            attempts.append(len(result.attempts))
+            return result
+
+    for label, call in (("Bare client", bare), ("ResilientLLMClient", resilient)):
+        latencies, failures = [], 0
+
+        async def one():
+            nonlocal failures
+            start = time.perf_counter()
+            try:
+                await call()
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                failures += 1
+
+        await asyncio.gather(*[one() for _ in range(args.requests)])
+        report(label, latencies, failures, attempts if call is resilient else None)
+
+    print(f"\nClient stats: {resilient_client.stats()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-ms", type=float, default=4000)
+    parser.add_argument("--max-retries", type=int, default=2)
+    parser.add_argument("--deadline", type=float, default=15)
+    parser.add_argument("--attempt-timeout", type=float, default=10)
+    parser.add_argument("--hedge-after", type=float, default=1.0)
+    logging.getLogger("llm").setLevel(logging.ERROR)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,95 @@
+"""
+Report generation for every tenant: per-business builds vs one batched pass vs cache
+
+Seeds many businesses with a month of analytics and some leads, then times
+building and rendering weekly report emails for all of them three ways:
+one build per business (two queries each), one batched build (two queries
+total), and again with every report already cached.
+
+    python benchmarks/bench_reports.py --businesses 500
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+
+def seed(database_url: str, businesses: int, leads_per_business: int):
+    os.environ["DATABASE_URL"] = database_url
+    from database import engine, init_db, Analytics, Business, Lead
+    from sketches import HyperLogLog
+
+    init_db()
+    today = datetime.combine(date.today(), datetime.min.time())
+    sketch = HyperLogLog()
+    for i in range(40):
+        sketch.add(f"visitor-{i}")
+    with engine.begin() as conn:
+        conn.execute(Business.__table__.insert(), [
+            {"id": b, "name": f"Inn {b}", "api_key": f"nc_report_{b}", "contact_email": f"gm{b}@example.com", "is_active": True}
+            for b in range(1, businesses + 1)
+        ])
+        conn.execute(Analytics.__table__.insert(), [
+            {"business_id": b, "date": today - timedelta(days=d), "total_conversations": 12, "total_messages": 40,
+             "unique_visitors": 40, "leads_captured": 1, "visitor_sketch": sketch.to_bytes(),
+             "top_topics": [{"topic": "wineries", "count": 9}, {"topic": "dining", "count": 5}]}
+            for b in range(1, businesses + 1) for d in range(30)
+        ])
+        conn.execute(Lead.__table__.insert(), [
+            {"business_id": b, "name": f"Guest {i}", "email": f"guest{b}_{i}@example.com", "interest": "wineries",
+             "created_at": today - timedelta(days=i % 7)}
+            for b in range(1, businesses + 1) for i in range(leads_per_business)
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--businesses", type=int, default=300)
+    parser.add_argument("--leads", type=int, default=10, help="New leads per business this week")
+    args = parser.parse_args()
+
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='napa_reports_'), 'reports.db')}"
+    seed(database_url, args.businesses, args.leads)
+
+    import reports
+    from database import SessionLocal, Business
+
+    db = SessionLocal()
+    businesses = db.query(Business).all()
+
+    def render_all(build):
+        started = time.perf_counter()
+        built = build()
+        for business in businesses:
+            reports.report_email(business.id, "weekly", built[business.id])
+        return time.perf_counter() - started
+
+    def per_business():
+        reports._cache.clear()
+        return {b.id: reports.get_report(db, b, "weekly") for b in businesses}
+
+    def batched():
+        reports._cache.clear()
+        return reports.get_reports(db, businesses, "weekly")
+
+    timings = [
+        ("one build per business", render_all(per_business), 2 * len(businesses)),
+        ("one batched pass", render_all(batched), 2),
+        ("cached", render_all(lambda: reports.get_reports(db, businesses, "weekly")), 0),
+    ]
+    db.close()
+
+    print(f"Weekly report emails for {len(businesses)} businesses\n")
+    print(f"{'strategy':<26}{'queries':>9}{'total ms':>10}{'ms/business':>13}")
+    for label, seconds, queries in timings:
+        print(f"{label:<26}{queries:>9}{1000 * seconds:>10.0f}{1000 * seconds / len(businesses):>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+LLM scheduler fairness benchmark
+
+A "hot" tenant floods the LLM queue while a "quiet" tenant sends a handful of
+chats. Compares guest-visible latency for both tenants with a plain FIFO
+semaphore versus the weighted fair LLMScheduler, against the fake Anthropic API.
+
+    python benchmarks/bench_scheduler.py --latency-ms 300 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from anthropic import Anthropic
+from starlette.concurrency import run_in_threadpool
+
+from benchmarks.fake_anthropic import start_fake_anthropic
+from scheduler import LLMScheduler, LLMQueueTimeout, LLMQueueFull
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+async def run_mix(call, hot_requests: int, quiet_requests: int):
+    latencies = {"hot": [], "quiet": []}
+    shed = {"hot": 0, "quiet": 0}
+
+    async def one(tenant):
+        start = time.perf_counter()
+        try:
+            await call(tenant)
+            latencies[tenant].append(time.perf_counter() - start)
+        except (LLMQueueTimeout, LLMQueueFull):
+            shed[tenant] += 1
+
+    hot = [asyncio.create_task(one("hot")) for _ in range(hot_requests)]
+    await asyncio.sleep(0.05)  # Quiet tenant arrives just after the spike
+    quiet = [asyncio.create_task(one("quiet")) for _ in range(quiet_requests)]
+    await asyncio.gather(*hot, *quiet)
+    return latencies, shed
+
+
+def report(label, latencies, shed):
+    print(f"\n{label}")
+    for tenant, values in latencies.items():
+        print(
+            f"  {tenant:<6} n={len(values):<4} shed={shed[tenant]:<3} "
+            f"p50={1000 * statistics.median(values) if values else 0:7.0f}ms "
+            f"p95={1000 * percentile(values, 95):7.0f}ms"
+        )
+
+
+async def main(args):
+    server, base_url = start_fake_anthropic(latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 5)
+    client = Anthropic(api_key="test", base_url=base_url, max_retries=0)
+    request = dict(model="claude-sonnet-4-20250514", max_tokens=256, messages=[{"role": "user", "content": "Hi"}])
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def fifo_call(tenant):
+        async with semaphore:
+            return await run_in_threadpool(client.messages.create, **request)
+
+    latencies, shed = await run_mix(fifo_call, args.hot, args.quiet)
+    report(f"FIFO semaphore (cap {args.concurrency})", latencies, shed)
+
+    scheduler = LLMScheduler(max_concurrency=args.concurrency, queue_timeout=args.queue_timeout)
+
+    async def fair_call(tenant):
+        return await scheduler.run(tenant, client.messages.create, **request)
+
+    latencies, shed = await run_mix(fair_call, args.hot, args.quiet)
+    report(f"LLMScheduler (cap {args.concurrency}, deadline {args.queue_timeout}s)", latencies, shed)
+    print(f"\nScheduler stats: {scheduler.stats()}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--hot", type=int, default=40)
+    parser.add_argument("--quiet", type=int, default=4)
+    parser.add_argument("--queue-timeout", type=float, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,94 @@
+"""
+Chat payload serialization CPU and bytes on the wire
+
+Builds ChatResponse payloads for conversations of growing length and
+compares serializers (FastAPI's default encoder + json.dumps, orjson, and
+the Pydantic response_model path /chat uses) and encodings (identity, gzip,
+Brotli if installed), with estimated transfer times on mobile links.
+
+    python benchmarks/bench_serialization.py --turns 5 20 50
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("DATABASE_URL", "sqlite://")  # Importing main must not create a database file
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import compression
+from main import ChatResponse
+from responses import dumps as orjson_dumps
+
+WORDS = (
+    "winery tasting cabernet reservation downtown Napa Yountville St Helena Calistoga balloon sunrise spa massage "
+    "dinner chef patio vineyard tour shuttle Uber pinot chardonnay picnic Oxbow market hotel check-in lobby parking "
+    "recommend open hours weekend family dog friendly sparkling caves Castello Stag's Leap Silverado Trail map link"
+).split()
+LINKS = ["https://www.google.com/maps/search/{}+Napa+CA".format(w) for w in ("Oxbow+Public+Market", "Bouchon+Bakery", "Castello+di+Amorosa")]
+MOBILE_LINKS = {"3G (1.6 Mbps)": 1.6e6, "4G (12 Mbps)": 12e6}
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def chat_payload(turns: int, rng) -> dict:
+    history = []
+    for _ in range(turns):
+        history.append({"role": "user", "content": sentence(rng, rng.randint(6, 20))})
+        reply = " ".join(sentence(rng, rng.randint(8, 18)) for _ in range(rng.randint(3, 7)))
+        history.append({"role": "assistant", "content": f"{reply} [Directions]({rng.choice(LINKS)})"})
+    return {"response": history[-1]["content"], "conversation_history": history, "session_id": "s_" + "x" * 22}
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, 1e6 * (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    adapter = TypeAdapter(ChatResponse)
+    encodings = ["gzip"] + (["br"] if compression.brotli is not None else [])
+    if compression.brotli is None:
+        print("(brotli not installed: gzip only)\n")
+
+    for turns in args.turns:
+        payload = chat_payload(turns, rng)
+        model = ChatResponse(**payload)
+        body, stdlib_us = timed(lambda: json.dumps(jsonable_encoder(model), ensure_ascii=False, separators=(",", ":")).encode(), args.repeat)
+        _, orjson_us = timed(lambda: orjson_dumps(jsonable_encoder(model)), args.repeat)
+        _, orjson_raw_us = timed(lambda: orjson_dumps(payload), args.repeat)
+        _, pydantic_us = timed(lambda: adapter.dump_json(model), args.repeat)
+
+        print(f"{turns} turns ({len(payload['conversation_history'])} messages)")
+        print(f"  serialize  jsonable_encoder+json {stdlib_us:6.0f} us   jsonable_encoder+orjson {orjson_us:6.0f} us   "
+              f"orjson on the dict {orjson_raw_us:4.0f} us   pydantic dump_json {pydantic_us:4.0f} us")
+        print(f"  {'encoding':<10}{'bytes':>9}{'compress us':>13}" + "".join(f"{name:>16}" for name in MOBILE_LINKS))
+        rows = [("identity", body, 0.0)]
+        for encoding in encodings:
+            compressed, us = timed(lambda: compression.compress(body, encoding), max(1, args.repeat // 4))
+            rows.append((encoding, compressed, us))
+        for encoding, data, us in rows:
+            transfer = "".join(f"{1000 * 8 * len(data) / bps:>13.1f} ms" for bps in MOBILE_LINKS.values())
+            print(f"  {encoding:<10}{len(data):>9}{us:>13.0f}{transfer}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
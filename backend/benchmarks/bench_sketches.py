@@ -0,0 +1,51 @@
+"""
+HyperLogLog unique-visitor accuracy and merge cost
+
+Simulates daily visitors (with repeat visits across days), builds one stored
+sketch per day as the app does, then compares merged weekly/monthly/quarterly
+estimates with the exact distinct count and times the merge.
+
+    python benchmarks/bench_sketches.py --daily-visitors 2000 --population 40000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+from sketches import HyperLogLog, visitor_fingerprint
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--daily-visitors", type=int, default=2000)
+    parser.add_argument("--population", type=int, default=40000, help="Distinct visitors the daily ones are drawn from")
+    parser.add_argument("--days", type=int, default=90)
+    args = parser.parse_args()
+
+    random.seed(7)
+    stored, exact = [], []
+    for _ in range(args.days):
+        visitors = {random.randrange(args.population) for _ in range(args.daily_visitors)}
+        sketch = HyperLogLog()
+        for visitor in visitors:
+            sketch.add(visitor_fingerprint(f"10.{visitor // 65536}.{visitor // 256 % 256}.{visitor % 256}", "Mozilla/5.0"))
+        stored.append(sketch.to_bytes())
+        exact.append(visitors)
+
+    print(f"Sketch size: {len(stored[0])} bytes stored (compressed), {HyperLogLog().size} registers\n")
+    print(f"{'period':<10}{'exact':>9}{'estimate':>10}{'error':>9}{'merge ms':>10}")
+    for days in (1, 7, 30, args.days):
+        started = time.perf_counter()
+        estimate = HyperLogLog.union(stored[-days:]).count()
+        elapsed = 1000 * (time.perf_counter() - started)
+        truth = len(set().union(*exact[-days:]))
+        print(f"{days:>3} days  {truth:>9}{estimate:>10}{100 * (estimate - truth) / truth:>8.1f}%{elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
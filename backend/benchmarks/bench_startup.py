@@ -0,0 +1,113 @@
+"""
+Cold start benchmark
+
+Measures what a guest sees when a sleeping dyno wakes up:
+
+- import time of main.py in a fresh interpreter
+- time from launching uvicorn to the first successful /widget/config
+- time from launching uvicorn to the first successful /chat (fake Anthropic API)
+
+Boots are repeated against an already-migrated database (the normal case)
+and once against an empty one (first deploy).
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.fake_anthropic import start_fake_anthropic
+from benchmarks.loadtest import ADMIN_KEY, free_port, start_app
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def measure_import(env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env={**os.environ, **env},
+        capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def first_success(request, timeout: float = 60) -> float:
+    """Poll until request() returns 200; returns the time it happened (perf_counter)"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if request().status_code == 200:
+                return time.perf_counter()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError("App never answered successfully")
+
+
+def measure_boot(env: dict, api_key: str = None) -> dict:
+    """Launch uvicorn and time the first successful widget config and chat"""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    app = start_app(port, env)
+    try:
+        if api_key is None:
+            ready = first_success(lambda: httpx.get(f"{base_url}/health", timeout=1))
+            response = httpx.post(f"{base_url}/admin/businesses", headers={"X-Admin-Key": ADMIN_KEY}, json={"name": "Startup Inn"})
+            api_key = response.json()["api_key"]
+            return {"api_key": api_key, "health_s": ready - started}
+
+        widget = first_success(lambda: httpx.get(f"{base_url}/widget/config", params={"api_key": api_key}, timeout=1))
+        chat = first_success(lambda: httpx.post(
+            f"{base_url}/chat", headers={"X-API-Key": api_key},
+            json={"message": "What time does Oxbow open?", "session_id": f"startup_{port}"}, timeout=30
+        ))
+        return {"widget_s": widget - started, "chat_s": chat - started}
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    fake_server, llm_url = start_fake_anthropic(latency_ms=args.llm_latency_ms)
+    db_dir = tempfile.mkdtemp(prefix="napa_startup_")
+    env = {
+        "ANTHROPIC_BASE_URL": llm_url,
+        "ANTHROPIC_API_KEY": "test",
+        "ADMIN_API_KEY": ADMIN_KEY,
+        "DATABASE_URL": f"sqlite:///{os.path.join(db_dir, 'startup.db')}",
+    }
+
+    try:
+        imports = [measure_import(env) for _ in range(args.runs)]
+        first_boot = measure_boot(env)  # Empty database: creates the schema
+        boots = [measure_boot(env, first_boot["api_key"]) for _ in range(args.runs)]
+    finally:
+        fake_server.shutdown()
+
+    def row(label, values):
+        print(f"{label:<40}{1000 * statistics.median(values):>10.0f}{1000 * max(values):>10.0f}")
+
+    print(f"\n{'':<40}{'median ms':>10}{'max ms':>10}")
+    row("import main", imports)
+    row("launch -> /health (empty database)", [first_boot["health_s"]])
+    row("launch -> first /widget/config", [b["widget_s"] for b in boots])
+    row("launch -> first /chat", [b["chat_s"] for b in boots])
+
+
+if __name__ == "__main__":
+    main()
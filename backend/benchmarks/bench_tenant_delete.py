@@ -0,0 +1,130 @@
+"""
+Chat latency for other tenants while a large tenant is deleted
+
+Seeds one very large business (conversations, leads, analytics, usage rows),
+measures /chat latency for other businesses, then deletes the large business
+and measures again while the background deletion runs, polling its status
+endpoint until it completes.
+
+    python benchmarks/bench_tenant_delete.py --conversations 100000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.bench_scheduler import percentile
+from benchmarks.fake_anthropic import start_fake_anthropic
+from benchmarks.loadtest import ADMIN_KEY, LoadGenerator, free_port, seed_businesses, start_app, wait_for_app
+
+
+def seed_large_tenant(database_url: str, business_id: int, conversations: int):
+    """Bulk-insert a large tenant's rows straight into the database"""
+    os.environ["DATABASE_URL"] = database_url
+    from database import engine, Analytics, Conversation, Lead, MessageUsage
+
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for start in range(0, conversations, 10000):
+            count = min(10000, conversations - start)
+            conn.execute(Conversation.__table__.insert(), [
+                {"business_id": business_id, "session_id": f"big_{start + i}", "started_at": now, "last_message_at": now, "message_count": 4,
+                 "messages": [{"role": "user", "content": "Where should we taste Cabernet?"}, {"role": "assistant", "content": "Try Stag's Leap."}] * 2}
+                for i in range(count)
+            ])
+            conn.execute(MessageUsage.__table__.insert(), [
+                {"business_id": business_id, "created_at": now, "model": "claude-3-5-haiku-20241022", "input_tokens": 900, "output_tokens": 120}
+                for _ in range(count)
+            ])
+        conn.execute(Lead.__table__.insert(), [
+            {"business_id": business_id, "email": f"guest{i}@example.com", "created_at": now} for i in range(conversations // 20)
+        ])
+        conn.execute(Analytics.__table__.insert(), [
+            {"business_id": business_id, "date": now - timedelta(days=d), "total_messages": 100} for d in range(365)
+        ])
+
+
+def chat_latencies(generator: LoadGenerator, concurrency: int, duration: float) -> list:
+    generator.latencies.clear()
+    generator.errors.clear()
+    asyncio.run(generator.run(concurrency, duration))
+    return generator.latencies["chat"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=50000)
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of chat load before the delete")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    fake_server, llm_url = start_fake_anthropic(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_latency_ms / 5)
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='napa_delete_'), 'delete.db')}"
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    app = start_app(port, {
+        "ANTHROPIC_BASE_URL": llm_url,
+        "ANTHROPIC_API_KEY": "test",
+        "ADMIN_API_KEY": ADMIN_KEY,
+        "DATABASE_URL": database_url,
+        "METRICS_TENANT_LABELS": "false",
+    })
+    try:
+        wait_for_app(base_url)
+        businesses = seed_businesses(base_url, 6)
+        big_id = businesses[0][0]
+        print(f"Seeding {args.conversations} conversations for business {big_id}...")
+        seed_large_tenant(database_url, big_id, args.conversations)
+
+        generator = LoadGenerator(base_url, businesses[1:], {"chat": 1})
+        before = chat_latencies(generator, args.concurrency, args.duration)
+
+        admin = {"X-Admin-Key": ADMIN_KEY}
+        started = time.perf_counter()
+        response = httpx.delete(f"{base_url}/admin/businesses/{big_id}", headers=admin, timeout=30)
+        delete_response_ms = 1000 * (time.perf_counter() - started)
+        response.raise_for_status()
+
+        # Chat load runs in a thread while this one polls the deletion status
+        during = []
+        done = threading.Event()
+        status = {}
+
+        def poll():
+            while True:
+                status.update(httpx.get(f"{base_url}/admin/businesses/{big_id}/deletion", headers=admin).json())
+                if status.get("status") in ("completed", "failed"):
+                    done.set()
+                    return
+                time.sleep(0.2)
+
+        poller = threading.Thread(target=poll, daemon=True)
+        poller.start()
+        while not done.is_set():
+            during += chat_latencies(generator, args.concurrency, 2)
+        deletion_seconds = time.perf_counter() - started
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+        fake_server.shutdown()
+
+    print(f"\nDELETE responded in {delete_response_ms:.0f} ms; background deletion {status.get('status')} after {deletion_seconds:.1f}s")
+    print(f"Rows deleted: {status.get('deleted')}")
+    print(f"\n{'chat latency (other tenants)':<32}{'reqs':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for label, values in (("before delete", before), ("during delete", during)):
+        print(f"{label:<32}{len(values):>7}{1000 * percentile(values, 50):>9.0f}{1000 * percentile(values, 95):>9.0f}{1000 * percentile(values, 99):>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
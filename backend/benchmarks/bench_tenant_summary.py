@@ -0,0 +1,80 @@
+"""
+All-tenants overview: per-tenant analytics scans vs the tenant summary table
+
+For growing tenant counts, seeds 30 days of analytics per business and times
+(a) what the admin view did before, one 30-day Analytics query per business,
+(b) refreshing tenant_summaries (one grouped query, run in the background),
+and (c) loading a page of the overview from the summary table.
+
+    python benchmarks/bench_tenant_summary.py --tenants 100 1000 5000
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+
+def run_one(tenants: int):
+    """Seed and time one tenant count (in its own process so each gets a fresh engine)"""
+    from database import engine, init_db, SessionLocal, Analytics, Business, TenantSummary
+    import reports
+
+    init_db()
+    today = datetime.combine(date.today(), datetime.min.time())
+    with engine.begin() as conn:
+        conn.execute(Business.__table__.insert(), [
+            {"id": b, "name": f"Inn {b}", "api_key": f"nc_summary_{b}", "is_active": True} for b in range(1, tenants + 1)
+        ])
+        conn.execute(Analytics.__table__.insert(), [
+            {"business_id": b, "date": today - timedelta(days=d), "total_conversations": b % 7, "total_messages": 3 * (b % 7),
+             "leads_captured": b % 2, "input_tokens": 2000 * (b % 7), "output_tokens": 150 * (b % 7), "llm_cost_usd": 0.002 * (b % 7)}
+            for b in range(1, tenants + 1) for d in range(30)
+        ])
+
+    db = SessionLocal()
+    start = today - timedelta(days=30)
+    started = time.perf_counter()
+    for (business_id,) in db.query(Business.id).all():
+        rows = db.query(Analytics).filter(Analytics.business_id == business_id, Analytics.date >= start).all()
+        sum(a.total_messages for a in rows)
+    per_tenant = time.perf_counter() - started
+
+    started = time.perf_counter()
+    reports.refresh_tenant_summaries()
+    refresh = time.perf_counter() - started
+
+    started = time.perf_counter()
+    page = db.query(TenantSummary, Business.name).join(Business, Business.id == TenantSummary.business_id).order_by(
+        TenantSummary.messages_30d.desc(), TenantSummary.business_id
+    ).limit(100).all()
+    reports.summary_totals()
+    overview = time.perf_counter() - started
+    db.close()
+    print(f"{tenants:>8}{1000 * per_tenant:>18.0f}{1000 * refresh:>14.0f}{1000 * overview:>16.1f}  ({len(page)} rows)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_one(args.child)
+        return
+
+    print(f"{'tenants':>8}{'per-tenant ms':>18}{'refresh ms':>14}{'overview ms':>16}")
+    for tenants in args.tenants:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='napa_summary_'), 'summary.db')}"
+        subprocess.run([sys.executable, __file__, "--child", str(tenants)], env={**os.environ, "DATABASE_URL": database_url}, check=True)
+
+
+if __name__ == "__main__":
+    main()
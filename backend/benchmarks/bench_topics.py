@@ -0,0 +1,81 @@
+"""
+Topic classification cost on and off the /chat path
+
+Times TopicTracker.submit() (the only work /chat does), classification
+throughput of the background flush, and checks the Space-Saving summaries
+against exact counts for many businesses with a skewed topic mix.
+
+    python benchmarks/bench_topics.py --messages 200000 --businesses 50
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+from topics import TOPIC_KEYWORDS, TopicTracker, classify_topics
+
+FILLER = ["Hi!", "We're visiting next weekend with friends.", "What do you recommend", "near downtown Napa?",
+          "Thanks so much.", "Is it open on Sunday?", "How far is it from the hotel lobby?"]
+
+
+def make_messages(count: int, businesses: int) -> list:
+    """Guest messages with a Zipf-like topic mix per business"""
+    random.seed(11)
+    topics = list(TOPIC_KEYWORDS)
+    weights = [1 / (rank + 1) for rank in range(len(topics))]
+    messages = []
+    for _ in range(count):
+        topic = random.choices(topics, weights)[0]
+        keyword = random.choice(TOPIC_KEYWORDS[topic])
+        messages.append((random.randrange(businesses), f"{random.choice(FILLER)} Any tips on {keyword}? {random.choice(FILLER)}"))
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--businesses", type=int, default=50)
+    parser.add_argument("--capacity", type=int, default=8, help="Counters per summary (smaller than the topic count to exercise eviction)")
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages, args.businesses)
+    day = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    tracker = TopicTracker(buffer_size=args.messages, capacity=args.capacity)
+
+    started = time.perf_counter()
+    for business_id, text in messages:
+        tracker.submit(business_id, day, text)
+    submit_ns = 1e9 * (time.perf_counter() - started) / len(messages)
+
+    started = time.perf_counter()
+    summaries = tracker._summarize(list(tracker._buffer))
+    classify_seconds = time.perf_counter() - started
+
+    exact = {}
+    for business_id, text in messages:
+        exact.setdefault(business_id, Counter()).update(classify_topics(text))
+    top3_hits = sum(
+        [t for t, _ in summaries[(b, day)].top(3)] == [t for t, _ in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:3]]
+        for b, counts in exact.items()
+    )
+
+    bounded = TopicTracker(buffer_size=1000)
+    for business_id, text in messages:
+        bounded.submit(business_id, day, text)
+
+    print(f"submit() on the request path: {submit_ns:.0f} ns/message")
+    print(f"background classification: {len(messages) / classify_seconds:,.0f} messages/s ({1e6 * classify_seconds / len(messages):.1f} us each)")
+    print(f"counters per business/day: <= {args.capacity} (max seen {max(len(s.counts) for s in summaries.values())})")
+    print(f"top-3 topics matching exact counts: {top3_hits}/{len(exact)} businesses")
+    print(f"buffer bound: {len(bounded._buffer)} queued, {bounded.dropped} dropped with buffer_size=1000")
+
+
+if __name__ == "__main__":
+    main()
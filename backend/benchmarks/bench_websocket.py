@@ -0,0 +1,136 @@
+"""
+Per-turn overhead: POST /chat vs one WebSocket per conversation
+
+Boots the app under uvicorn against the fake Anthropic API with no model
+latency, so what's measured is everything around the LLM call. Each mode
+holds --conversations conversations of --turns turns, one after the other:
+
+    http, new connection   POST /chat on a fresh connection per turn
+    http, keep-alive       POST /chat on a reused connection
+    websocket              one /ws/chat socket per conversation
+
+Over HTTP the widget sends the API key and the whole history every turn and
+the server looks the business up again; the socket authenticates once and
+a turn is one small frame. Reports mean and p95 turn latency, time to the
+first reply text, and bytes the client sends per turn.
+
+    python benchmarks/bench_websocket.py --conversations 20 --turns 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+
+from benchmarks.bench_scheduler import percentile
+from benchmarks.fake_anthropic import start_fake_anthropic
+from benchmarks.loadtest import ADMIN_KEY, GUEST_MESSAGES, free_port, seed_businesses, start_app, wait_for_app
+
+
+async def http_conversation(base_url: str, api_key: str, session_id: str, turns: int, keep_alive: bool, results: dict):
+    history = []
+    headers = {"X-API-Key": api_key} if keep_alive else {"X-API-Key": api_key, "Connection": "close"}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=30) as client:
+        for turn in range(turns):
+            body = json.dumps({"message": GUEST_MESSAGES[turn % len(GUEST_MESSAGES)], "conversation_history": history, "session_id": session_id})
+            started = time.perf_counter()
+            response = await client.post("/chat", content=body, headers={"Content-Type": "application/json"})
+            response.raise_for_status()
+            history = response.json()["conversation_history"]
+            elapsed = time.perf_counter() - started
+            results["latency"].append(elapsed)
+            results["first_text"].append(elapsed)
+            results["bytes"].append(len(body))
+
+
+async def socket_conversation(ws_url: str, api_key: str, session_id: str, turns: int, results: dict):
+    import websockets
+
+    async with websockets.connect(f"{ws_url}/ws/chat?api_key={api_key}&session_id={session_id}") as socket:
+        json.loads(await socket.recv())  # ready
+        for turn in range(turns):
+            frame = json.dumps({"type": "message", "message": GUEST_MESSAGES[turn % len(GUEST_MESSAGES)], "id": f"{session_id}-{turn}"})
+            started = time.perf_counter()
+            first_text = None
+            await socket.send(frame)
+            while True:
+                reply = json.loads(await socket.recv())
+                if reply["type"] == "delta" and first_text is None:
+                    first_text = time.perf_counter() - started
+                if reply["type"] == "error":
+                    raise RuntimeError(reply["detail"])
+                if reply["type"] == "message":
+                    break
+            elapsed = time.perf_counter() - started
+            results["latency"].append(elapsed)
+            results["first_text"].append(first_text if first_text is not None else elapsed)
+            results["bytes"].append(len(frame))
+
+
+async def run_mode(mode: str, base_url: str, api_key: str, args) -> dict:
+    results = {"latency": [], "first_text": [], "bytes": []}
+    for conversation in range(args.conversations):
+        session_id = f"{mode.split(',')[0].replace(' ', '_')}_{int(time.time() * 1000)}_{conversation}"
+        if mode == "websocket":
+            await socket_conversation(base_url.replace("http", "ws", 1), api_key, session_id, args.turns, results)
+        else:
+            await http_conversation(base_url, api_key, session_id, args.turns, mode == "http, keep-alive", results)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    fake_server, llm_url = start_fake_anthropic(latency_ms=0, jitter_ms=0)
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    app = start_app(port, {
+        "ANTHROPIC_BASE_URL": llm_url,
+        "ANTHROPIC_API_KEY": "test",
+        "ADMIN_API_KEY": ADMIN_KEY,
+        "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='napa_websocket_'), 'websocket.db')}",
+        "SERVER_TIMING": "false",
+    })
+    summary = {}
+    try:
+        wait_for_app(base_url)
+        _, api_key = seed_businesses(base_url, 1)[0]
+        asyncio.run(run_mode("http, keep-alive", base_url, api_key, argparse.Namespace(conversations=2, turns=2)))  # Warm up
+
+        print(f"{args.conversations} conversations x {args.turns} turns, no model latency\n")
+        print(f"{'':<24}{'mean ms':>10}{'p95 ms':>10}{'first text ms':>15}{'bytes/turn':>12}")
+        for mode in ("http, new connection", "http, keep-alive", "websocket"):
+            results = asyncio.run(run_mode(mode, base_url, api_key, args))
+            latency = sorted(results["latency"])
+            summary[mode] = {
+                "mean_ms": round(1000 * sum(latency) / len(latency), 2),
+                "p95_ms": round(1000 * percentile(latency, 95), 2),
+                "first_text_ms": round(1000 * sum(results["first_text"]) / len(results["first_text"]), 2),
+                "bytes_per_turn": round(sum(results["bytes"]) / len(results["bytes"])),
+            }
+            row = summary[mode]
+            print(f"{mode:<24}{row['mean_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['first_text_ms']:>15.1f}{row['bytes_per_turn']:>12}")
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+        fake_server.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
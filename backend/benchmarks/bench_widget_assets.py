@@ -0,0 +1,80 @@
+"""
+Widget bytes per hotel page view: unminified widget vs loader + hashed bundles
+
+Builds the assets from frontend/ and prints raw and gzip (and Brotli, when
+installed) sizes for what a page view downloads: the unminified widget.js and
+widget.css as they were embedded before, against loader.js alone (guests
+who never open the chat) and loader plus bundles (guests who do). Then
+requests the endpoints to check cache headers and revalidation, and parses
+the minified bundle with `node --check` when Node is available.
+
+    python benchmarks/bench_widget_assets.py
+"""
+
+import gzip
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='napa_widget_'), 'widget.db')}"
+
+from compression import brotli
+from widget_assets import WIDGET_SOURCE_DIR, build
+
+
+def sizes(body: bytes) -> tuple:
+    return len(body), len(gzip.compress(body, compresslevel=9)), len(brotli.compress(body, quality=11)) if brotli else None
+
+
+def row(label: str, bodies: list):
+    raw, gz, br = [sum(values) if None not in values else None for values in zip(*[sizes(body) for body in bodies])]
+    print(f"{label:<44}{raw:>10}{gz:>10}{br if br is not None else '-':>10}")
+
+
+def main():
+    def source(name):
+        with open(os.path.join(WIDGET_SOURCE_DIR, name), "rb") as f:
+            return f.read()
+
+    started = time.perf_counter()
+    assets = build()
+    build_ms = 1000 * (time.perf_counter() - started)
+    loader = assets["loader.js"]
+    bundles = [asset for path, asset in assets.items() if path.startswith("assets/")]
+
+    print(f"Built {', '.join(assets)} in {build_ms:.0f} ms\n")
+    print(f"{'bytes per page view':<44}{'raw':>10}{'gzip':>10}{'brotli':>10}")
+    row("before: widget.js + widget.css, unminified", [source("widget.js"), source("widget.css")])
+    row("now, chat not opened: loader.js", [loader.body])
+    row("now, chat opened: loader + bundles", [loader.body] + [asset.body for asset in bundles])
+
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    print()
+    for path in ["loader.js"] + [f"assets/{asset.name}" for asset in bundles]:
+        response = client.get(f"/widget/{path}", headers={"Accept-Encoding": "gzip"})
+        revalidated = client.get(f"/widget/{path}", headers={"If-None-Match": response.headers["etag"]})
+        print(f"/widget/{path:<30} {response.status_code} {response.headers.get('content-encoding', 'identity'):<6}"
+              f" {response.headers['cache-control']:<38} revalidation {revalidated.status_code}")
+
+    node = shutil.which("node")
+    if node:
+        for asset in [loader] + [asset for asset in bundles if asset.name.endswith(".js")]:
+            with tempfile.NamedTemporaryFile("wb", suffix=".js", delete=False) as f:
+                f.write(asset.body)
+            result = subprocess.run([node, "--check", f.name], capture_output=True, text=True)
+            os.unlink(f.name)
+            print(f"node --check {asset.name}: {'ok' if result.returncode == 0 else result.stderr.strip()}")
+            if result.returncode:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
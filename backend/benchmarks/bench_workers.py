@@ -0,0 +1,63 @@
+"""
+Throughput vs. uvicorn worker count
+
+Runs the offline load test once per worker count and prints requests/second,
+p95 latency and speedup over a single worker. The default mix leans on the
+CPU-bound endpoints (widget config, reports) with a fast fake LLM, so the
+numbers show how far extra processes get past the one-core limit; expect
+little gain beyond the number of cores on the machine.
+
+    python benchmarks/bench_workers.py --workers-list 1,2,4 --duration 20
+"""
+
+import argparse
+import json
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.loadtest import build_parser, run_loadtest
+
+CPU_BOUND_MIX = {"widget_config": 40, "chat": 30, "lead": 6, "analytics": 8, "weekly_report": 8, "monthly_report": 8}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers-list", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    parser.add_argument("--mix", default=json.dumps(CPU_BOUND_MIX))
+    parser.add_argument("--json", help="Write results to this file")
+    options = parser.parse_args()
+
+    results = {}
+    for workers in [int(n) for n in options.workers_list.split(",")]:
+        args = build_parser().parse_args([
+            "--workers", str(workers),
+            "--duration", str(options.duration),
+            "--concurrency", str(options.concurrency),
+            "--llm-latency-ms", str(options.llm_latency_ms),
+            "--mix", options.mix,
+        ])
+        print(f"Running {workers} worker(s)...")
+        summary = run_loadtest(args)
+        p95 = max((r["p95_ms"] for r in summary["endpoints"].values() if r["requests"]), default=0)
+        errors = sum(r["errors"] for r in summary["endpoints"].values())
+        results[workers] = {"rps": summary["total_rps"], "worst_p95_ms": p95, "errors": errors}
+
+    baseline = results[min(results)]["rps"] or 1
+    print(f"\nCPU cores: {os.cpu_count()}")
+    print(f"{'workers':>8}{'req/s':>10}{'speedup':>9}{'worst p95 ms':>14}{'errors':>8}")
+    for workers, r in results.items():
+        print(f"{workers:>8}{r['rps']:>10.1f}{r['rps'] / baseline:>8.2f}x{r['worst_p95_ms']:>14.0f}{r['errors']:>8}")
+
+    if options.json:
+        with open(options.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
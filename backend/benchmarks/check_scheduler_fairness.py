@@ -0,0 +1,106 @@
+"""
+Scheduler fairness after uncontended traffic
+
+A tenant that has been the only one calling the LLM for a while must not be
+put behind a newcomer once calls start queuing. Tenant A makes --history
+uncontended calls, then A and B each queue --queued calls behind a full
+concurrency cap; the dispatch order must interleave them (neither tenant
+gets more than --max-run calls in a row). Also checks that calls shed as
+queue-full don't push the shed tenant back. No network; exits non-zero on
+failure.
+
+    python benchmarks/check_scheduler_fairness.py --history 500 --queued 20
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scheduler import LLMScheduler, LLMQueueFull
+
+
+def longest_run(order: str) -> int:
+    longest = current = 0
+    for i, tenant in enumerate(order):
+        current = current + 1 if i and order[i - 1] == tenant else 1
+        longest = max(longest, current)
+    return longest
+
+
+async def contended_order(scheduler: LLMScheduler, queued: int) -> str:
+    """Queue A's and B's calls behind a full cap, then record the order they're granted in"""
+    for _ in range(scheduler.max_concurrency):
+        await scheduler.acquire("blocker")
+    order = []
+
+    async def call(tenant):
+        await scheduler.acquire(tenant)
+        order.append(tenant)
+        await asyncio.sleep(0)
+        scheduler.release(tenant)
+
+    tasks = []
+    for _ in range(queued):
+        tasks += [asyncio.create_task(call("A")), asyncio.create_task(call("B"))]
+    await asyncio.sleep(0)
+    for _ in range(scheduler.max_concurrency):
+        scheduler.release("blocker")
+    await asyncio.gather(*tasks)
+    return "".join(order)
+
+
+async def run(args) -> list:
+    failures = []
+
+    scheduler = LLMScheduler(max_concurrency=2, queue_timeout=5)
+    for _ in range(args.history):
+        await scheduler.acquire("A")
+        scheduler.release("A")
+    scheduler.max_queue_per_tenant = args.queued
+    order = await contended_order(scheduler, args.queued)
+    print(f"After {args.history} uncontended calls by A: {order}")
+    if longest_run(order) > args.max_run:
+        failures.append(f"dispatch order has a run of {longest_run(order)} calls by one tenant: {order}")
+
+    scheduler = LLMScheduler(max_concurrency=1, queue_timeout=5, max_queue_per_tenant=1)
+    await scheduler.acquire("blocker")
+    waiting = asyncio.create_task(scheduler.acquire("A"))
+    await asyncio.sleep(0)
+    shed = 0
+    for _ in range(args.history):
+        try:
+            await scheduler.acquire("A")
+        except LLMQueueFull:
+            shed += 1
+    scheduler.release("blocker")
+    await waiting
+    scheduler.release("A")
+    scheduler.max_queue_per_tenant = args.queued
+    order = await contended_order(scheduler, args.queued)
+    print(f"After {shed} calls by A shed as queue-full:   {order}")
+    if longest_run(order) > args.max_run:
+        failures.append(f"shed calls pushed A back: {order}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, default=500)
+    parser.add_argument("--queued", type=int, default=20)
+    parser.add_argument("--max-run", type=int, default=2)
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args))
+    if failures:
+        print("\nFailures:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nDispatch stays fair.")
+
+
+if __name__ == "__main__":
+    main()
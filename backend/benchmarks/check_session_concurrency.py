@@ -0,0 +1,103 @@
+"""
+Concurrent turns in one session: no message may be lost
+
+Fires several /chat requests for the same session at once, all carrying the
+same stale widget history (as when a guest sends again before the previous
+answer arrives, or chats from two tabs), then checks that the stored
+conversation holds every guest message with its reply and a matching
+message_count. Also times the same number of turns spread over separate
+sessions, which must still run in parallel. Exits non-zero on failure.
+
+    python benchmarks/check_session_concurrency.py --turns 8
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+
+async def fire(client, api_key: str, turns: int, session_for) -> tuple:
+    started = time.perf_counter()
+    responses = await asyncio.gather(*[
+        client.post("/chat", headers={"X-API-Key": api_key}, json={"message": f"Question number {i}", "session_id": session_for(i)})
+        for i in range(turns)
+    ])
+    return responses, time.perf_counter() - started
+
+
+async def run(args) -> list:
+    import httpx
+    import main
+    from database import SessionLocal, Conversation
+
+    failures = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://concierge") as client:
+        created = await client.post("/admin/businesses", headers={"X-Admin-Key": os.environ["ADMIN_API_KEY"]}, json={"name": "Concurrency Inn"})
+        api_key = created.json()["api_key"]
+
+        same, same_seconds = await fire(client, api_key, args.turns, lambda i: "shared_session")
+        separate, separate_seconds = await fire(client, api_key, args.turns, lambda i: f"session_{i}")
+
+    for response in same + separate:
+        if response.status_code != 200:
+            failures.append(f"HTTP {response.status_code}: {response.text[:200]}")
+
+    db = SessionLocal()
+    conversations = db.query(Conversation).filter(Conversation.session_id == "shared_session").order_by(Conversation.id).all()
+    db.close()
+
+    print(f"{args.turns} turns, one session:      {1000 * same_seconds:7.0f} ms")
+    print(f"{args.turns} turns, separate sessions: {1000 * separate_seconds:7.0f} ms")
+    if len(conversations) != 1:
+        failures.append(f"{len(conversations)} conversation rows for one session")
+    conversation = conversations[-1]
+    stored = [m["content"] for m in conversation.messages if m["role"] == "user"]
+    missing = [f"Question number {i}" for i in range(args.turns) if f"Question number {i}" not in stored]
+    print(f"stored: {len(conversation.messages)} messages, message_count {conversation.message_count}")
+    if missing:
+        failures.append(f"lost turns: {missing}")
+    if len(conversation.messages) != 2 * args.turns or conversation.message_count != args.turns:
+        failures.append(f"expected {2 * args.turns} messages and message_count {args.turns}")
+    if separate_seconds > args.turns * args.latency_ms / 1000 / 2:
+        failures.append("separate sessions were serialized too")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    from benchmarks.fake_anthropic import start_fake_anthropic
+
+    fake_server, llm_url = start_fake_anthropic(latency_ms=args.latency_ms)
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='napa_sessions_'), 'sessions.db')}",
+        "ADMIN_API_KEY": "admin_sessions",
+        "ANTHROPIC_BASE_URL": llm_url,
+        "ANTHROPIC_API_KEY": "test",
+        "LLM_MAX_CONCURRENCY": str(max(8, args.turns)),
+    })
+    from database import init_db
+    init_db()
+
+    failures = asyncio.run(run(args))
+    fake_server.shutdown()
+    if failures:
+        print("\nFailures:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nNo turns lost.")
+
+
+if __name__ == "__main__":
+    main()
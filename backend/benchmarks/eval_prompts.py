@@ -0,0 +1,424 @@
+"""
+Offline evaluation of prompt changes: tokens, latency, cost and answer checks
+
+Replays recorded guest turns against one or more prompt variants and reports
+what each would cost before it ships:
+
+    export   writes stored conversations (Conversation.messages) as JSONL,
+             one transcript per line, with emails and phone numbers redacted
+    run      replays every guest turn of such a corpus, with the transcript
+             up to that turn as history, for each variant on a process pool
+
+Variants come from a JSON list; only "name" is required:
+
+    [{"name": "current"},
+     {"name": "shorter", "base_prompt_file": "prompt_v2.txt",
+      "routes": {"simple": {"max_tokens": 300}},
+      "custom_knowledge": {"12": "Replacement knowledge for business 12"}}]
+
+"base_prompt_file" is relative to the variants file, "routes" overrides
+routing.DEFAULT_ROUTES and "model"/"max_tokens" pin every turn to one model.
+Prompts are rendered by prompts.render_system_prompt and routed by
+routing.ModelRouter with the business's overrides, as /chat does.
+
+Backends:
+
+    stub        no network: the recorded reply stands in for the model's,
+                tokens are estimated from text length and latency projected
+                from them (STUB_SPEEDS). Compares prompt size, cost and
+                latency of variants for free; the answer checks then
+                describe the recorded replies.
+    anthropic   the Messages API (ANTHROPIC_API_KEY; ANTHROPIC_BASE_URL
+                points it at benchmarks/fake_anthropic.py or a proxy), with
+                real token usage, latency and time to first text
+
+Each reply is checked against the prompt's rules: markdown links must be
+http(s) URLs and not Google Maps searches for a bare town, and places
+outside Napa Valley shouldn't come up. These are heuristics, so a few
+matching replies are printed for review; --resolve-links also requests each
+distinct URL once.
+
+    python benchmarks/eval_prompts.py export --out corpus.jsonl --limit 500
+    python benchmarks/eval_prompts.py run corpus.jsonl --candidate prompt_v2.txt
+    python benchmarks/eval_prompts.py run corpus.jsonl --variants variants.json --backend anthropic --processes 8
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
+from urllib.parse import unquote_plus, urlsplit
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.bench_scheduler import percentile
+from prompts import BASE_SYSTEM_PROMPT, render_system_prompt
+from routing import DEFAULT_ROUTES, ModelRouter, estimate_cost
+
+# Rough (ms before the first token, ms per input token, ms per output token) for projected stub latency
+STUB_SPEEDS = {
+    "claude-sonnet-4-20250514": (400, 0.02, 20),
+    "claude-3-5-haiku-20241022": (250, 0.01, 8),
+}
+STUB_REPLY = "Happy to help! What kind of wine country experience are you looking for?"
+CHARS_PER_TOKEN = 4
+
+LINK_PATTERN = re.compile(r"\[([^\]\n]+)\]\(([^)\s]*)\)")
+NAPA_TOWNS = {"napa", "napa valley", "yountville", "st helena", "saint helena", "calistoga", "oakville", "rutherford", "american canyon"}
+MAPS_FILLER = {"ca", "california", "usa", "us"}
+# Places the prompt tells the concierge not to send guests to; "Old Sonoma Rd" and the like are Napa streets
+OUT_OF_REGION_PATTERN = re.compile(
+    r"(?<!old )\b(San Francisco|Oakland|Berkeley|Sacramento|San Jose|Los Angeles|Sonoma|Healdsburg|Santa Rosa|"
+    r"Petaluma|Glen Ellen|Kenwood|Geyserville|Guerneville|Bodega Bay|Mendocino|Lake Tahoe)\b"
+    r"(?! (?:Rd|Road|Ave|Avenue|St|Street|Blvd|Hwy|Highway)\b)",
+    re.IGNORECASE,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def link_problem(url: str) -> Optional[str]:
+    """Why a link in a reply is unusable, or None"""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or "." not in parts.netloc or " " in url:
+        return "malformed"
+    if "google." in parts.netloc and "/maps/search/" in parts.path:
+        words = unquote_plus(parts.path.split("/maps/search/", 1)[1]).lower().replace(".", "").replace(",", " ").split()
+        if " ".join(word for word in words if word not in MAPS_FILLER) in NAPA_TOWNS | {""}:
+            return "bare town map search"
+    return None
+
+
+def check_reply(text: str) -> dict:
+    """Links, unusable links and out-of-region places in one reply"""
+    urls = [url for _, url in LINK_PATTERN.findall(text)]
+    # Addresses in map links count too, decoded so "Old+Sonoma+Rd" reads as the street it is
+    searched = LINK_PATTERN.sub(lambda match: f"{match.group(1)} ({unquote_plus(match.group(2))})", text)
+    return {
+        "links": urls,
+        "bad_links": [(url, problem) for url in urls for problem in [link_problem(url)] if problem],
+        "out_of_region": sorted({match.title() for match in OUT_OF_REGION_PATTERN.findall(searched)}),
+    }
+
+
+# ============== Backends ==============
+
+class StubBackend:
+    """Recorded replies with estimated tokens and projected latency; no network"""
+
+    def complete(self, model: str, max_tokens: int, system: str, messages: list, recorded: Optional[str]) -> dict:
+        text = (recorded or STUB_REPLY)[:max_tokens * CHARS_PER_TOKEN]
+        input_tokens = estimate_tokens(system) + sum(estimate_tokens(m["content"]) + 4 for m in messages)
+        output_tokens = estimate_tokens(text)
+        base_ms, input_ms, output_ms = STUB_SPEEDS.get(model, STUB_SPEEDS["claude-sonnet-4-20250514"])
+        first_text_ms = base_ms + input_tokens * input_ms
+        return {
+            "text": text, "input_tokens": input_tokens, "output_tokens": output_tokens,
+            "latency_ms": first_text_ms + output_tokens * output_ms, "first_text_ms": first_text_ms,
+        }
+
+
+class AnthropicBackend:
+    """Streams each turn from the Messages API"""
+
+    def __init__(self, timeout: float):
+        from anthropic import Anthropic
+        self.client = Anthropic(max_retries=2, timeout=timeout)
+
+    def complete(self, model: str, max_tokens: int, system: str, messages: list, recorded: Optional[str]) -> dict:
+        started = time.perf_counter()
+        first_text_ms, parts = None, []
+        with self.client.messages.stream(model=model, max_tokens=max_tokens, system=system, messages=messages) as stream:
+            for text in stream.text_stream:
+                if first_text_ms is None:
+                    first_text_ms = 1000 * (time.perf_counter() - started)
+                parts.append(text)
+            usage = stream.get_final_message().usage
+        latency_ms = 1000 * (time.perf_counter() - started)
+        return {
+            "text": "".join(parts), "input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens,
+            "cache_creation_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            "cache_read_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+            "latency_ms": latency_ms, "first_text_ms": first_text_ms if first_text_ms is not None else latency_ms,
+        }
+
+
+# ============== Replay ==============
+
+_worker = {}
+
+
+def init_worker(backend: str, timeout: float, variants: List[dict]):
+    """Process pool initializer: one backend client and router per variant, per process"""
+    _worker["backend"] = AnthropicBackend(timeout) if backend == "anthropic" else StubBackend()
+    _worker["variants"] = variants
+    _worker["routers"] = [
+        ModelRouter({name: {**config, **variant.get("routes", {}).get(name, {})} for name, config in DEFAULT_ROUTES.items()})
+        for variant in variants
+    ]
+
+
+def conversation_turns(conversation: dict) -> list:
+    """(history, guest message, recorded reply) for each guest turn of a transcript"""
+    messages = [m for m in conversation.get("messages") or [] if m.get("role") in ("user", "assistant") and isinstance(m.get("content"), str)]
+    turns = []
+    for i, message in enumerate(messages):
+        if message["role"] == "user":
+            following = messages[i + 1] if i + 1 < len(messages) else None
+            recorded = following["content"] if following and following["role"] == "assistant" else None
+            turns.append((i, messages[:i], message["content"], recorded))
+    return turns
+
+
+def replay_conversation(task) -> list:
+    """Results for every guest turn of one conversation under one variant"""
+    variant_index, conversation = task
+    variant, router, backend = _worker["variants"][variant_index], _worker["routers"][variant_index], _worker["backend"]
+    knowledge = variant.get("custom_knowledge", {}).get(str(conversation.get("business_id")), conversation.get("custom_knowledge"))
+    system = render_system_prompt(conversation.get("business_name") or "our hotel", knowledge, variant["base_prompt"])
+
+    results = []
+    for index, history, message, recorded in conversation_turns(conversation):
+        if variant.get("model"):
+            route, config = "pinned", {"model": variant["model"], "max_tokens": variant.get("max_tokens", DEFAULT_ROUTES["complex"]["max_tokens"])}
+        else:
+            route, config = router.route(message, history, conversation.get("model_routing"))
+        result = {"variant": variant["name"], "turn": f"{conversation.get('session_id')}:{index}", "route": route, "model": config["model"],
+                  "system_tokens": estimate_tokens(system)}
+        try:
+            reply = backend.complete(config["model"], config["max_tokens"], system, history + [{"role": "user", "content": message}], recorded)
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+            results.append(result)
+            continue
+        result.update(reply)
+        result.update(check_reply(reply["text"]))
+        result["cost_usd"] = estimate_cost(
+            config["model"], reply["input_tokens"], reply["output_tokens"], reply.get("cache_creation_tokens", 0), reply.get("cache_read_tokens", 0)
+        )
+        results.append(result)
+    return results
+
+
+def resolve_links(urls: set, timeout: float) -> dict:
+    """HTTP status (or error) per URL; sites that refuse HEAD get a GET"""
+    import httpx
+
+    def fetch(url):
+        try:
+            with httpx.Client(timeout=timeout, follow_redirects=True, headers={"User-Agent": "Mozilla/5.0 (link check)"}) as client:
+                status = client.head(url).status_code
+                if status in (403, 405):
+                    status = client.get(url).status_code
+                return url, status
+        except httpx.HTTPError as e:
+            return url, type(e).__name__
+
+    with ThreadPoolExecutor(16) as pool:
+        return dict(pool.map(fetch, sorted(urls)))
+
+
+def summarize(results: list, statuses: Optional[dict] = None) -> dict:
+    answered = [r for r in results if "error" not in r]
+    links = sum(len(r["links"]) for r in answered)
+    n = max(1, len(answered))
+    summary = {
+        "turns": len(results),
+        "errors": len(results) - len(answered),
+        "system_tokens": sum(r["system_tokens"] for r in results) / max(1, len(results)),
+        "input_tokens": sum(r["input_tokens"] for r in answered) / n,
+        "output_tokens": sum(r["output_tokens"] for r in answered) / n,
+        "latency_p50_ms": percentile([r["latency_ms"] for r in answered], 50),
+        "latency_p95_ms": percentile([r["latency_ms"] for r in answered], 95),
+        "first_text_p50_ms": percentile([r["first_text_ms"] for r in answered], 50),
+        "cost_per_1k_turns_usd": 1000 * sum(r["cost_usd"] for r in answered) / n,
+        "large_model_pct": 100 * sum(r["model"] == DEFAULT_ROUTES["complex"]["model"] for r in answered) / n,
+        "links_per_reply": links / n,
+        "bad_links_pct": 100 * sum(len(r["bad_links"]) for r in answered) / max(1, links),
+        "replies_without_links_pct": 100 * sum(not r["links"] for r in answered) / n,
+        "out_of_region_pct": 100 * sum(bool(r["out_of_region"]) for r in answered) / n,
+    }
+    if statuses is not None:
+        broken = sum(not isinstance(statuses.get(url), int) or statuses[url] >= 400 for r in answered for url in r["links"])
+        summary["broken_links_pct"] = 100 * broken / max(1, links)
+    return summary
+
+
+ROWS = [
+    ("turns", "turns", "{:.0f}"),
+    ("errors", "errors", "{:.0f}"),
+    ("system_tokens", "system prompt tokens (est.)", "{:.0f}"),
+    ("input_tokens", "input tokens / turn", "{:.0f}"),
+    ("output_tokens", "output tokens / turn", "{:.0f}"),
+    ("latency_p50_ms", "latency p50 ms", "{:.0f}"),
+    ("latency_p95_ms", "latency p95 ms", "{:.0f}"),
+    ("first_text_p50_ms", "first text p50 ms", "{:.0f}"),
+    ("cost_per_1k_turns_usd", "USD / 1k turns", "{:.2f}"),
+    ("large_model_pct", "large model %", "{:.1f}"),
+    ("links_per_reply", "links / reply", "{:.2f}"),
+    ("bad_links_pct", "malformed/bare-town links %", "{:.1f}"),
+    ("broken_links_pct", "unreachable links %", "{:.1f}"),
+    ("replies_without_links_pct", "replies without links %", "{:.1f}"),
+    ("out_of_region_pct", "out-of-region replies %", "{:.1f}"),
+]
+
+
+def print_report(summaries: dict):
+    names = list(summaries)
+    baseline = summaries[names[0]]
+    print(f"{'':<30}" + "".join(f"{name:>22}" for name in names))
+    for key, label, fmt in ROWS:
+        if key not in baseline:
+            continue
+        cells = []
+        for name in names:
+            value = summaries[name][key]
+            cell = fmt.format(value)
+            if name != names[0] and baseline[key] and key not in ("turns", "errors"):
+                cell += f" ({100 * (value - baseline[key]) / baseline[key]:+.0f}%)"
+            cells.append(f"{cell:>22}")
+        print(f"{label:<30}" + "".join(cells))
+
+
+def load_variants(args) -> List[dict]:
+    variants = [{"name": "current"}]
+    base_dir = os.getcwd()
+    if args.variants:
+        with open(args.variants) as f:
+            variants = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(args.variants))
+    if args.candidate:
+        variants.append({"name": "candidate", "base_prompt_file": os.path.abspath(args.candidate)})
+    for variant in variants:
+        if variant.get("base_prompt_file"):
+            with open(os.path.join(base_dir, variant["base_prompt_file"]), encoding="utf-8") as f:
+                variant["base_prompt"] = f.read()
+        else:
+            variant["base_prompt"] = BASE_SYSTEM_PROMPT
+    return variants
+
+
+def run(args):
+    variants = load_variants(args)
+    with open(args.corpus, encoding="utf-8") as f:
+        conversations = [json.loads(line) for line in f if line.strip()]
+    if args.limit:
+        conversations = conversations[:args.limit]
+    # Variants interleaved, so connection warm-up and backend load drift don't favour one of them
+    tasks = [(v, conversation) for conversation in conversations for v in range(len(variants))]
+    print(f"{len(conversations)} conversations, {sum(len(conversation_turns(c)) for c in conversations)} guest turns, "
+          f"{len(variants)} variants, {args.backend} backend, {args.processes} processes\n")
+
+    started = time.perf_counter()
+    if args.processes > 1:
+        with ProcessPoolExecutor(args.processes, initializer=init_worker, initargs=(args.backend, args.timeout, variants)) as pool:
+            batches = list(pool.map(replay_conversation, tasks, chunksize=max(1, len(tasks) // (args.processes * 4))))
+    else:
+        init_worker(args.backend, args.timeout, variants)
+        batches = [replay_conversation(task) for task in tasks]
+    results = [result for batch in batches for result in batch]
+    elapsed = time.perf_counter() - started
+
+    statuses = None
+    if args.resolve_links:
+        statuses = resolve_links({url for r in results for url in r.get("links", [])}, args.timeout)
+
+    summaries = {v["name"]: summarize([r for r in results if r["variant"] == v["name"]], statuses) for v in variants}
+    print_report(summaries)
+    print(f"\nReplayed {len(results)} turns in {elapsed:.1f}s")
+
+    for variant in variants:
+        flagged = [r for r in results if r["variant"] == variant["name"] and (r.get("bad_links") or r.get("out_of_region") or r.get("error"))]
+        for r in flagged[:args.examples]:
+            issues = r.get("error") or "; ".join([f"{problem}: {url}" for url, problem in r["bad_links"]] + [f"mentions {', '.join(r['out_of_region'])}"] * bool(r["out_of_region"]))
+            print(f"  [{variant['name']}] {r['turn']}: {issues}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({name: {k: round(v, 4) for k, v in s.items()} for name, s in summaries.items()}, f, indent=2)
+    if args.replies:
+        with open(args.replies, "w", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps({k: r.get(k) for k in ("variant", "turn", "model", "text", "bad_links", "out_of_region", "error")}) + "\n")
+
+
+# ============== Export ==============
+
+def export(args):
+    """Write stored transcripts as corpus JSONL; reads DATABASE_URL like the app"""
+    from database import SessionLocal, Business, Conversation
+    from leads import EMAIL_PATTERN, PHONE_PATTERN
+
+    def redact(messages):
+        if args.no_redact:
+            return messages
+        return [
+            {**m, "content": PHONE_PATTERN.sub("[phone]", EMAIL_PATTERN.sub("[email]", m["content"]))} if isinstance(m.get("content"), str) else m
+            for m in messages
+        ]
+
+    db = SessionLocal()
+    written = 0
+    try:
+        query = (
+            db.query(Conversation, Business.name, Business.custom_knowledge, Business.model_routing)
+            .join(Business, Business.id == Conversation.business_id)
+            .filter(Business.deleted_at.is_(None), Conversation.message_count >= args.min_turns)
+            .order_by(Conversation.last_message_at.desc())
+        )
+        if args.business_id:
+            query = query.filter(Conversation.business_id == args.business_id)
+        if args.limit:
+            query = query.limit(args.limit)
+        with open(args.out, "w", encoding="utf-8") as f:
+            for conversation, name, knowledge, routing in query.yield_per(200):
+                f.write(json.dumps({
+                    "business_id": conversation.business_id, "business_name": name, "custom_knowledge": knowledge, "model_routing": routing,
+                    "session_id": conversation.session_id, "messages": redact(conversation.messages or []),
+                }) + "\n")
+                written += 1
+    finally:
+        db.close()
+    print(f"Wrote {written} conversations to {args.out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Write stored conversations as a corpus")
+    export_parser.add_argument("--out", required=True)
+    export_parser.add_argument("--business-id", type=int)
+    export_parser.add_argument("--limit", type=int, help="Most recent conversations only")
+    export_parser.add_argument("--min-turns", type=int, default=1, help="Skip conversations with fewer guest messages")
+    export_parser.add_argument("--no-redact", action="store_true", help="Keep emails and phone numbers")
+
+    run_parser = commands.add_parser("run", help="Replay a corpus against prompt variants")
+    run_parser.add_argument("corpus")
+    run_parser.add_argument("--variants", help="JSON list of variants (default: the current prompt)")
+    run_parser.add_argument("--candidate", help="Base prompt file to compare against the current one")
+    run_parser.add_argument("--backend", choices=["stub", "anthropic"], default="stub")
+    run_parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    run_parser.add_argument("--limit", type=int, help="First N conversations only")
+    run_parser.add_argument("--timeout", type=float, default=60.0)
+    run_parser.add_argument("--resolve-links", action="store_true", help="Request every distinct URL once")
+    run_parser.add_argument("--examples", type=int, default=3, help="Flagged replies to print per variant")
+    run_parser.add_argument("--json", help="Write per-variant summaries to this file")
+    run_parser.add_argument("--replies", help="Write every reply and its checks to this JSONL file")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Local stand-in for the Anthropic Messages API
+
+Answers POST /v1/messages with a canned assistant reply after a configurable
+delay, so the backend and benchmarks can run offline without an API key. It can
+also inject overloaded errors and occasional slow responses. Streaming requests
+get server-sent events, with the first token after --ttft-ratio of the latency.
+
+Run standalone and point the backend at it:
+
+    python benchmarks/fake_anthropic.py --port 8100 --latency-ms 800 --error-rate 0.1
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8100 ANTHROPIC_API_KEY=test python main.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = (
+    "For a first visit I'd start at [Robert Mondavi Winery](https://www.robertmondaviwinery.com) "
+    "in Oakville, then lunch at [Oakville Grocery](https://www.oakvillegrocery.com). "
+    "Would you like me to build a full itinerary?"
+)
+
+
+class FakeAnthropicConfig:
+    def __init__(
+        self,
+        latency_ms: float = 500,
+        jitter_ms: float = 0,
+        reply: str = REPLY,
+        error_rate: float = 0.0,
+        error_status: int = 529,
+        slow_rate: float = 0.0,
+        slow_ms: float = 5000,
+        ttft_ratio: float = 0.3,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.reply = reply
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.ttft_ratio = ttft_ratio
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def delay(self) -> float:
+        if random.random() < self.slow_rate:
+            return self.slow_ms / 1000
+        return max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+
+class FakeAnthropicHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client gave up (timeout or hedged request won)
+
+    def do_POST(self):
+        config = self.server.config
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        if not self.path.startswith("/v1/messages"):
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+            return
+
+        fail = random.random() < config.error_rate
+        with config.lock:
+            config.requests += 1
+            config.errors += fail
+
+        if fail:
+            time.sleep(config.latency_ms / 4000)
+            self._send_json(config.error_status, {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}})
+            return
+
+        delay = config.delay()
+        prompt_chars = len(json.dumps(body.get("system", ""))) + len(json.dumps(body.get("messages", [])))
+        message = {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "claude-sonnet-4-20250514"),
+            "content": [{"type": "text", "text": config.reply}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": prompt_chars // 4, "output_tokens": len(config.reply) // 4},
+        }
+
+        if body.get("stream"):
+            self._stream(message, delay)
+            return
+
+        time.sleep(delay)
+        self._send_json(200, message)
+
+    def _stream(self, message: dict, delay: float):
+        """Send the reply as Messages API server-sent events"""
+        config = self.server.config
+        words = message["content"][0]["text"].split(" ")
+        chunks = [" ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "") for i in range(0, len(words), 4)]
+        chunk_delay = delay * (1 - config.ttft_ratio) / max(len(chunks), 1)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(name: str, data: dict):
+            self.wfile.write(f"event: {name}\ndata: {json.dumps({'type': name, **data})}\n\n".encode())
+            self.wfile.flush()
+
+        try:
+            start = dict(message, content=[], stop_reason=None, usage=dict(message["usage"], output_tokens=0))
+            event("message_start", {"message": start})
+            time.sleep(delay * config.ttft_ratio)
+            event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+            for chunk in chunks:
+                event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": chunk}})
+                time.sleep(chunk_delay)
+            event("content_block_stop", {"index": 0})
+            event("message_delta", {"delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+            event("message_stop", {})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def start_fake_anthropic(port: int = 0, **config):
+    """Start the fake API on a background thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeAnthropicHandler)
+    server.daemon_threads = True
+    server.config = FakeAnthropicConfig(**config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=529)
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of requests delayed by --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=5000)
+    parser.add_argument("--ttft-ratio", type=float, default=0.3, help="Share of the latency spent before the first streamed token")
+    args = parser.parse_args()
+
+    server, url = start_fake_anthropic(
+        args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        slow_rate=args.slow_rate,
+        slow_ms=args.slow_ms,
+        ttft_ratio=args.ttft_ratio
+    )
+    print(f"Fake Anthropic API listening on {url} ({args.latency_ms:.0f}ms +/- {args.jitter_ms:.0f}ms)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,299 @@
+"""
+Offline load test for the API
+
+Boots the app under uvicorn against the fake Anthropic API and a throwaway
+SQLite database (or --database-url for Postgres), seeds businesses, then
+drives a realistic mix of /widget/config, /chat, /lead and admin report
+calls. Reports RPS, p50/p95/p99 and SQL statements per request for each
+endpoint (from the app's own /metrics).
+
+    python benchmarks/loadtest.py --duration 30 --concurrency 32 --llm-latency-ms 800
+    python benchmarks/loadtest.py --json results.json
+    python benchmarks/loadtest.py --baseline results.json --max-regression 0.25   # CI gate
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.bench_scheduler import percentile
+from benchmarks.fake_anthropic import start_fake_anthropic
+
+ADMIN_KEY = "admin_loadtest"
+
+GUEST_MESSAGES = [
+    "What time does Oxbow Public Market open?",
+    "Can you plan a 2 day itinerary for our anniversary? We love Cabernet.",
+    "Where should we have dinner in Yountville tonight?",
+    "Is there parking at Castello di Amorosa?",
+    "We're a group of 6 - which wineries take walk-ins on a Saturday?",
+    "Any good spots for a picnic lunch?",
+]
+
+# Endpoint name -> relative weight in the traffic mix
+DEFAULT_MIX = {"widget_config": 30, "chat": 50, "lead": 8, "analytics": 4, "weekly_report": 4, "monthly_report": 4}
+
+# Route templates as they appear in /metrics, for query counts per endpoint
+ROUTES = {
+    "widget_config": "/widget/config",
+    "chat": "/chat",
+    "lead": "/lead",
+    "analytics": "/admin/businesses/{business_id}/analytics",
+    "weekly_report": "/admin/businesses/{business_id}/weekly-report",
+    "monthly_report": "/admin/businesses/{business_id}/monthly-report",
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(port: int, env: dict, workers: int = 1) -> subprocess.Popen:
+    """Run the API under uvicorn in a subprocess (uvicorn reads the worker count from WEB_CONCURRENCY)"""
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env={**os.environ, **env, "WEB_CONCURRENCY": str(workers)})
+
+
+def wait_for_app(base_url: str, timeout: float = 30) -> float:
+    """Block until /health answers; returns seconds waited"""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"App at {base_url} did not become healthy within {timeout}s")
+
+
+def seed_businesses(base_url: str, count: int) -> list:
+    """Create businesses through the admin API; returns [(id, api_key)]"""
+    businesses = []
+    with httpx.Client(base_url=base_url, headers={"X-Admin-Key": ADMIN_KEY}) as client:
+        for i in range(count):
+            response = client.post("/admin/businesses", json={
+                "name": f"Loadtest Inn {i}",
+                "contact_email": f"inn{i}@example.com",
+                "custom_knowledge": "Boutique hotel in Yountville. Check-in 3pm, check-out 11am. " * (1 + i % 5)
+            })
+            response.raise_for_status()
+            businesses.append((response.json()["id"], response.json()["api_key"]))
+    return businesses
+
+
+def db_query_totals(base_url: str) -> dict:
+    """(statements, requests) per route template, from /metrics"""
+    text = httpx.get(f"{base_url}/metrics").text
+    sums, counts = {}, {}
+    for family in text_string_to_metric_families(text):
+        if family.name != "napa_db_queries_per_request":
+            continue
+        for sample in family.samples:
+            route = sample.labels.get("route")
+            if sample.name.endswith("_sum"):
+                sums[route] = sample.value
+            elif sample.name.endswith("_count"):
+                counts[route] = sample.value
+    return {route: (sums.get(route, 0), counts[route]) for route in counts}
+
+
+def queries_per_request(before: dict, after: dict) -> dict:
+    """Average SQL statements per request between two /metrics snapshots"""
+    averages = {}
+    for route, (total, count) in after.items():
+        prev_total, prev_count = before.get(route, (0, 0))
+        if count > prev_count:
+            averages[route] = (total - prev_total) / (count - prev_count)
+    return averages
+
+
+class LoadGenerator:
+    def __init__(self, base_url: str, businesses: list, mix: dict):
+        self.base_url = base_url
+        self.businesses = businesses
+        self.endpoints = list(mix)
+        self.weights = [mix[name] for name in self.endpoints]
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.sessions = {}  # session_id -> (api_key, history)
+
+    async def request(self, client: httpx.AsyncClient, endpoint: str):
+        business_id, api_key = random.choice(self.businesses)
+        if endpoint == "widget_config":
+            return await client.get("/widget/config", params={"api_key": api_key})
+        if endpoint == "chat":
+            # Mostly continue an existing conversation, sometimes start a new one
+            if self.sessions and random.random() < 0.7:
+                session_id = random.choice(list(self.sessions))
+                api_key, history = self.sessions[session_id]
+            else:
+                session_id, history = f"lt_{random.getrandbits(48):x}", []
+            response = await client.post("/chat", headers={"X-API-Key": api_key}, json={
+                "message": random.choice(GUEST_MESSAGES),
+                "conversation_history": history[-10:],
+                "session_id": session_id
+            })
+            if response.status_code == 200:
+                self.sessions[session_id] = (api_key, response.json()["conversation_history"])
+            return response
+        if endpoint == "lead":
+            session_id = random.choice(list(self.sessions)) if self.sessions else "lt_none"
+            return await client.post("/lead", headers={"X-API-Key": self.sessions.get(session_id, (api_key,))[0]}, json={
+                "session_id": session_id, "name": "Load Test", "email": f"{session_id}@example.com", "interest": "Tasting"
+            })
+        path = {"analytics": "analytics", "weekly_report": "weekly-report", "monthly_report": "monthly-report"}[endpoint]
+        return await client.get(f"/admin/businesses/{business_id}/{path}", headers={"X-Admin-Key": ADMIN_KEY})
+
+    async def worker(self, client: httpx.AsyncClient, deadline: float):
+        while time.perf_counter() < deadline:
+            endpoint = random.choices(self.endpoints, self.weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await self.request(client, endpoint)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                self.latencies[endpoint].append(time.perf_counter() - started)
+            else:
+                self.errors[endpoint] += 1
+
+    async def run(self, concurrency: int, duration: float) -> float:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=60) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*[self.worker(client, started + duration) for _ in range(concurrency)])
+            return time.perf_counter() - started
+
+
+def summarize(generator: LoadGenerator, elapsed: float, queries: dict) -> dict:
+    results = {}
+    for endpoint in generator.endpoints:
+        values = generator.latencies.get(endpoint, [])
+        results[endpoint] = {
+            "requests": len(values),
+            "errors": generator.errors.get(endpoint, 0),
+            "rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(1000 * percentile(values, 50), 1),
+            "p95_ms": round(1000 * percentile(values, 95), 1),
+            "p99_ms": round(1000 * percentile(values, 99), 1),
+            "db_queries": round(queries.get(ROUTES[endpoint], 0), 2),
+        }
+    total = sum(r["requests"] for r in results.values())
+    return {"elapsed_seconds": round(elapsed, 2), "total_rps": round(total / elapsed, 2), "endpoints": results}
+
+
+def print_report(summary: dict):
+    print(f"\n{'endpoint':<16}{'reqs':>7}{'errs':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+    for endpoint, r in summary["endpoints"].items():
+        print(
+            f"{endpoint:<16}{r['requests']:>7}{r['errors']:>6}{r['rps']:>9.1f}"
+            f"{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}{r['p99_ms']:>9.0f}{r['db_queries']:>9.1f}"
+        )
+    print(f"\nTotal: {summary['total_rps']:.1f} req/s over {summary['elapsed_seconds']:.0f}s")
+
+
+def compare_to_baseline(summary: dict, baseline: dict, max_regression: float) -> list:
+    """Endpoints whose p95, throughput or query count regressed beyond the threshold"""
+    failures = []
+    for endpoint, current in summary["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(endpoint)
+        if not before or not current["requests"]:
+            continue
+        if before["p95_ms"] and current["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            failures.append(f"{endpoint}: p95 {before['p95_ms']}ms -> {current['p95_ms']}ms")
+        if before["rps"] and current["rps"] < before["rps"] * (1 - max_regression):
+            failures.append(f"{endpoint}: rps {before['rps']} -> {current['rps']}")
+        if current["db_queries"] > before["db_queries"] + 0.5:
+            failures.append(f"{endpoint}: queries/request {before['db_queries']} -> {current['db_queries']}")
+    return failures
+
+
+def run_loadtest(args) -> dict:
+    fake_server, llm_url = start_fake_anthropic(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_latency_ms / 5)
+    db_dir = tempfile.mkdtemp(prefix="napa_loadtest_")
+    database_url = args.database_url or f"sqlite:///{os.path.join(db_dir, 'loadtest.db')}"
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+
+    app = start_app(port, {
+        "ANTHROPIC_BASE_URL": llm_url,
+        "ANTHROPIC_API_KEY": "test",
+        "ADMIN_API_KEY": ADMIN_KEY,
+        "DATABASE_URL": database_url,
+        "LLM_STREAM": "true" if args.stream else "false",
+        "METRICS_TENANT_LABELS": "false",
+    }, workers=args.workers)
+    try:
+        wait_for_app(base_url)
+        businesses = seed_businesses(base_url, args.businesses)
+        mix = dict(DEFAULT_MIX, **json.loads(args.mix)) if args.mix else DEFAULT_MIX
+
+        generator = LoadGenerator(base_url, businesses, mix)
+        if args.warmup:
+            asyncio.run(generator.run(args.concurrency, args.warmup))
+            generator.latencies.clear()
+            generator.errors.clear()
+
+        queries_before = db_query_totals(base_url)
+        elapsed = asyncio.run(generator.run(args.concurrency, args.duration))
+        queries = queries_per_request(queries_before, db_query_totals(base_url))
+        return summarize(generator, elapsed, queries)
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+        fake_server.shutdown()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=3, help="Seconds of unmeasured load first")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent simulated clients")
+    parser.add_argument("--businesses", type=int, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=True, help="Fake API streams replies")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--database-url", help="Use this database instead of a temp SQLite file")
+    parser.add_argument("--mix", help='JSON weight overrides, e.g. \'{"chat": 80, "lead": 0}\'')
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Compare against a previous --json result and exit 1 on regression")
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    summary = run_loadtest(args)
+    print_report(summary)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare_to_baseline(summary, json.load(f), args.max_regression)
+        if failures:
+            print("\nPerformance regressions:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
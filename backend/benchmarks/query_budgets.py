@@ -0,0 +1,274 @@
+"""
+SQL query budgets for every API route
+
+Seeds a throwaway SQLite database with thousands of businesses, one very busy
+business (thousands of conversations, hundreds of leads, months of analytics),
+then calls every route in main.py in-process and counts the SQL statements
+each request (or WebSocket chat turn) executes via SQLAlchemy cursor events. Exits non-zero when a
+route exceeds its budget or when a route has no budget at all, so per-row
+(N+1) queries can't sneak back in.
+
+    python benchmarks/query_budgets.py
+    python benchmarks/query_budgets.py --tenants 5000 --verbose
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+ADMIN_KEY = "admin_budgets"
+BIG_KEY = "nc_budget_big_tenant"
+SMALL_KEY = "nc_budget_small_tenant"
+
+# "METHOD /route" -> max SQL statements per request. Budgets must not depend on data volume.
+QUERY_BUDGETS = {
+    "GET /": 0,
+    "GET /health": 0,
+    "GET /metrics": 0,
+    "GET /widget/config": 1,
+    "GET /widget/loader.js": 0,
+    "GET /widget/assets/{name}": 0,
+    "POST /chat": 8,  # Includes re-checking the business is still active before the turn is written
+    "POST /lead": 6,
+    "WEBSOCKET /ws/chat": 7,
+    "POST /admin/businesses": 2,
+    "GET /admin/businesses": 1,
+    "GET /admin/businesses/{business_id}": 1,
+    "PUT /admin/businesses/{business_id}": 2,
+    "DELETE /admin/businesses/{business_id}": 2,
+    "GET /admin/businesses/{business_id}/deletion": 0,
+    "GET /admin/businesses/{business_id}/analytics": 2,
+    "GET /admin/businesses/{business_id}/leads": 1,
+    "POST /admin/businesses/{business_id}/sessions/{session_id}/messages": 2,
+    "POST /admin/send-weekly-reports": 3,
+    "GET /admin/businesses/{business_id}/weekly-report": 3,
+    "GET /admin/businesses/{business_id}/monthly-report": 3,
+    "POST /admin/businesses/{business_id}/send-report": 3,
+    "POST /contract/sign": 2,
+    "GET /admin/contracts": 1,
+    "GET /admin/llm-queue": 0,
+    "GET /admin/llm-client": 0,
+    "GET /admin/llm-routes": 0,
+    "POST /admin/retention/run": 2,
+    "POST /admin/leads/backfill": 3,
+    "GET /admin/summary": 1,
+    "POST /admin/summary/refresh": 3,
+}
+
+
+def configure_environment(db_path: str, llm_url: str):
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "ADMIN_API_KEY": ADMIN_KEY,
+        "ANTHROPIC_BASE_URL": llm_url,
+        "ANTHROPIC_API_KEY": "test",
+        "RESEND_API_KEY": "re_budget_test",
+        "TRACE_FILE": "",
+        "OTEL_EXPORTER_OTLP_ENDPOINT": "",
+    })
+
+
+def seed(tenants: int, big_conversations: int, big_leads: int, days: int):
+    """Bulk-insert fixtures with Core inserts (fast even for tens of thousands of rows)"""
+    from database import engine, init_db, Business, Conversation, Lead, Analytics
+
+    init_db()
+    now = datetime.utcnow()
+    today = datetime.combine(date.today(), datetime.min.time())
+
+    with engine.begin() as conn:
+        conn.execute(Business.__table__.insert(), [
+            {"id": 1, "api_key": BIG_KEY, "name": "Big Resort", "contact_email": "big@example.com", "is_active": True, "created_at": now},
+            {"id": 2, "api_key": SMALL_KEY, "name": "Small Inn", "contact_email": "small@example.com", "is_active": True, "created_at": now},
+        ] + [
+            {"id": i, "api_key": f"nc_budget_{i}", "name": f"Tenant {i}", "contact_email": f"t{i}@example.com", "is_active": True, "created_at": now}
+            for i in range(3, tenants + 1)
+        ])
+
+        conversations = [
+            {"business_id": 1, "session_id": f"big_{i}", "started_at": now, "last_message_at": now, "message_count": 2,
+             "messages": [{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Welcome!"}]}
+            for i in range(big_conversations)
+        ] + [
+            {"business_id": b, "session_id": f"t{b}_{j}", "started_at": now, "last_message_at": now, "message_count": 1, "messages": []}
+            for b in range(2, tenants + 1) for j in range(3)
+        ]
+        conn.execute(Conversation.__table__.insert(), conversations)
+
+        conn.execute(Lead.__table__.insert(), [
+            {"business_id": 1, "name": f"Guest {i}", "email": f"guest{i}@example.com", "interest": "Tasting", "created_at": now - timedelta(days=i % 40)}
+            for i in range(big_leads)
+        ] + [
+            {"business_id": b, "name": "Guest", "email": f"g{b}@example.com", "interest": None, "created_at": now} for b in range(2, tenants + 1)
+        ])
+
+        conn.execute(Analytics.__table__.insert(), [
+            {"business_id": b, "date": today - timedelta(days=d), "total_conversations": 3, "total_messages": 9,
+             "unique_visitors": 3, "leads_captured": 1}
+            for b in range(1, tenants + 1) for d in range(days if b == 1 else 7)
+        ])
+
+
+def scenarios():
+    """(budget key, label, method, path, request kwargs) for every route"""
+    from widget_assets import build
+
+    admin = {"X-Admin-Key": ADMIN_KEY}
+    bundle = next(path for path in build() if path.endswith(".js") and path.startswith("assets/"))
+    return [
+        ("GET /", "root", "GET", "/", {}),
+        ("GET /health", "health", "GET", "/health", {}),
+        ("GET /metrics", "metrics", "GET", "/metrics", {}),
+        ("GET /widget/config", "widget config", "GET", "/widget/config", {"params": {"api_key": BIG_KEY}}),
+        ("GET /widget/loader.js", "widget loader", "GET", "/widget/loader.js", {}),
+        ("GET /widget/assets/{name}", "widget bundle", "GET", f"/widget/{bundle}", {}),
+        ("POST /chat", "chat, new session", "POST", "/chat", {"headers": {"X-API-Key": BIG_KEY}, "json": {"message": "What time does Oxbow open?", "session_id": "budget_new"}}),
+        ("POST /chat", "chat, existing session", "POST", "/chat", {"headers": {"X-API-Key": BIG_KEY}, "json": {"message": "Thanks!", "session_id": "big_1"}}),
+        ("POST /chat", "chat, idempotency key", "POST", "/chat", {"headers": {"X-API-Key": BIG_KEY, "Idempotency-Key": "budget-retry"}, "json": {"message": "Any picnic spots?", "session_id": "big_3"}}),
+        ("POST /chat", "chat, retry replayed", "POST", "/chat", {"headers": {"X-API-Key": BIG_KEY, "Idempotency-Key": "budget-retry"}, "json": {"message": "Any picnic spots?", "session_id": "big_3"}}),
+        ("POST /chat", "chat, starter chip", "POST", "/chat", {"headers": {"X-API-Key": BIG_KEY}, "json": {"message": "Where should we go for dinner tonight?", "session_id": "budget_starter"}}),
+        ("WEBSOCKET /ws/chat", "socket turn, new session", "WEBSOCKET", "/ws/chat", {"params": {"api_key": BIG_KEY, "session_id": "budget_socket"}, "json": {"type": "message", "message": "Is Castello di Amorosa worth it?", "id": "budget-socket-1"}}),
+        ("WEBSOCKET /ws/chat", "socket turn, existing session", "WEBSOCKET", "/ws/chat", {"params": {"api_key": BIG_KEY, "session_id": "big_5"}, "json": {"type": "message", "message": "And for lunch?", "id": "budget-socket-2"}}),
+        ("POST /lead", "lead", "POST", "/lead", {"headers": {"X-API-Key": BIG_KEY}, "json": {"session_id": "big_2", "email": "new@example.com"}}),
+        ("POST /admin/businesses", "create business", "POST", "/admin/businesses", {"headers": admin, "json": {"name": "Budget Inn"}}),
+        ("GET /admin/businesses", "list businesses", "GET", "/admin/businesses", {"headers": admin}),
+        ("GET /admin/businesses/{business_id}", "get business", "GET", "/admin/businesses/1", {"headers": admin}),
+        ("PUT /admin/businesses/{business_id}", "update business", "PUT", "/admin/businesses/1", {"headers": admin, "json": {"widget_title": "Resort Concierge"}}),
+        ("GET /admin/businesses/{business_id}/analytics", "analytics", "GET", "/admin/businesses/1/analytics", {"headers": admin}),
+        ("GET /admin/businesses/{business_id}/leads", "leads", "GET", "/admin/businesses/1/leads", {"headers": admin}),
+        ("POST /admin/businesses/{business_id}/sessions/{session_id}/messages", "staff message", "POST", "/admin/businesses/1/sessions/big_4/messages", {"headers": admin, "json": {"message": "Your table at Bouchon is confirmed for 7pm."}}),
+        ("GET /admin/businesses/{business_id}/weekly-report", "weekly report", "GET", "/admin/businesses/1/weekly-report", {"headers": admin}),
+        ("GET /admin/businesses/{business_id}/monthly-report", "monthly report", "GET", "/admin/businesses/1/monthly-report", {"headers": admin}),
+        ("POST /admin/businesses/{business_id}/send-report", "send report", "POST", "/admin/businesses/1/send-report", {"headers": admin, "json": {"period": "monthly"}}),
+        ("POST /admin/send-weekly-reports", "weekly reports, all tenants", "POST", "/admin/send-weekly-reports", {"headers": admin}),
+        ("POST /contract/sign", "sign contract", "POST", "/contract/sign", {"json": {"signer_name": "A", "signer_email": "a@example.com", "company_name": "Inn"}}),
+        ("GET /admin/contracts", "list contracts", "GET", "/admin/contracts", {"headers": admin}),
+        ("GET /admin/llm-queue", "llm queue", "GET", "/admin/llm-queue", {"headers": admin}),
+        ("GET /admin/llm-client", "llm client", "GET", "/admin/llm-client", {"headers": admin}),
+        ("GET /admin/llm-routes", "llm routes", "GET", "/admin/llm-routes", {"headers": admin}),
+        ("POST /admin/retention/run", "retention pass", "POST", "/admin/retention/run", {"headers": admin}),
+        ("POST /admin/summary/refresh", "refresh tenant summary", "POST", "/admin/summary/refresh", {"headers": admin}),
+        ("GET /admin/summary", "tenant summary", "GET", "/admin/summary", {"headers": admin}),
+        ("POST /admin/leads/backfill", "lead backfill page", "POST", "/admin/leads/backfill", {"headers": admin, "params": {"limit": 1000}}),
+        ("DELETE /admin/businesses/{business_id}", "delete business", "DELETE", "/admin/businesses/2", {"headers": admin}),
+        ("GET /admin/businesses/{business_id}/deletion", "deletion status", "GET", "/admin/businesses/2/deletion", {"headers": admin}),
+    ]
+
+
+class StatementCounter:
+    """Counts SQL statements executed on behalf of HTTP requests while active (background jobs are ignored)"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.statements = []
+        self.active = False
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        import metrics
+        if self.active and metrics.current_db_stats() is not None:
+            self.statements.append(statement)
+
+    def __enter__(self):
+        self.statements = []
+        self.active = True
+        return self
+
+    def __exit__(self, *exc):
+        self.active = False
+
+
+def route_keys(app) -> set:
+    from fastapi.routing import APIRoute, APIWebSocketRoute
+    keys = {f"{method} {route.path}" for route in app.routes if isinstance(route, APIRoute) for method in route.methods}
+    return keys | {f"WEBSOCKET {route.path}" for route in app.routes if isinstance(route, APIWebSocketRoute)}
+
+
+class SocketTurn:
+    """One chat turn on a fresh socket, shaped like a response for the report (connecting isn't counted)"""
+
+    def __init__(self, client, counter, path: str, params: dict, json: dict):
+        with client.websocket_connect(path, params=params) as websocket:
+            websocket.receive_json()  # ready
+            with counter:
+                websocket.send_json(json)
+                frame = websocket.receive_json()
+                while frame["type"] in ("delta", "reset"):
+                    frame = websocket.receive_json()
+        self.status_code = frame.get("status", 200)
+        self.text = str(frame)
+
+
+def main(args) -> int:
+    from benchmarks.fake_anthropic import start_fake_anthropic
+
+    fake_server, llm_url = start_fake_anthropic(latency_ms=5)
+    configure_environment(os.path.join(tempfile.mkdtemp(prefix="napa_budgets_"), "budgets.db"), llm_url)
+
+    print(f"Seeding {args.tenants} tenants ({args.big_conversations} conversations and {args.big_leads} leads on the busiest)...")
+    seed(args.tenants, args.big_conversations, args.big_leads, args.days)
+
+    import resend
+    resend.Emails.send = lambda params: {"id": "budget-test"}  # Never send real email from the harness
+
+    import main as app_module
+    from database import engine
+    from fastapi.testclient import TestClient
+
+    counter = StatementCounter(engine)
+    failures = []
+
+    missing = route_keys(app_module.app) - set(QUERY_BUDGETS)
+    for key in sorted(missing):
+        failures.append(f"{key}: no query budget defined")
+
+    covered = set()
+    print(f"\n{'route':<70}{'case':<30}{'queries':>8}{'budget':>8}")
+    with TestClient(app_module.app) as client:
+        for key, label, method, path, kwargs in scenarios():
+            if method == "WEBSOCKET":
+                response = SocketTurn(client, counter, path, **kwargs)
+            else:
+                with counter:
+                    response = client.request(method, path, **kwargs)
+            count = len(counter.statements)
+            budget = QUERY_BUDGETS.get(key)
+            covered.add(key)
+            status = "" if response.status_code < 400 else f"  (HTTP {response.status_code})"
+            print(f"{key:<70}{label:<30}{count:>8}{budget if budget is not None else '-':>8}{status}")
+
+            if response.status_code >= 400:
+                failures.append(f"{key} [{label}]: HTTP {response.status_code} {response.text[:200]}")
+            if budget is not None and count > budget:
+                failures.append(f"{key} [{label}]: {count} queries, budget {budget}")
+                if args.verbose:
+                    for statement in counter.statements:
+                        print(f"      {' '.join(statement.split())[:160]}")
+
+    for key in sorted(route_keys(app_module.app) - covered):
+        failures.append(f"{key}: no scenario exercises this route")
+
+    fake_server.shutdown()
+
+    if failures:
+        print("\nQuery budget failures:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nAll routes within their query budgets.")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, default=2000)
+    parser.add_argument("--big-conversations", type=int, default=5000)
+    parser.add_argument("--big-leads", type=int, default=500)
+    parser.add_argument("--days", type=int, default=90, help="Days of analytics for the busiest tenant")
+    parser.add_argument("--verbose", action="store_true", help="Print the statements of routes over budget")
+    sys.exit(main(parser.parse_args()))
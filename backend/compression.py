@@ -0,0 +1,132 @@
+"""
+Response compression
+
+ASGI middleware that compresses responses for clients that accept it:
+Brotli when the optional `brotli` package is installed and the client sends
+`Accept-Encoding: br`, otherwise gzip. Bodies smaller than
+COMPRESSION_MIN_SIZE bytes (where headers would outweigh the savings),
+already-encoded responses and event streams are passed through untouched.
+
+Chat replies carry the whole conversation history, so long conversations
+shrink several-fold on the wire for guests on mobile connections.
+"""
+
+import gzip
+import os
+import zlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 500))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))  # 4-5 is close to gzip's speed with better ratios
+
+# Already compressed, or must reach the client as soon as each chunk is written
+SKIP_CONTENT_TYPES = ("text/event-stream", "image/", "video/", "audio/", "application/zip", "application/gzip", "font/woff")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best encoding both sides support, from an Accept-Encoding header"""
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip()] = quality
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class _StreamCompressor:
+    """Incremental compressor for responses sent in several chunks"""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._compress, self._finish = self._compressor.process, self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip container
+            self._compress, self._finish = self._compressor.compress, self._compressor.flush
+
+    def chunk(self, data: bytes, last: bool) -> bytes:
+        return self._compress(data) + (self._finish() if last else b"")
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"accept-encoding"), "")
+        encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None  # Set once a multi-chunk response is being compressed
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message  # Held until the first body chunk shows whether to compress
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is not None:
+                await send({"type": "http.response.body", "body": compressor.chunk(body, not more_body), "more_body": more_body})
+                return
+
+            headers = {k.lower(): v for k, v in start.get("headers", [])}
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            if (
+                b"content-encoding" in headers
+                or content_type.startswith(SKIP_CONTENT_TYPES)
+                or (not more_body and len(body) < self.minimum_size)
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            raw_headers = [(k, v) for k, v in start.get("headers", []) if k.lower() not in (b"content-length", b"vary")]
+            vary = headers.get(b"vary")
+            raw_headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+            raw_headers.append((b"content-encoding", encoding.encode()))
+            if more_body:
+                compressor = _StreamCompressor(encoding)
+                await send({**start, "headers": raw_headers})
+                await send({"type": "http.response.body", "body": compressor.chunk(body, False), "more_body": True})
+            else:
+                compressed = compress(body, encoding)
+                raw_headers.append((b"content-length", str(len(compressed)).encode()))
+                await send({**start, "headers": raw_headers})
+                await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
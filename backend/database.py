@@ -2,12 +2,20 @@
 Database models for Napa Concierge multi-tenant SaaS
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import create_engine, inspect, text, Column, Integer, String, Text, DateTime, Boolean, Float, ForeignKey, JSON, Index, LargeBinary
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
+import hashlib
+import logging
 import os
 import secrets
+import time
+
+from metrics import instrument_engine, observe_pool_wait
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./napa_concierge.db")
 
@@ -16,6 +24,7 @@ if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -48,6 +57,21 @@ class Business(Base):
     # Custom AI knowledge for this business
     custom_knowledge = Column(Text)  # Business-specific info for the AI prompt
 
+    # Share of LLM capacity when the outbound queue is contended (see scheduler.py)
+    llm_weight = Column(Integer, default=1)
+
+    # Per-route model overrides, e.g. {"simple": {"model": "...", "max_tokens": 300}} (see routing.py)
+    model_routing = Column(JSON)
+
+    # One-tap starter questions shown by the widget (None: defaults for the business type; see starters.py)
+    starter_prompts = Column(JSON)
+
+    # Days to keep conversation transcripts before archiving (None: RETENTION_DAYS, 0: forever; see retention.py)
+    retention_days = Column(Integer)
+
+    # Set when deletion was requested; the row goes away once a background job has removed its data
+    deleted_at = Column(DateTime)
+
     # Status
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -60,6 +84,11 @@ class Business(Base):
 class Conversation(Base):
     """A chat conversation session"""
     __tablename__ = "conversations"
+    __table_args__ = (
+        Index("ix_conversations_business_last_message", "business_id", "last_message_at"),
+        # One conversation per session, so a write race fails loudly instead of splitting the transcript
+        Index("uq_conversations_business_session", "business_id", "session_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     business_id = Column(Integer, ForeignKey("businesses.id"), nullable=False)
@@ -81,9 +110,28 @@ class Conversation(Base):
     business = relationship("Business", back_populates="conversations")
 
 
+class ArchivedConversation(Base):
+    """Cold storage for conversations past their business's retention (ARCHIVE_TARGET=table)"""
+    __tablename__ = "archived_conversations"
+    __table_args__ = (Index("ix_archived_conversations_business_started", "business_id", "started_at"),)
+
+    id = Column(Integer, primary_key=True)  # Same id the conversation had in the hot table
+    business_id = Column(Integer, nullable=False)
+    session_id = Column(String(64))
+    started_at = Column(DateTime)
+    last_message_at = Column(DateTime)
+    message_count = Column(Integer)
+    messages = Column(JSON)
+    visitor_ip = Column(String(45))
+    user_agent = Column(String(500))
+    referrer = Column(String(500))
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
 class Lead(Base):
     """Captured lead information from chat"""
     __tablename__ = "leads"
+    __table_args__ = (Index("ix_leads_business_email", "business_id", "email"),)  # Lead deduplication
 
     id = Column(Integer, primary_key=True, index=True)
     business_id = Column(Integer, ForeignKey("businesses.id"), nullable=False)
@@ -115,11 +163,68 @@ class Analytics(Base):
     total_conversations = Column(Integer, default=0)
     total_messages = Column(Integer, default=0)
     unique_visitors = Column(Integer, default=0)
+    visitor_sketch = Column(LargeBinary)  # HyperLogLog over visitor fingerprints (see sketches.py)
     leads_captured = Column(Integer, default=0)
 
     # Popular topics (stored as JSON)
     top_topics = Column(JSON, default=list)
 
+    # LLM usage (latency totals divide by total_messages for averages)
+    input_tokens = Column(Integer, default=0)
+    output_tokens = Column(Integer, default=0)
+    cache_creation_tokens = Column(Integer, default=0)
+    cache_read_tokens = Column(Integer, default=0)
+    llm_cost_usd = Column(Float, default=0.0)
+    llm_latency_ms_total = Column(Float, default=0.0)
+    response_latency_ms_total = Column(Float, default=0.0)
+
+
+class TenantSummary(Base):
+    """Per-business activity over the last 7 and 30 days, rebuilt periodically from Analytics (see reports.py)"""
+    __tablename__ = "tenant_summaries"
+    __table_args__ = (Index("ix_tenant_summaries_messages_30d", "messages_30d"),)
+
+    business_id = Column(Integer, ForeignKey("businesses.id"), primary_key=True)
+
+    conversations_7d = Column(Integer, default=0)
+    messages_7d = Column(Integer, default=0)
+    leads_7d = Column(Integer, default=0)
+    tokens_7d = Column(Integer, default=0)
+    cost_usd_7d = Column(Float, default=0.0)
+
+    conversations_30d = Column(Integer, default=0)
+    messages_30d = Column(Integer, default=0)
+    leads_30d = Column(Integer, default=0)
+    tokens_30d = Column(Integer, default=0)
+    cost_usd_30d = Column(Float, default=0.0)
+
+    last_activity_at = Column(DateTime)  # Day of the most recent message
+    refreshed_at = Column(DateTime)
+
+
+class MessageUsage(Base):
+    """Token usage and latency for one assistant reply"""
+    __tablename__ = "message_usage"
+    __table_args__ = (Index("ix_message_usage_business_created", "business_id", "created_at"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    business_id = Column(Integer, ForeignKey("businesses.id"), nullable=False)
+    conversation_id = Column(Integer, ForeignKey("conversations.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    route = Column(String(20))  # "simple" or "complex" (see routing.py); "starter" for starter answers (no conversation)
+    model = Column(String(100))
+    attempts = Column(Integer, default=1)
+
+    input_tokens = Column(Integer, default=0)
+    output_tokens = Column(Integer, default=0)
+    cache_creation_tokens = Column(Integer, default=0)
+    cache_read_tokens = Column(Integer, default=0)
+    cost_usd = Column(Float, default=0.0)
+
+    llm_latency_ms = Column(Float)  # Claude call including retries
+    response_latency_ms = Column(Float)  # Whole /chat request
+
 
 class ContractSignature(Base):
     """Signed service agreements from clients"""
@@ -142,15 +247,80 @@ class ContractSignature(Base):
     user_agent = Column(String(500))
 
 
+class SchemaState(Base):
+    """Fingerprint of the models the database was last migrated to"""
+    __tablename__ = "schema_state"
+
+    id = Column(Integer, primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+def schema_fingerprint() -> str:
+    """Hash of every table, column and index the models define"""
+    parts = []
+    for table in Base.metadata.sorted_tables:
+        parts += [f"{table.name}.{column.name}:{column.type!r}" for column in table.columns]
+        parts += sorted(f"{table.name}#{index.name}" for index in table.indexes)
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
 def init_db():
-    """Create all tables"""
+    """Create tables and add new columns; a single query when the schema is already current"""
+    fingerprint = schema_fingerprint()
+    try:
+        with engine.connect() as conn:
+            if conn.execute(text("SELECT fingerprint FROM schema_state WHERE id = 1")).scalar() == fingerprint:
+                return
+    except DBAPIError:
+        pass  # First boot: schema_state doesn't exist yet
+
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    add_missing_indexes()
+    with engine.begin() as conn:
+        conn.execute(SchemaState.__table__.delete())
+        conn.execute(SchemaState.__table__.insert().values(id=1, fingerprint=fingerprint, updated_at=datetime.utcnow()))
+
+
+def add_missing_columns():
+    """Add columns introduced after a table was first created (create_all only creates new tables)"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
+def add_missing_indexes():
+    """Create indexes added to tables that already existed"""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                with engine.begin() as conn:
+                    index.create(conn)
+            except DBAPIError:
+                if not index.unique:
+                    raise
+                # Rows that already break it (or a partitioned table, where it would need the partition key)
+                logger.warning("Unique index %s not created on %s; the app works without it", index.name, table.name, exc_info=True)
 
 
 def get_db():
     """Dependency for getting database session"""
     db = SessionLocal()
     try:
+        # Check out the connection up front so pool wait time is measurable
+        started = time.perf_counter()
+        db.connection()
+        observe_pool_wait(time.perf_counter() - started)
         yield db
     finally:
         db.close()
@@ -0,0 +1,113 @@
+"""
+Request deduplication for /chat and /lead
+
+Flaky mobile networks make the widget retry, and impatient guests tap twice.
+Requests carrying the same `Idempotency-Key` header (scoped to the business
+and route) run once: the first one claims the key in the shared store, and
+its result is kept for IDEMPOTENCY_TTL seconds so retries get it back
+without another LLM call, Lead row or analytics update. Duplicates that
+arrive while the first is still running wait for it instead of starting
+their own: in the same worker they share its future, across workers they
+poll the store. Without the header the request body itself is the key
+(for /chat only when it names a session), so older widgets still get
+identical double submits collapsed.
+
+Failures and "busy, try again" replies are not kept, so a retry after one
+runs for real. Reusing a key with a different request body is rejected.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from shared_state import store
+import metrics
+
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 600))  # Seconds a finished result is replayed
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", 60))  # Longest a duplicate waits for the original (above the LLM deadline)
+POLL_INTERVAL = 0.1
+
+
+def fingerprint(payload: Any) -> str:
+    """Stable hash of a request body"""
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class IdempotencyCache:
+    """Runs each (scope, key) once and replays its result"""
+
+    def __init__(self, ttl: int = IDEMPOTENCY_TTL, wait: float = IDEMPOTENCY_WAIT):
+        self.ttl = ttl
+        self.wait = wait
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.replayed = 0
+        self.coalesced = 0
+
+    def _claim(self, store_key: str, request_hash: str) -> Optional[dict]:
+        """None if this call now owns the key, else the record already there"""
+        if store.add(store_key, {"state": "pending", "fingerprint": request_hash}, ttl=self.wait):
+            return None
+        return store.get(store_key) or {"state": "gone"}
+
+    async def run(self, scope: str, key: str, request_hash: str, call: Callable[[], Awaitable[Any]],
+                  cacheable: Callable[[Any], bool] = lambda result: True) -> Tuple[Any, bool]:
+        """Result of `call` for this key, and whether it was replayed rather than computed"""
+        store_key = f"idempotency:{scope}:{hashlib.sha1(key.encode('utf-8')).hexdigest()}"
+
+        # Same worker: share the running call's outcome, exceptions included
+        future = self._inflight.get(store_key)
+        if future is not None:
+            self.coalesced += 1
+            try:
+                result = await asyncio.shield(future)
+                metrics.record_cache("idempotency", True)
+                return result, True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # This request was cancelled, not the one it was waiting on
+
+        deadline = time.monotonic() + self.wait
+        record = self._claim(store_key, request_hash)
+        while record is not None:
+            if record.get("fingerprint", request_hash) != request_hash:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+            if record["state"] == "done":
+                self.replayed += 1
+                metrics.record_cache("idempotency", True)
+                return record["result"], True
+            if time.monotonic() >= deadline:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+            # Another worker is running it; its record turns "done", or disappears if it failed
+            await asyncio.sleep(POLL_INTERVAL)
+            record = store.get(store_key) if record["state"] == "pending" else None
+            if record is None:
+                record = self._claim(store_key, request_hash)
+
+        metrics.record_cache("idempotency", False)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[store_key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            store.delete(store_key)
+            future.cancel()  # Duplicates waiting on it run the request themselves
+            raise
+        except Exception as e:
+            store.delete(store_key)
+            future.set_exception(e)
+            future.exception()  # Retrieved here so an uncoalesced failure isn't logged as unhandled
+            raise
+        finally:
+            del self._inflight[store_key]
+
+        if cacheable(result):
+            store.set(store_key, {"state": "done", "fingerprint": request_hash, "result": result}, ttl=self.ttl)
+        else:
+            store.delete(store_key)
+        future.set_result(result)
+        return result, False
@@ -0,0 +1,279 @@
+"""
+Lead extraction from chat transcripts
+
+The system prompt asks guests for an email or phone number, but a lead was
+only recorded when the widget's form posted to /lead. Guest messages that
+look like they contain contact details are now buffered by /chat (only a
+cheap pre-check runs on the request path) and a background task pulls
+emails, phone numbers and names out of them with compiled regexes. New leads
+are deduplicated against existing ones through the (business_id, email)
+index and inserted in bulk; no extra LLM call is made.
+
+backfill() runs the same extraction over stored conversations in keyset
+pages, for transcripts recorded before extraction existed.
+
+Leads for a business deleted in the meantime are discarded. A buffered batch
+whose write fails goes back to the front of the buffer for the next flush,
+as far as there is room.
+"""
+
+import asyncio
+import logging
+import os
+import re
+from collections import deque
+from datetime import datetime, date
+from typing import Iterable, List, Optional
+
+from sqlalchemy import or_
+from starlette.concurrency import run_in_threadpool
+
+from topics import classify_topics
+
+logger = logging.getLogger(__name__)
+
+LEAD_FLUSH_INTERVAL = float(os.getenv("LEAD_FLUSH_INTERVAL", 5))
+LEAD_BUFFER_SIZE = int(os.getenv("LEAD_BUFFER_SIZE", 5000))
+BACKFILL_BATCH_SIZE = int(os.getenv("LEAD_BACKFILL_BATCH_SIZE", 1000))
+
+EXTRACTED_NOTE = "Extracted from chat"
+
+EMAIL_PATTERN = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+# North American numbers: optional +1, then 3-3-4 digits with optional (), spaces, dots or dashes
+PHONE_PATTERN = re.compile(r"(?<![\d@])(?:\+?1[\s.-]?)?\(?([2-9]\d{2})\)?[\s.-]?(\d{3})[\s.-]?(\d{4})(?!\d)")
+NAME_PATTERN = re.compile(
+    r"\b(?i:my name is|name's|i am|i'm|im|this is|call me)\s+([A-Z][a-z'-]+(?:\s+[A-Z][a-z'-]+)?)"
+)
+# Capitalized words that follow "I'm"/"this is" without being names
+NOT_NAMES = {
+    "Looking", "Interested", "Here", "Staying", "Visiting", "Not", "So", "Just", "Going", "Traveling", "Travelling",
+    "Planning", "Sure", "Good", "Great", "Fine", "Ok", "Okay", "Hoping", "Trying", "Wondering", "Coming", "Celebrating",
+    "Napa", "The", "A", "An", "It", "That", "What", "Perfect", "Amazing", "Awesome", "Thanks", "Happy", "Excited",
+}
+_CONTACT_HINT = re.compile(r"@|\d{3}")
+
+
+def has_contact_hint(message: str) -> bool:
+    """Cheap check for whether a message could hold an email or phone number"""
+    return _CONTACT_HINT.search(message) is not None
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """North American numbers as 707-555-1234, so chat and form entries match; others stripped as given"""
+    if not phone or not phone.strip():
+        return None
+    match = PHONE_PATTERN.search(phone)
+    return "-".join(match.groups()) if match else phone.strip()
+
+
+def extract_contact(texts: Iterable[str]) -> Optional[dict]:
+    """Name, email and phone from a guest's messages (latest mention wins); None if there is no email or phone"""
+    name = email = phone = None
+    for text in texts:
+        for match in EMAIL_PATTERN.finditer(text):
+            email = match.group(0).lower()
+        for match in PHONE_PATTERN.finditer(text):
+            phone = "-".join(match.groups())
+        for match in NAME_PATTERN.finditer(text):
+            words = match.group(1).split()
+            if words[0] not in NOT_NAMES:
+                name = " ".join(w for w in words if w not in NOT_NAMES)
+    if not email and not phone:
+        return None
+    return {"name": name, "email": email, "phone": phone}
+
+
+def lead_from_messages(business_id: int, conversation_id: Optional[int], user_messages: List[str], created_at: datetime) -> Optional[dict]:
+    """A Lead row (as a dict) for a conversation's user messages, or None"""
+    contact = extract_contact(user_messages)
+    if contact is None:
+        return None
+    topics = classify_topics(" ".join(user_messages))
+    return {
+        "business_id": business_id,
+        "conversation_id": conversation_id,
+        **contact,
+        "interest": ", ".join(topics[:3]) or None,
+        "notes": EXTRACTED_NOTE,
+        "created_at": created_at,
+    }
+
+
+def insert_new_leads(db, candidates: List[dict]) -> List[dict]:
+    """Insert the candidates that don't match an existing lead by email or phone; the caller commits"""
+    from database import Business, Lead
+
+    if not candidates:
+        return []
+    # A business deleted since these messages were sent gets no leads
+    business_ids = {business_id for (business_id,) in db.query(Business.id).filter(
+        Business.id.in_({lead["business_id"] for lead in candidates}), Business.deleted_at.is_(None)
+    )}
+
+    # Later mentions in the same batch replace earlier ones for the same contact
+    unique = {}
+    for lead in candidates:
+        if lead["business_id"] in business_ids:
+            unique[(lead["business_id"], lead["email"] or lead["phone"])] = lead
+    if not unique:
+        return []
+
+    emails = {lead["email"] for lead in unique.values() if lead["email"]}
+    phones = {lead["phone"] for lead in unique.values() if lead["phone"]}
+    existing = set()
+    conditions = []
+    if emails:
+        conditions.append(Lead.email.in_(emails))
+    if phones:
+        conditions.append(Lead.phone.in_(phones))
+    for business_id, email, phone in db.query(Lead.business_id, Lead.email, Lead.phone).filter(
+        Lead.business_id.in_(business_ids), or_(*conditions)
+    ):
+        if email:
+            existing.add((business_id, email.lower()))
+        if phone:
+            existing.add((business_id, phone))
+
+    # Either detail already on file means it's the same guest (e.g. a phone-only lead now giving an email)
+    new = [
+        lead for lead in unique.values()
+        if (lead["business_id"], lead["email"]) not in existing and (lead["business_id"], lead["phone"]) not in existing
+    ]
+    if new:
+        db.execute(Lead.__table__.insert(), new)
+    return new
+
+
+class LeadExtractor:
+    """Buffers guest messages that may contain contact details and turns them into leads in the background"""
+
+    def __init__(self, buffer_size: int = LEAD_BUFFER_SIZE):
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self.dropped = 0
+
+    def submit(self, business_id: int, conversation_id: int, user_messages: List[str]):
+        """Queue a conversation's user messages if the latest one could hold contact details"""
+        if not user_messages or not has_contact_hint(user_messages[-1]):
+            return
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append((business_id, conversation_id, user_messages, datetime.utcnow()))
+
+    def _requeue(self, entries: list):
+        """Put a failed batch back at the front, oldest first, dropping the oldest if there isn't room"""
+        room = self._buffer.maxlen - len(self._buffer)
+        retry = entries[len(entries) - room:] if room < len(entries) else entries
+        self.dropped += len(entries) - len(retry)
+        self._buffer.extendleft(reversed(retry))
+
+    def flush_sync(self) -> int:
+        """Extract and store leads for everything buffered; returns leads created"""
+        from reports import invalidate_reports
+
+        entries = []
+        while self._buffer:
+            entries.append(self._buffer.popleft())
+        candidates = [lead for lead in (lead_from_messages(*entry) for entry in entries) if lead]
+        if not candidates:
+            return 0
+
+        try:
+            created = self._write(candidates)
+        except Exception:
+            self._requeue(entries)
+            raise
+        for business_id in {lead["business_id"] for lead in created}:
+            invalidate_reports(business_id)
+        return len(created)
+
+    def _write(self, candidates: List[dict]) -> List[dict]:
+        """Insert new leads and count them in today's Analytics; returns the leads created"""
+        from database import SessionLocal, Analytics
+
+        db = SessionLocal()
+        try:
+            created = insert_new_leads(db, candidates)
+            today = datetime.combine(date.today(), datetime.min.time())
+            per_business = {}
+            for lead in created:
+                per_business[lead["business_id"]] = per_business.get(lead["business_id"], 0) + 1
+            for business_id, count in per_business.items():
+                analytics = db.query(Analytics).filter(
+                    Analytics.business_id == business_id, Analytics.date == today
+                ).with_for_update().first()
+                if analytics is None:
+                    analytics = Analytics(business_id=business_id, date=today, total_conversations=0, total_messages=0, unique_visitors=0, leads_captured=0)
+                    db.add(analytics)
+                analytics.leads_captured = (analytics.leads_captured or 0) + count
+            db.commit()
+        finally:
+            db.close()
+        return created
+
+    async def flush(self) -> int:
+        return await run_in_threadpool(self.flush_sync)
+
+    async def run(self, interval: float = LEAD_FLUSH_INTERVAL):
+        """Background loop started with the app"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Lead extraction failed")
+
+
+def backfill_batch(db, after_id: int = 0, business_id: Optional[int] = None, batch_size: int = BACKFILL_BATCH_SIZE) -> dict:
+    """Extract leads from the next keyset page of stored conversations and commit them
+
+    Backfilled leads are dated by the conversation's last message and are not
+    added to daily analytics, which only count leads as they arrive.
+    """
+    from database import Conversation
+    from reports import invalidate_reports
+
+    query = db.query(
+        Conversation.id, Conversation.business_id, Conversation.messages, Conversation.last_message_at
+    ).filter(Conversation.id > after_id)
+    if business_id is not None:
+        query = query.filter(Conversation.business_id == business_id)
+    rows = query.order_by(Conversation.id).limit(batch_size).all()
+
+    candidates = []
+    for row in rows:
+        user_messages = [
+            m["content"] for m in row.messages or []
+            if m.get("role") == "user" and isinstance(m.get("content"), str)
+        ]
+        if any(has_contact_hint(text) for text in user_messages):
+            lead = lead_from_messages(row.business_id, row.id, user_messages, row.last_message_at or datetime.utcnow())
+            if lead:
+                candidates.append(lead)
+    created = insert_new_leads(db, candidates)
+    db.commit()
+    for business_id in {lead["business_id"] for lead in created}:
+        invalidate_reports(business_id)
+    return {
+        "conversations_scanned": len(rows),
+        "leads_created": len(created),
+        # None once every conversation has been scanned
+        "next_after_id": rows[-1].id if len(rows) == batch_size else None,
+    }
+
+
+def backfill(business_id: Optional[int] = None, batch_size: int = BACKFILL_BATCH_SIZE) -> dict:
+    """Extract leads from all stored conversations, one page per transaction"""
+    from database import SessionLocal
+
+    totals = {"conversations_scanned": 0, "leads_created": 0}
+    after_id = 0
+    db = SessionLocal()
+    try:
+        while after_id is not None:
+            page = backfill_batch(db, after_id, business_id, batch_size)
+            totals["conversations_scanned"] += page["conversations_scanned"]
+            totals["leads_created"] += page["leads_created"]
+            after_id = page["next_after_id"]
+    finally:
+        db.close()
+    return totals
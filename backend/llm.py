@@ -0,0 +1,303 @@
+"""
+Resilient wrapper around the Anthropic Messages API
+
+Transient failures (429, 5xx, 529 overloaded, timeouts, dropped connections)
+are retried with jittered exponential backoff inside an overall deadline. A
+per-model circuit breaker stops hammering a model that keeps failing, and
+calls fall back to a faster/cheaper model when the primary is unavailable.
+Optionally, a hedged duplicate request is sent when the first attempt is slow.
+With streaming on, each attempt also records time to first token, and an
+`on_text` callback can receive the reply's text as it is generated.
+
+The anthropic SDK takes about a second to import, so it is only imported when
+the client is first needed (see `client_factory`).
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    import anthropic
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class LLMUnavailable(Exception):
+    """Raised when every attempt (including fallbacks) failed within the deadline"""
+
+    def __init__(self, message: str, attempts: List[dict]):
+        super().__init__(message)
+        self.attempts = attempts
+
+
+class LLMAttemptTimeout(Exception):
+    """A single attempt ran past its share of the deadline"""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an error is worth another attempt"""
+    import anthropic
+
+    if isinstance(error, (anthropic.APIConnectionError, LLMAttemptTimeout)):
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; lets one trial call through after the cooldown"""
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_in_flight or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+
+class LLMResult:
+    """Response plus the attempts it took to get it"""
+
+    def __init__(self, response, model: str, attempts: List[dict], latency: float, ttft: Optional[float] = None):
+        self.response = response
+        self.model = model
+        self.attempts = attempts
+        self.latency = latency
+        self.ttft = ttft  # Seconds to first token of the winning attempt (streaming only)
+
+
+class ResilientLLMClient:
+    """Retries, deadline, circuit breaking, hedging and model fallback for messages.create"""
+
+    def __init__(
+        self,
+        client: Optional["anthropic.AsyncAnthropic"] = None,
+        fallback_model: Optional[str] = None,
+        max_retries: int = 2,
+        deadline: float = 30.0,
+        attempt_timeout: Optional[float] = None,
+        hedge_after: Optional[float] = None,
+        backoff_base: float = 0.25,
+        backoff_max: float = 4.0,
+        breaker_threshold: int = 5,
+        breaker_cooldown: float = 30.0,
+        stream: bool = False,
+        client_factory: Optional[Callable[[], "anthropic.AsyncAnthropic"]] = None,
+    ):
+        if client is None and client_factory is None:
+            raise ValueError("Pass either client or client_factory")
+        self._client = client
+        self._client_factory = client_factory
+        self.fallback_model = fallback_model or None
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.hedge_after = hedge_after or None
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.stream = stream
+
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._stats: Dict[str, dict] = {}
+        self._requests = 0
+        self._fallbacks = 0
+        self._unavailable = 0
+
+    @property
+    def client(self) -> "anthropic.AsyncAnthropic":
+        """The SDK client, built by client_factory on first use"""
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    def _breaker(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+        return breaker
+
+    def _model_stats(self, model: str) -> dict:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = {"attempts": 0, "ok": 0, "errors": 0, "hedges": 0, "hedge_wins": 0, "latency_total": 0.0}
+        return stats
+
+    def _backoff(self, retry: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** retry)))
+
+    async def create(self, *, model: str, on_text: Optional[Callable[[Optional[str]], Awaitable[None]]] = None, **kwargs) -> LLMResult:
+        """messages.create with retries and fallback; raises LLMUnavailable when out of options
+
+        With streaming on, `on_text` gets each text delta of the attempt being streamed, and
+        None when a failed attempt already sent text that a retry is about to replace.
+        Hedged duplicates aren't streamed; the returned response is always the full reply.
+        """
+        self._requests += 1
+        started = time.monotonic()
+        deadline_at = started + self.deadline
+        attempts: List[dict] = []
+        streamed = {"text": False}
+
+        models = [model]
+        if self.fallback_model and self.fallback_model != model:
+            models.append(self.fallback_model)
+
+        for candidate in models:
+            breaker = self._breaker(candidate)
+            for retry in range(self.max_retries + 1):
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                if not breaker.allow():
+                    attempts.append({"model": candidate, "outcome": "circuit_open", "latency_ms": 0.0})
+                    break
+
+                timeout = min(remaining, self.attempt_timeout or remaining)
+                try:
+                    response, record = await self._attempt(candidate, kwargs, timeout, attempts, on_text, streamed)
+                except Exception as e:
+                    if not is_retryable(e):
+                        breaker.record_success()  # The model answered; the request was bad
+                        raise
+                    breaker.record_failure()
+                    logger.warning("LLM attempt on %s failed (%s), retry %d", candidate, type(e).__name__, retry)
+                    if retry < self.max_retries:
+                        await asyncio.sleep(min(self._backoff(retry), max(0.0, deadline_at - time.monotonic())))
+                    continue
+
+                breaker.record_success()
+                if candidate != model:
+                    self._fallbacks += 1
+                ttft = record["ttft_ms"] / 1000 if record.get("ttft_ms") is not None else None
+                return LLMResult(response, candidate, attempts, time.monotonic() - started, ttft)
+
+        self._unavailable += 1
+        raise LLMUnavailable(f"LLM unavailable after {len(attempts)} attempts", attempts)
+
+    async def _attempt(self, model: str, kwargs: dict, timeout: float, attempts: List[dict], on_text=None, streamed: Optional[dict] = None):
+        """One logical attempt, optionally hedged; returns (response, attempt record)"""
+        stats = self._model_stats(model)
+
+        async def call(hedged: bool):
+            start = time.monotonic()
+            stats["attempts"] += 1
+            if hedged:
+                stats["hedges"] += 1
+            record = {"model": model, "hedged": hedged, "outcome": "ok", "latency_ms": 0.0}
+            attempts.append(record)
+            try:
+                if self.stream:
+                    async with self.client.messages.stream(model=model, **kwargs) as stream:
+                        async for event in stream:
+                            if event.type != "text":
+                                continue
+                            if "ttft_ms" not in record:
+                                record["ttft_ms"] = round(1000 * (time.monotonic() - start), 1)
+                                if on_text is not None and not hedged and streamed["text"]:
+                                    await on_text(None)  # Discard what an earlier attempt streamed
+                            if on_text is not None and not hedged:
+                                streamed["text"] = True
+                                await on_text(event.text)
+                        response = await stream.get_final_message()
+                else:
+                    response = await self.client.messages.create(model=model, **kwargs)
+            except asyncio.CancelledError:
+                record["outcome"] = "cancelled"
+                raise
+            except Exception as e:
+                record["outcome"] = type(e).__name__
+                stats["errors"] += 1
+                raise
+            finally:
+                elapsed = time.monotonic() - start
+                record["latency_ms"] = round(1000 * elapsed, 1)
+            stats["ok"] += 1
+            stats["latency_total"] += elapsed
+            if hedged:
+                stats["hedge_wins"] += 1
+            return response, record
+
+        attempt_deadline = time.monotonic() + timeout
+        pending = {asyncio.ensure_future(call(False))}
+        hedge_pending = self.hedge_after is not None and self.hedge_after < timeout
+        last_error: Optional[BaseException] = None
+
+        try:
+            while pending:
+                wait_for = attempt_deadline - time.monotonic()
+                if hedge_pending:
+                    wait_for = min(wait_for, self.hedge_after)
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, wait_for), return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+
+                if not done and hedge_pending:
+                    hedge_pending = False
+                    pending.add(asyncio.ensure_future(call(True)))
+                elif not done:
+                    raise LLMAttemptTimeout(f"No response from {model} within {timeout:.1f}s")
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise last_error
+
+    def stats(self) -> dict:
+        """Attempt counts, latency and breaker state per model"""
+        return {
+            "requests": self._requests,
+            "fallbacks": self._fallbacks,
+            "unavailable": self._unavailable,
+            "models": {
+                model: {
+                    "attempts": s["attempts"],
+                    "ok": s["ok"],
+                    "errors": s["errors"],
+                    "hedges": s["hedges"],
+                    "hedge_wins": s["hedge_wins"],
+                    "avg_latency_ms": round(1000 * s["latency_total"] / s["ok"], 1) if s["ok"] else 0.0,
+                    "circuit": self._breaker(model).state,
+                }
+                for model, s in self._stats.items()
+            },
+        }
@@ -3,24 +3,56 @@ Napa Valley AI Concierge - Multi-tenant SaaS Backend
 Pro Package: Analytics, Lead Capture, Custom Branding
 """
 
-from fastapi import FastAPI, HTTPException, Depends, Header, Request
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.datastructures import Default
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from anthropic import Anthropic
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import HTTPConnection
+from pydantic import BaseModel, ConfigDict, PositiveInt
 from dotenv import load_dotenv
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from typing import Optional
 from datetime import datetime, date
+import asyncio
+import contextvars
+import json
+import logging
 import os
 import secrets
+import time
 
-from database import (
-    init_db, get_db, Business, Conversation, Lead, Analytics, ContractSignature, generate_api_key
-)
-
+# Before the local imports: they read their settings from the environment at import time
 load_dotenv()
 
-app = FastAPI(title="Napa Valley AI Concierge - Pro")
+from database import (
+    init_db, get_db, SessionLocal, Business, Conversation, Lead, Analytics, ContractSignature, MessageUsage, TenantSummary, generate_api_key
+)
+from scheduler import LLMScheduler, LLMQueueTimeout, LLMQueueFull
+from llm import ResilientLLMClient, LLMUnavailable
+from routing import ModelRouter, DEFAULT_ROUTES, estimate_cost
+from prompts import render_system_prompt
+from shared_state import store, worker_count
+from compression import CompressionMiddleware
+from responses import ORJSONResponse
+from sketches import HyperLogLog, visitor_fingerprint
+from topics import TopicTracker, merge_top_topics
+from reports import PERIODS, count_unique_visitors, get_report, get_reports, invalidate_reports, report_email, summarize_usage
+import reports
+from leads import LeadExtractor, BACKFILL_BATCH_SIZE, backfill_batch as backfill_leads_page, normalize_phone
+from idempotency import IdempotencyCache, fingerprint
+from session_locks import SessionLocks
+from realtime import Relay
+from widget_assets import WidgetAssets
+from starters import ConversationWriter, cached_answers, generate_answers, normalize, starter_answer, starter_questions, starters_version
+import retention
+import metrics
+import tracing
+
+logger = logging.getLogger("napa_concierge")
+
+# orjson for plain dict responses; wrapped in Default() so response_model routes like /chat keep Pydantic's dump_json
+app = FastAPI(title="Napa Valley AI Concierge - Pro", default_response_class=Default(ORJSONResponse))
 
 # Allow CORS for widget embedding on any domain
 app.add_middleware(
@@ -29,182 +61,155 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Idempotent-Replayed"],
 )
 
-# Initialize database on startup
+# gzip (or Brotli) for responses over COMPRESSION_MIN_SIZE; chat replies carry the whole history
+app.add_middleware(CompressionMiddleware)
+
+@app.middleware("http")
+async def track_request_metrics(request: Request, call_next):
+    """Per-route latency, in-flight gauge and DB query counts for every request"""
+    started = time.perf_counter()
+    db_stats = metrics.start_request_db_stats(request.scope)
+    metrics.HTTP_IN_FLIGHT.inc()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        metrics.HTTP_IN_FLIGHT.dec()
+        route_label = metrics.route_label(request.scope)
+        metrics.HTTP_REQUEST_DURATION.labels(route_label, request.method, str(status_code)).observe(time.perf_counter() - started)
+        metrics.DB_QUERIES_PER_REQUEST.labels(route_label).observe(db_stats["queries"])
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Root span per request plus a Server-Timing header summarizing its stages"""
+    root = tracing.start_trace(
+        f"{request.method} {request.url.path}",
+        request.headers.get("traceparent"),
+        **{"http.method": request.method, "http.target": request.url.path}
+    )
+    try:
+        response = await call_next(request)
+    except Exception:
+        root.status_error = True
+        tracing.end_trace(root)
+        raise
+
+    route = metrics.route_label(request.scope)
+    root.name = f"{request.method} {route}"
+    root.set_attributes(**{"http.route": route, "http.status_code": response.status_code})
+    root.end()
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = tracing.server_timing(root)
+    tracing.end_trace(root)
+    return response
+
+# Initialize database on startup (a single query when the schema is already current)
 @app.on_event("startup")
 async def startup():
     init_db()
+    # Import the anthropic SDK off the event loop once the server is accepting requests
+    asyncio.get_running_loop().run_in_executor(None, lambda: llm.client)
+    asyncio.get_running_loop().run_in_executor(None, widget_assets.get, "loader.js")
+    if worker_count() > LLM_MAX_CONCURRENCY:
+        logger.warning(
+            "WEB_CONCURRENCY=%d exceeds LLM_MAX_CONCURRENCY=%d; up to %d LLM calls can run at once",
+            worker_count(), LLM_MAX_CONCURRENCY, worker_count()
+        )
+    if retention.archive_config_error():
+        logger.error("Transcripts won't be archived: %s", retention.archive_config_error())
+    if retention.ARCHIVE_INTERVAL > 0:
+        background_tasks.add(asyncio.create_task(retention.retention_loop()))
+    if reports.SUMMARY_REFRESH_INTERVAL > 0:
+        background_tasks.add(asyncio.create_task(reports.summary_loop()))
+    background_tasks.add(asyncio.create_task(topic_tracker.run()))
+    background_tasks.add(asyncio.create_task(lead_extractor.run()))
+    background_tasks.add(asyncio.create_task(conversation_writer.run()))
+    background_tasks.add(asyncio.create_task(relay.run()))
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in background_tasks:
+        task.cancel()
+    # Don't lose conversations, topics or leads buffered since the last periodic flush
+    await conversation_writer.flush()
+    await topic_tracker.flush()
+    await lead_extractor.flush()
+
+# Long-running tasks started with the app (kept referenced so they aren't garbage collected)
+background_tasks = set()
+
+# Guest message topics are classified in the background, never on the /chat path
+topic_tracker = TopicTracker()
+
+# Contact details guests type into the chat become leads, also off the /chat path
+lead_extractor = LeadExtractor()
+
+# Conversations answered from cached starter answers are written in batches, off the /chat path
+conversation_writer = ConversationWriter()
+
+# Retried or double-submitted /chat and /lead requests run once and replay the stored result
+idempotency = IdempotencyCache()
+
+# Overlapping /chat turns of one session run one after the other (SESSION_LOCKS=advisory: across workers too)
+session_locks = SessionLocks()
+
+# Widget loader and hashed, minified, precompressed bundles, built from frontend/ once per process
+widget_assets = WidgetAssets()
+
+# Open widget sockets, and staff messages pushed to them from whichever worker took the admin request
+relay = Relay()
+
+def create_anthropic_client():
+    """Build the SDK client on first use; importing anthropic is the slowest part of startup"""
+    from anthropic import AsyncAnthropic
+    # Retries are handled by ResilientLLMClient, so the SDK's own retries are disabled
+    return AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"), max_retries=0)
+
+llm = ResilientLLMClient(
+    client_factory=create_anthropic_client,
+    fallback_model=os.getenv("LLM_FALLBACK_MODEL", "claude-3-5-haiku-20241022"),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", 2)),
+    deadline=float(os.getenv("LLM_DEADLINE", 30)),
+    attempt_timeout=float(os.getenv("LLM_ATTEMPT_TIMEOUT", 20)),
+    hedge_after=float(os.getenv("LLM_HEDGE_AFTER", 0)),
+    stream=os.getenv("LLM_STREAM", "true").lower() in ("1", "true", "yes"),
+    breaker_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", 5)),
+    breaker_cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", 30))
+)
+
+# Simple factual questions go to a faster model; LLM_ROUTES (JSON) overrides the default mapping
+model_router = ModelRouter(json.loads(os.getenv("LLM_ROUTES", "null")) or DEFAULT_ROUTES)
+
+# Outbound LLM calls are queued fairly per tenant behind a global concurrency cap,
+# split evenly between worker processes. Each worker gets at least one slot, so with
+# more workers than LLM_MAX_CONCURRENCY the fleet can run one call per worker (warned at startup)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+llm_scheduler = LLMScheduler(
+    max_concurrency=max(1, LLM_MAX_CONCURRENCY // worker_count()),
+    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", 20)),
+    max_queue_per_tenant=int(os.getenv("LLM_MAX_QUEUE_PER_TENANT", 50))
+)
+
+# Add a Server-Timing header (auth, conversation, prompt, llm, commit) to responses
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
 
-client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-
-# Admin API key for managing businesses
-ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "admin_" + secrets.token_urlsafe(16))
-
-BASE_SYSTEM_PROMPT = """You are a friendly, knowledgeable concierge for Napa Valley, California. You help hotel guests and visitors plan perfect wine country experiences.
-
-## CRITICAL RULES
-1. **ONLY recommend places that are actually in Napa Valley** (Napa, Yountville, St. Helena, Calistoga, Oakville, Rutherford, American Canyon). NEVER recommend places in San Francisco, Oakland, Sacramento, or other cities.
-2. **ALWAYS include clickable links** for every place you mention using the exact formats below.
-3. **Only recommend places you have specific knowledge about** - don't make up restaurants or businesses.
-
-## Your Personality
-- Warm and welcoming, like a knowledgeable local friend
-- Enthusiastic about Napa but honest about what fits each guest's preferences
-- Concise but helpful - respect people's time
-
-## Your Knowledge
-
-### Wine Regions & Styles
-- **Oakville/Rutherford**: Bold Cabernet Sauvignons, prestigious estates (Opus One, Robert Mondavi, Caymus)
-- **Stags Leap District**: Elegant Cabernets, famous for the 1976 Judgment of Paris
-- **Yountville**: Walkable, great restaurants, approachable wineries
-- **St. Helena**: Classic Napa, mix of historic and modern wineries
-- **Calistoga**: Northern Napa, warmer climate, great Zinfandels, hot springs
-- **Carneros**: Cooler climate, excellent Pinot Noir and Chardonnay, sparkling wines
-
-### Top Winery Recommendations by Style
-
-**First-Time Visitors (Great Intro Experiences):**
-- Robert Mondavi Winery - iconic, educational tours
-- Sterling Vineyards - aerial tram with valley views
-- Domaine Chandon - beautiful grounds, sparkling wine
-- V. Sattui - picnic grounds, no appointment needed
-
-**Luxury/Special Occasion:**
-- Opus One - architectural masterpiece, appointment only
-- HALL Wines - stunning art collection
-- Castello di Amorosa - medieval castle experience
-- Inglenook (Coppola's estate) - historic and grand
-
-**Hidden Gems/Off the Beaten Path:**
-- Frog's Leap - organic, fun atmosphere
-- Tres Sabores - small family winery, authentic
-- Smith-Madrone - mountain views, family-run since 1971
-- Matthiasson - focused, minimalist winemaking
-
-**Best Views:**
-- Sterling Vineyards - gondola ride
-- Artesa - modern architecture, Carneros views
-- Castello di Amorosa - castle on a hill
-- Pride Mountain - straddles Napa/Sonoma
-
-### Dining Recommendations
-
-**Fine Dining:**
-- The French Laundry (Yountville) - 3 Michelin stars, book months ahead
-- Meadowood Restaurant (St. Helena) - elegant, estate setting
-- Kenzo Napa (Napa) - Japanese-California fusion
-- Bottega (Yountville) - Michael Chiarello's Italian
-- Bouchon Bistro (Yountville) - Thomas Keller's French bistro
-
-**Farm-to-Table & American:**
-- Farmstead at Long Meadow Ranch (St. Helena) - farm-to-table
-- Goose & Gander (St. Helena) - great cocktails, gastropub
-- Mustards Grill (Yountville) - Napa classic since 1983
-- Cindy's Backstreet Kitchen (St. Helena) - comfort food
-- Gott's Roadside (multiple locations) - gourmet burgers
-
-**Mexican & Latin Restaurants in Napa Valley:**
-- La Taquiza (Napa) - 2007 Redwood Rd, fresh fish tacos, casual outdoor seating, great margaritas
-- Taqueria Maria (Napa) - 1781 Old Sonoma Rd, family-run since 1998, generous portions, great salsa bar
-- Villa Corona (St. Helena) - 1138 Main St, local favorite, traditional recipes, friendly atmosphere
-- Pancha's (Yountville) - 6764 Washington St, beloved for breakfast burritos, cash only, no-frills spot
-- La Luna Market & Taqueria (Rutherford) - 1153 Rutherford Rd, taqueria inside a local market, quick and delicious
-- Azteca Market (St. Helena) - 1245 Main St, great tamales and homemade tortillas
-- C Casa (Napa, Oxbow Market) - 610 1st St, modern Mexican, craft cocktails, inside Oxbow Public Market
-
-**Casual/Quick:**
-- Oxbow Public Market (Napa) - food hall with multiple vendors
-- Model Bakery (St. Helena & Yountville) - famous English muffins
-- Oakville Grocery - picnic supplies since 1881
-
-### Activities Beyond Wine
-
-- **Hot Air Balloons**: Napa Valley Balloons, Calistoga Balloons (book early morning)
-- **Napa Valley Wine Train**: Scenic rail journey with food/wine
-- **Calistoga Hot Springs**: Old Faithful Geyser, mud baths, spas
-- **Biking**: Napa Valley Vine Trail, rent bikes in Yountville
-- **Olive Oil Tasting**: Long Meadow Ranch, Round Pond
-- **Art**: di Rosa Center for Contemporary Art, Hess Collection
-
-### Practical Tips
-- Most wineries require reservations (especially since 2020)
-- Tasting fees: $30-100+ per person, often waived with purchase
-- Designate a driver or use Uber/taxi/tour company
-- Best months: September-October (harvest), March-May (mustard season)
-- Avoid Highway 29 on weekends - use Silverado Trail instead
-
-## How to Help Guests
-
-1. **Ask about preferences**: What wines do they like? Budget? Interests beyond wine?
-2. **Consider logistics**: How many days? Where are they staying? Transportation?
-3. **Build balanced itineraries**: Mix of experiences, don't over-schedule (3-4 wineries max/day)
-4. **Offer specific names**: Don't be vague - give actual winery/restaurant names
-5. **Mention booking requirements**: Many places need reservations
-
-When building itineraries, format them clearly with times and locations. Always ask follow-up questions to personalize recommendations.
-
-## IMPORTANT: Always Include Links
-
-EVERY place you mention MUST have a clickable link. Use these exact formats:
-
-### For places with known websites, use the website:
-- [Robert Mondavi Winery](https://www.robertmondaviwinery.com)
-- [The French Laundry](https://www.thomaskeller.com/tfl)
-- [Opus One](https://www.opusonewinery.com)
-- [Bottega](https://www.botteganapavalley.com)
-- [Mustards Grill](https://www.mustardsgrill.com)
-- [Gott's Roadside](https://www.gotts.com)
-- [Oxbow Public Market](https://www.oxbowpublicmarket.com)
-
-### For restaurants/places without a website, use Google Maps with the EXACT address:
-Format: `https://www.google.com/maps/search/FULL+ADDRESS+CITY+STATE`
-
-**Mexican Restaurant Links (use these exact links):**
-- [La Taquiza](https://www.google.com/maps/search/2007+Redwood+Rd+Napa+CA)
-- [Taqueria Maria](https://www.google.com/maps/search/1781+Old+Sonoma+Rd+Napa+CA)
-- [Villa Corona](https://www.google.com/maps/search/1138+Main+St+St+Helena+CA)
-- [Pancha's](https://www.google.com/maps/search/6764+Washington+St+Yountville+CA)
-- [La Luna Market & Taqueria](https://www.google.com/maps/search/1153+Rutherford+Rd+Rutherford+CA)
-- [Azteca Market](https://www.google.com/maps/search/1245+Main+St+St+Helena+CA)
-- [C Casa](https://www.google.com/maps/search/610+First+St+Napa+CA+Oxbow+Market)
-
-### Known Website URLs:
-**Wineries:**
-- Robert Mondavi: robertmondaviwinery.com
-- Opus One: opusonewinery.com
-- Domaine Chandon: chandon.com
-- Sterling Vineyards: sterlingvineyards.com
-- V. Sattui: vsattui.com
-- Castello di Amorosa: castellodiamorosa.com
-- HALL Wines: hallwines.com
-- Frog's Leap: frogsleap.com
-- Inglenook: inglenook.com
-- Artesa: artesawinery.com
-
-**Restaurants:**
-- The French Laundry: thomaskeller.com/tfl
-- Bouchon Bistro: thomaskeller.com/bouchonbistro
-- Bottega: botteganapavalley.com
-- Farmstead: longmeadowranch.com/eat-drink/farmstead-restaurant
-- Gott's Roadside: gotts.com
-- Mustards Grill: mustardsgrill.com
-- Oxbow Public Market: oxbowpublicmarket.com
-- Goose & Gander: goosegander.com
-
-**IMPORTANT:** If you don't have a specific address, use this format with the restaurant name AND city:
-`https://www.google.com/maps/search/Restaurant+Name+City+CA+Napa+Valley`
-
-Example: [Villa Corona](https://www.google.com/maps/search/Villa+Corona+St+Helena+CA)
-
-NEVER just link to a generic city or area - always include the business name and specific location.
-
-## Lead Capture
-
-If a guest seems very interested in booking something or wants to be contacted, politely ask if they'd like to share their email or phone number so the staff can follow up with them personally. Say something like: "Would you like me to have someone from our team reach out to help you book this? I can pass along your contact info."
-
-NEVER be pushy about this - only offer when it's genuinely helpful."""
+# Returned instead of an error when the LLM queue sheds a request
+BUSY_FALLBACK_MESSAGE = "I'm helping a lot of guests right now and couldn't get to your question in time. Please send it again in a moment - I'll be right with you!"
+
+# Returned instead of an error when every LLM attempt and fallback failed
+UNAVAILABLE_FALLBACK_MESSAGE = "I'm having trouble pulling up my wine country notes right now. Please try again in a minute, or ask the front desk - they'll be happy to help!"
+
+# Admin API key for managing businesses. A generated key is kept in the shared
+# store so every worker accepts the same one.
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+if not ADMIN_API_KEY:
+    store.add("admin_api_key", "admin_" + secrets.token_urlsafe(16))
+    ADMIN_API_KEY = store.get("admin_api_key")
 
 
 # ============== Pydantic Models ==============
@@ -227,6 +232,18 @@ class LeadCapture(BaseModel):
     interest: Optional[str] = None
     notes: Optional[str] = None
 
+class RouteOverride(BaseModel):
+    """A business's model and/or token budget for one route"""
+    model_config = ConfigDict(extra="forbid")
+    model: Optional[str] = None
+    max_tokens: Optional[PositiveInt] = None
+
+class ModelRouting(BaseModel):
+    """Per-route overrides stored in Business.model_routing; unknown routes are rejected"""
+    model_config = ConfigDict(extra="forbid")
+    simple: Optional[RouteOverride] = None
+    complex: Optional[RouteOverride] = None
+
 class BusinessCreate(BaseModel):
     name: str
     business_type: str = "hotel"
@@ -238,6 +255,10 @@ class BusinessCreate(BaseModel):
     widget_title: str = "Concierge"
     widget_subtitle: str = "Your personal wine country guide"
     custom_knowledge: Optional[str] = None
+    llm_weight: PositiveInt = 1
+    model_routing: Optional[ModelRouting] = None
+    starter_prompts: Optional[list] = None
+    retention_days: Optional[int] = None
 
 class BusinessUpdate(BaseModel):
     name: Optional[str] = None
@@ -249,8 +270,15 @@ class BusinessUpdate(BaseModel):
     widget_title: Optional[str] = None
     widget_subtitle: Optional[str] = None
     custom_knowledge: Optional[str] = None
+    llm_weight: Optional[PositiveInt] = None
+    model_routing: Optional[ModelRouting] = None
+    starter_prompts: Optional[list] = None
+    retention_days: Optional[int] = None
     is_active: Optional[bool] = None
 
+class StaffMessage(BaseModel):
+    message: str
+
 class ContractSign(BaseModel):
     signer_name: str
     signer_email: str
@@ -274,29 +302,93 @@ def verify_admin_key(api_key: str):
 
 def build_system_prompt(business: Business) -> str:
     """Build customized system prompt for a business"""
-    prompt = BASE_SYSTEM_PROMPT
-
-    # Add business-specific context
-    business_context = f"""
-
-## About This Business
-
-You are the AI concierge for **{business.name}**. When greeting guests or referring to the property, use this name.
-"""
-
-    if business.custom_knowledge:
-        business_context += f"""
-
-## Special Information About {business.name}
+    hits = render_system_prompt.cache_info().hits
+    prompt = render_system_prompt(business.name, business.custom_knowledge)
+    metrics.record_cache("system_prompt", render_system_prompt.cache_info().hits > hits)
+    return prompt
+
+def business_starters(business: Business) -> tuple:
+    """Starter questions for a business and the version of their cached answers"""
+    questions = starter_questions(business)
+    return questions, starters_version(build_system_prompt(business), questions)
+
+def warm_starters(business: Business):
+    """Generate the business's starter answers in the background unless they're already cached"""
+    questions, version = business_starters(business)
+    if not questions or cached_answers(business.id, version) is not None:
+        return
+    business_id, system_prompt = business.id, build_system_prompt(business)
+    model_routing, weight = business.model_routing, business.llm_weight or 1
+
+    async def ask(question: str) -> str:
+        route, route_config = model_router.route(question, [], model_routing)
+        result = await llm_scheduler.run(
+            business_id,
+            llm.create,
+            model=route_config["model"],
+            max_tokens=route_config["max_tokens"],
+            system=system_prompt,
+            messages=[{"role": "user", "content": question}],
+            weight=weight
+        )
+        await run_in_threadpool(record_starter_usage, business_id, result)
+        return result.response.content[0].text
+
+    # Fresh context so the job isn't counted against this request's metrics and trace
+    task = asyncio.create_task(generate_answers(business_id, version, questions, ask), context=contextvars.Context())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+def record_starter_usage(business_id: int, result):
+    """Bill a starter-answer call to the business like a chat reply: a "starter" MessageUsage row and the day's token/cost totals"""
+    usage = result.response.usage
+    message_usage = MessageUsage(
+        business_id=business_id,
+        conversation_id=None,
+        route="starter",
+        model=result.model,
+        attempts=len(result.attempts),
+        input_tokens=usage.input_tokens or 0,
+        output_tokens=usage.output_tokens or 0,
+        cache_creation_tokens=getattr(usage, "cache_creation_input_tokens", None) or 0,
+        cache_read_tokens=getattr(usage, "cache_read_input_tokens", None) or 0,
+        llm_latency_ms=round(1000 * result.latency, 1)
+    )
+    message_usage.cost_usd = estimate_cost(
+        result.model, message_usage.input_tokens, message_usage.output_tokens,
+        message_usage.cache_creation_tokens, message_usage.cache_read_tokens
+    )
+    metrics.record_llm_usage(
+        result.model, business_id, message_usage.input_tokens, message_usage.output_tokens,
+        message_usage.cache_creation_tokens, message_usage.cache_read_tokens
+    )
+    model_router.record("starter", result.model, result.latency, message_usage.input_tokens, message_usage.output_tokens)
 
-{business.custom_knowledge}
-"""
+    db = SessionLocal()
+    try:
+        # A business deleted while its answers were generating gets nothing written back
+        if db.query(Business.id).filter(Business.id == business_id, Business.deleted_at.is_(None)).first() is None:
+            return
+        db.add(message_usage)
+        # Tokens and cost only: no guest message, so message counts and latency averages stay per reply
+        analytics = get_today_analytics(db, business_id)
+        analytics.input_tokens = (analytics.input_tokens or 0) + message_usage.input_tokens
+        analytics.output_tokens = (analytics.output_tokens or 0) + message_usage.output_tokens
+        analytics.cache_creation_tokens = (analytics.cache_creation_tokens or 0) + message_usage.cache_creation_tokens
+        analytics.cache_read_tokens = (analytics.cache_read_tokens or 0) + message_usage.cache_read_tokens
+        analytics.llm_cost_usd = (analytics.llm_cost_usd or 0) + message_usage.cost_usd
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("Recording starter answer usage for business %s failed", business_id)
+    finally:
+        db.close()
+    invalidate_reports(business_id)
 
-    return prompt + business_context
 
-def update_analytics(db: Session, business_id: int, message_text: str):
-    """Update daily analytics for a business"""
-    today = date.today()
+def get_today_analytics(db: Session, business_id: int) -> Analytics:
+    """Get (or create) today's analytics row for a business"""
+    today = datetime.combine(date.today(), datetime.min.time())
     analytics = db.query(Analytics).filter(
         Analytics.business_id == business_id,
         Analytics.date == today
@@ -305,10 +397,30 @@ def update_analytics(db: Session, business_id: int, message_text: str):
     if not analytics:
         analytics = Analytics(business_id=business_id, date=today, total_conversations=0, total_messages=0, unique_visitors=0, leads_captured=0)
         db.add(analytics)
+    return analytics
 
+def update_analytics(db: Session, business_id: int, message_text: str, usage: Optional[dict] = None, analytics: Optional[Analytics] = None):
+    """Update daily analytics for a business (the caller commits)"""
+    if analytics is None:
+        analytics = get_today_analytics(db, business_id)
     analytics.total_messages = (analytics.total_messages or 0) + 1
-    db.commit()
-
+    topic_tracker.submit(business_id, analytics.date, message_text)
+
+    if usage:
+        analytics.input_tokens = (analytics.input_tokens or 0) + usage["input_tokens"]
+        analytics.output_tokens = (analytics.output_tokens or 0) + usage["output_tokens"]
+        analytics.cache_creation_tokens = (analytics.cache_creation_tokens or 0) + usage["cache_creation_tokens"]
+        analytics.cache_read_tokens = (analytics.cache_read_tokens or 0) + usage["cache_read_tokens"]
+        analytics.llm_cost_usd = (analytics.llm_cost_usd or 0) + usage["cost_usd"]
+        analytics.llm_latency_ms_total = (analytics.llm_latency_ms_total or 0) + usage["llm_latency_ms"]
+        analytics.response_latency_ms_total = (analytics.response_latency_ms_total or 0) + usage["response_latency_ms"]
+
+def record_visitor(analytics: Analytics, request: HTTPConnection):
+    """Add the visitor to the day's HyperLogLog sketch and refresh the distinct count"""
+    sketch = HyperLogLog.from_bytes(analytics.visitor_sketch)
+    if sketch.add(visitor_fingerprint(request.client.host if request.client else None, request.headers.get("user-agent"))):
+        analytics.visitor_sketch = sketch.to_bytes()
+        analytics.unique_visitors = sketch.count()
 
 # ============== Public API (Widget) ==============
 
@@ -324,83 +436,253 @@ async def get_widget_config(
     """Get widget configuration for a business"""
     business = get_business_by_api_key(api_key, db)
 
+    # Starter chips are only offered once their answers are cached, so tapping one never waits on the LLM
+    questions, version = business_starters(business)
+    answers = cached_answers(business.id, version)
+    if answers is None:
+        warm_starters(business)
+
     return {
         "business_name": business.name,
         "primary_color": business.primary_color,
         "welcome_message": business.welcome_message or f"Welcome to {business.name}! I'm your personal Napa Valley concierge. How can I help you today?",
         "widget_title": business.widget_title,
-        "widget_subtitle": business.widget_subtitle
+        "widget_subtitle": business.widget_subtitle,
+        "starters": [q for q in questions if normalize(q) in answers] if answers else []
     }
 
+@app.get("/widget/loader.js")
+async def get_widget_loader(request: Request):
+    """Embed script: draws the chat bubble and loads the widget bundle when it's opened"""
+    return await widget_asset_response("loader.js", request)
+
+@app.get("/widget/assets/{name}")
+async def get_widget_asset(name: str, request: Request):
+    """Content-hashed widget bundle, cacheable forever"""
+    return await widget_asset_response(f"assets/{name}", request)
+
+async def widget_asset_response(path: str, request: Request) -> Response:
+    asset = widget_assets.get(path) if widget_assets.built else await run_in_threadpool(widget_assets.get, path)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return asset.response(request.headers.get("accept-encoding", ""), request.headers.get("if-none-match"))
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(
     chat_message: ChatMessage,
     request: Request,
+    response: Response,
     api_key: str = Header(None, alias="X-API-Key"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db)
 ):
     """Chat endpoint - requires business API key"""
-    business = get_business_by_api_key(api_key, db)
-
-    # Get or create conversation
+    request_started = time.perf_counter()
+    with tracing.span("db.get_business_by_api_key", timing="auth"):
+        business = get_business_by_api_key(api_key, db)
+
+    trace = tracing.current_span()
+    if trace is not None:
+        trace.root.set_attributes(**{"tenant.id": business.id, "chat.history_length": len(chat_message.conversation_history)})
+
+    # Retries and double submits of the same message get one LLM call and one set of writes (see idempotency.py)
+    key = idempotency_key or (fingerprint(chat_message.model_dump()) if chat_message.session_id else None)
+    if key is None:
+        return await answer_chat(chat_message, request, business, db, request_started)
+
+    async def call():
+        return (await answer_chat(chat_message, request, business, db, request_started)).model_dump()
+
+    result, replayed = await idempotency.run(f"chat:{business.id}", key, chat_request_hash(chat_message), call, cacheable=is_final_reply)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+        if trace is not None:
+            trace.root.set_attributes(**{"chat.replayed": True})
+    return result
+
+def chat_request_hash(chat_message: ChatMessage) -> str:
+    """What a reused Idempotency-Key is checked against; leaves out the history, which a socket turn doesn't send"""
+    return fingerprint({"message": chat_message.message, "session_id": chat_message.session_id})
+
+def is_final_reply(result: dict) -> bool:
+    """Whether a chat result may be replayed (busy and unavailable replies are retried for real)"""
+    return result["response"] not in (BUSY_FALLBACK_MESSAGE, UNAVAILABLE_FALLBACK_MESSAGE)
+
+async def answer_chat(chat_message: ChatMessage, request: HTTPConnection, business: Business, db: Session, request_started: float, on_text=None) -> ChatResponse:
+    """Answer one guest message: from the starter cache, or through the LLM with the conversation saved"""
+    trace = tracing.current_span()
     session_id = chat_message.session_id or secrets.token_urlsafe(16)
-    conversation = db.query(Conversation).filter(
-        Conversation.business_id == business.id,
-        Conversation.session_id == session_id
-    ).first()
 
-    if not conversation:
-        conversation = Conversation(
-            business_id=business.id,
-            session_id=session_id,
-            visitor_ip=request.client.host if request.client else None,
-            user_agent=request.headers.get("user-agent", "")[:500],
-            referrer=request.headers.get("referer", "")[:500],
-            message_count=0
-        )
-        db.add(conversation)
+    # A starter chip opening the conversation: answered from the cache, with the conversation written in the background
+    if not chat_message.conversation_history:
+        _, version = business_starters(business)
+        answer = starter_answer(business.id, version, chat_message.message)
+        if answer is not None:
+            if trace is not None:
+                trace.root.set_attributes(**{"chat.starter": True})
+            history = [{"role": "user", "content": chat_message.message}, {"role": "assistant", "content": answer}]
+            visitor_ip = request.client.host if request.client else None
+            user_agent = request.headers.get("user-agent", "")
+            conversation_writer.submit(
+                business.id, session_id, history, visitor_fingerprint(visitor_ip, user_agent),
+                visitor_ip, user_agent[:500], request.headers.get("referer", "")[:500]
+            )
+            topic_tracker.submit(business.id, datetime.combine(date.today(), datetime.min.time()), chat_message.message)
+            return ChatResponse(response=answer, conversation_history=history, session_id=session_id)
+
+    # One turn at a time per session, so overlapping messages are appended in order instead of overwriting each other
+    async with session_locks.hold(business.id, session_id):
+        return await answer_in_session(chat_message, request, business, db, session_id, request_started, on_text)
+
+async def answer_in_session(chat_message: ChatMessage, request: HTTPConnection, business: Business, db: Session, session_id: str, request_started: float, on_text=None) -> ChatResponse:
+    """Answer through the LLM and append the turn to the stored conversation (called holding the session lock)"""
+    # A starter turn of this session still in the writer's buffer is written first, so there's one conversation
+    try:
+        await conversation_writer.settle(business.id, session_id)
+    except Exception:
+        logger.exception("Writing buffered starter turns for session %s failed", session_id)  # Retried; merged on the next flush
 
-        # Update unique visitors in analytics
-        today = date.today()
-        analytics = db.query(Analytics).filter(
-            Analytics.business_id == business.id,
-            Analytics.date == today
+    # Get or create conversation
+    with tracing.span("db.conversation_lookup", timing="conversation") as span:
+        conversation = db.query(Conversation).filter(
+            Conversation.business_id == business.id,
+            Conversation.session_id == session_id
         ).first()
-        if not analytics:
-            analytics = Analytics(business_id=business.id, date=today, total_conversations=0, total_messages=0, unique_visitors=0, leads_captured=0)
-            db.add(analytics)
-        analytics.total_conversations = (analytics.total_conversations or 0) + 1
-        analytics.unique_visitors = (analytics.unique_visitors or 0) + 1
+        span.set_attribute("conversation.new", conversation is None)
+        analytics = get_today_analytics(db, business.id)
+
+        # First message of the day from this visitor (a returning session counts again on a new day)
+        if not conversation or (conversation.last_message_at and conversation.last_message_at < analytics.date):
+            record_visitor(analytics, request)
+
+        if not conversation:
+            conversation = Conversation(
+                business_id=business.id,
+                session_id=session_id,
+                visitor_ip=request.client.host if request.client else None,
+                user_agent=request.headers.get("user-agent", "")[:500],
+                referrer=request.headers.get("referer", "")[:500],
+                message_count=0
+            )
+            db.add(conversation)
+
+            analytics.total_conversations = (analytics.total_conversations or 0) + 1
 
     conversation.message_count = (conversation.message_count or 0) + 1
     conversation.last_message_at = datetime.utcnow()
 
-    try:
-        # Build messages list with history
-        messages = chat_message.conversation_history.copy()
-        messages.append({"role": "user", "content": chat_message.message})
-
-        # Call Claude with business-specific prompt
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1024,
-            system=build_system_prompt(business),
-            messages=messages
-        )
-
-        assistant_message = response.content[0].text
-
-        # Update conversation history
-        updated_history = messages.copy()
-        updated_history.append({"role": "assistant", "content": assistant_message})
+    # The stored transcript wins over the widget's copy, so a turn committed while this one waited isn't dropped
+    history = list(conversation.messages or chat_message.conversation_history)
 
-        # Store messages for analytics
-        conversation.messages = updated_history
-
-        # Update analytics
-        update_analytics(db, business.id, chat_message.message)
-
-        db.commit()
+    try:
+        with tracing.span("build_system_prompt", timing="prompt") as span:
+            # Build messages list with history
+            messages = history.copy()
+            messages.append({"role": "user", "content": chat_message.message})
+            system_prompt = build_system_prompt(business)
+
+            # Pick a model by message complexity
+            route, route_config = model_router.route(
+                chat_message.message, history, business.model_routing
+            )
+            span.set_attributes(**{"prompt.system_chars": len(system_prompt), "llm.route": route})
+
+        # Call Claude with business-specific prompt, waiting for a fair share of capacity
+        with tracing.span("llm.messages.create", timing="llm", **{"llm.model": route_config["model"], "llm.max_tokens": route_config["max_tokens"]}) as span:
+            try:
+                result = await llm_scheduler.run(
+                    business.id,
+                    llm.create,
+                    model=route_config["model"],
+                    max_tokens=route_config["max_tokens"],
+                    system=system_prompt,
+                    messages=messages,
+                    on_text=on_text,
+                    weight=business.llm_weight or 1
+                )
+            except (LLMQueueTimeout, LLMQueueFull, LLMUnavailable) as e:
+                span.set_attribute("llm.shed", type(e).__name__)
+                if isinstance(e, LLMUnavailable):
+                    metrics.record_llm_attempts(e.attempts, business.id)
+                db.rollback()
+                return ChatResponse(
+                    response=UNAVAILABLE_FALLBACK_MESSAGE if isinstance(e, LLMUnavailable) else BUSY_FALLBACK_MESSAGE,
+                    conversation_history=history,
+                    session_id=session_id
+                )
+
+            assistant_message = result.response.content[0].text
+            usage = result.response.usage
+            span.set_attributes(**{
+                "llm.model": result.model,
+                "llm.attempts": len(result.attempts),
+                "llm.input_tokens": usage.input_tokens,
+                "llm.output_tokens": usage.output_tokens,
+                "llm.cache_read_tokens": getattr(usage, "cache_read_input_tokens", None) or 0,
+                "llm.ttft_ms": round(1000 * result.ttft, 1) if result.ttft is not None else None
+            })
+        model_router.record(route, result.model, result.latency, usage.input_tokens, usage.output_tokens)
+        metrics.record_llm_attempts(result.attempts, business.id)
+
+        with tracing.span("db.commit", timing="commit"):
+            # Update conversation history
+            updated_history = messages.copy()
+            updated_history.append({"role": "assistant", "content": assistant_message})
+
+            # Store messages for analytics
+            conversation.messages = updated_history
+            db.flush()
+
+            # Disabled or deleted during the LLM call (an open socket's business is only looked up once):
+            # nothing is written, so a running deletion isn't left with rows it already passed. The row lock
+            # makes a concurrent delete_business wait for this commit (Postgres; SQLite has one writer anyway).
+            if not db.query(Business.id).filter(
+                Business.id == business.id, Business.is_active == True, Business.deleted_at.is_(None)
+            ).with_for_update(read=True).first():
+                raise HTTPException(status_code=401, detail="Invalid API key")
+
+            # Record token usage and latency for this reply
+            message_usage = MessageUsage(
+                business_id=business.id,
+                conversation_id=conversation.id,
+                route=route,
+                model=result.model,
+                attempts=len(result.attempts),
+                input_tokens=usage.input_tokens or 0,
+                output_tokens=usage.output_tokens or 0,
+                cache_creation_tokens=getattr(usage, "cache_creation_input_tokens", None) or 0,
+                cache_read_tokens=getattr(usage, "cache_read_input_tokens", None) or 0,
+                llm_latency_ms=round(1000 * result.latency, 1),
+                response_latency_ms=round(1000 * (time.perf_counter() - request_started), 1)
+            )
+            message_usage.cost_usd = estimate_cost(
+                result.model, message_usage.input_tokens, message_usage.output_tokens,
+                message_usage.cache_creation_tokens, message_usage.cache_read_tokens
+            )
+            db.add(message_usage)
+            metrics.record_llm_usage(
+                result.model, business.id, message_usage.input_tokens, message_usage.output_tokens,
+                message_usage.cache_creation_tokens, message_usage.cache_read_tokens
+            )
+
+            # Update analytics
+            update_analytics(db, business.id, chat_message.message, usage={
+                "input_tokens": message_usage.input_tokens,
+                "output_tokens": message_usage.output_tokens,
+                "cache_creation_tokens": message_usage.cache_creation_tokens,
+                "cache_read_tokens": message_usage.cache_read_tokens,
+                "cost_usd": message_usage.cost_usd,
+                "llm_latency_ms": message_usage.llm_latency_ms,
+                "response_latency_ms": message_usage.response_latency_ms
+            }, analytics=analytics)
+
+            business_id, conversation_id = business.id, conversation.id
+            db.commit()
+
+        invalidate_reports(business_id)
+        lead_extractor.submit(business_id, conversation_id, [
+            m["content"] for m in messages if m.get("role") == "user" and isinstance(m.get("content"), str)
+        ])
 
         return ChatResponse(
             response=assistant_message,
@@ -408,50 +690,165 @@ async def chat(
             session_id=session_id
         )
 
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.exception("Chat failed for business %s", business.id)
+        raise HTTPException(status_code=500, detail="The concierge couldn't answer right now. Please try again.")
 
 @app.post("/lead")
 async def capture_lead(
     lead_data: LeadCapture,
+    response: Response,
     api_key: str = Header(None, alias="X-API-Key"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db)
 ):
     """Capture a lead from the chat widget"""
     business = get_business_by_api_key(api_key, db)
 
+    # A resubmitted form creates one lead and counts once
+    request_hash = fingerprint(lead_data.model_dump())
+    result, replayed = await idempotency.run(
+        f"lead:{business.id}", idempotency_key or request_hash, request_hash, lambda: save_lead(lead_data, business, db)
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+async def save_lead(lead_data: LeadCapture, business: Business, db: Session) -> dict:
+    """Store the lead, or complete the one already extracted from the chat for this email or phone"""
+    business_id = business.id
+
     # Find conversation
     conversation = db.query(Conversation).filter(
         Conversation.business_id == business.id,
         Conversation.session_id == lead_data.session_id
     ).first()
 
-    lead = Lead(
-        business_id=business.id,
-        conversation_id=conversation.id if conversation else None,
-        name=lead_data.name,
-        email=lead_data.email,
-        phone=lead_data.phone,
-        interest=lead_data.interest,
-        notes=lead_data.notes
-    )
-    db.add(lead)
+    # The guest may already have typed this email or phone into the chat; complete that lead instead of adding another
+    email = lead_data.email.lower() if lead_data.email else None
+    phone = normalize_phone(lead_data.phone)
+    lead = None
+    matches = []
+    if email:
+        matches.append(Lead.email == email)
+    if phone:
+        matches.append(Lead.phone == phone)
+    if matches:
+        candidates = db.query(Lead).filter(Lead.business_id == business.id, or_(*matches)).order_by(Lead.id).all()
+        lead = next((c for c in candidates if email and c.email == email), candidates[0] if candidates else None)
+
+    if lead:
+        for field, value in (("name", lead_data.name), ("email", email), ("phone", phone), ("interest", lead_data.interest), ("notes", lead_data.notes)):
+            if value:
+                setattr(lead, field, value)
+    else:
+        lead = Lead(
+            business_id=business.id,
+            conversation_id=conversation.id if conversation else None,
+            name=lead_data.name,
+            email=email,
+            phone=phone,
+            interest=lead_data.interest,
+            notes=lead_data.notes
+        )
+        db.add(lead)
 
-    # Update analytics
-    today = date.today()
-    analytics = db.query(Analytics).filter(
-        Analytics.business_id == business.id,
-        Analytics.date == today
-    ).first()
-    if analytics:
-        analytics.leads_captured += 1
+        # Update analytics
+        analytics = get_today_analytics(db, business.id)
+        analytics.leads_captured = (analytics.leads_captured or 0) + 1
 
     db.commit()
+    invalidate_reports(business_id)
 
     return {"status": "success", "message": "Lead captured"}
 
 
+# ============== Realtime Chat (WebSocket) ==============
+
+SOCKET_FRAME_HELP = 'Send {"type": "message", "message": "...", "id": "..."}'
+
+@app.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket, api_key: str = "", session_id: Optional[str] = None):
+    """Widget chat over one connection: authenticated once, replies streamed, staff messages pushed"""
+    db = SessionLocal()
+    try:
+        business = get_business_by_api_key(api_key, db)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    finally:
+        db.close()  # The business stays bound to the connection, detached; settings changes apply on reconnect
+
+    session_id = session_id or secrets.token_urlsafe(16)
+    await websocket.accept()
+    connection = relay.connect(websocket, business.id, session_id)
+    # Like the widget's conversation_history over HTTP: empty until this connection's first turn
+    history = []
+    try:
+        await connection.send({"type": "ready", "session_id": session_id})
+        while connection.open:
+            try:
+                frame = json.loads(await websocket.receive_text())
+            except ValueError:
+                frame = None
+            if not isinstance(frame, dict) or frame.get("type") != "message" or not str(frame.get("message") or "").strip():
+                await connection.send({"type": "error", "id": frame.get("id") if isinstance(frame, dict) else None, "status": 400, "detail": SOCKET_FRAME_HELP})
+                continue
+            reply = await answer_socket_turn(websocket, connection, business, frame, history)
+            if reply is not None:
+                history = reply["conversation_history"]
+    except WebSocketDisconnect:
+        pass
+    finally:
+        relay.disconnect(connection)
+
+async def answer_socket_turn(websocket: WebSocket, connection, business: Business, frame: dict, history: list) -> Optional[dict]:
+    """One chat turn on a socket: the /chat pipeline with reply text streamed as it's generated"""
+    turn_started = time.perf_counter()
+    db_stats = metrics.start_request_db_stats(websocket.scope)
+    root = tracing.start_trace("WS /ws/chat", **{"http.route": "/ws/chat", "tenant.id": business.id, "chat.transport": "websocket"})
+    message_id = str(frame.get("id") or "") or None
+    chat_message = ChatMessage(message=str(frame["message"]), conversation_history=history, session_id=connection.session_id)
+
+    async def on_text(text: Optional[str]):
+        await connection.send({"type": "delta", "id": message_id, "text": text} if text is not None else {"type": "reset", "id": message_id})
+
+    db = SessionLocal()
+    outcome = "ok"
+    try:
+        async def call():
+            return (await answer_chat(chat_message, websocket, business, db, turn_started, on_text)).model_dump()
+
+        # The frame id is the turn's Idempotency-Key, so an HTTP retry after a dropped socket replays this answer
+        if message_id:
+            result, replayed = await idempotency.run(f"chat:{business.id}", message_id, chat_request_hash(chat_message), call, cacheable=is_final_reply)
+            root.set_attributes(**{"chat.replayed": replayed})
+        else:
+            result = await call()
+        await connection.send({"type": "message", "id": message_id, "response": result["response"], "session_id": result["session_id"]})
+        return result
+    except HTTPException as e:
+        outcome = "error"
+        await connection.send({"type": "error", "id": message_id, "status": e.status_code, "detail": e.detail})
+        if e.status_code == 401:
+            await connection.close(status.WS_1008_POLICY_VIOLATION)  # The business was disabled mid-conversation
+    except Exception:
+        outcome = "error"
+        root.status_error = True
+        logger.exception("Socket chat turn failed for business %s", business.id)
+        await connection.send({"type": "error", "id": message_id, "status": 500, "detail": "The concierge couldn't answer right now. Please try again."})
+    finally:
+        db.close()
+        metrics.WS_TURN_DURATION.labels(outcome).observe(time.perf_counter() - turn_started)
+        metrics.DB_QUERIES_PER_REQUEST.labels("/ws/chat").observe(db_stats["queries"])
+        tracing.end_trace(root)
+    return None
+
+
 # ============== Admin API ==============
 
 @app.post("/admin/businesses")
@@ -473,11 +870,16 @@ async def create_business(
         welcome_message=business_data.welcome_message,
         widget_title=business_data.widget_title,
         widget_subtitle=business_data.widget_subtitle,
-        custom_knowledge=business_data.custom_knowledge
+        custom_knowledge=business_data.custom_knowledge,
+        llm_weight=business_data.llm_weight,
+        model_routing=business_data.model_routing.model_dump(exclude_unset=True) if business_data.model_routing else None,
+        starter_prompts=business_data.starter_prompts,
+        retention_days=business_data.retention_days
     )
     db.add(business)
     db.commit()
     db.refresh(business)
+    warm_starters(business)
 
     return {
         "id": business.id,
@@ -494,18 +896,52 @@ async def list_businesses(
     """List all businesses (admin only)"""
     verify_admin_key(x_admin_key)
 
-    businesses = db.query(Business).all()
-    return [
-        {
-            "id": b.id,
-            "api_key": b.api_key,
-            "name": b.name,
-            "business_type": b.business_type,
-            "is_active": b.is_active,
-            "created_at": b.created_at
-        }
-        for b in businesses
-    ]
+    rows = db.query(Business).with_entities(
+        Business.id, Business.api_key, Business.name, Business.business_type, Business.is_active, Business.created_at
+    ).all()
+    return ORJSONResponse([row._asdict() for row in rows])
+
+@app.get("/admin/summary")
+async def get_tenant_summary(
+    limit: int = 100,
+    offset: int = 0,
+    x_admin_key: str = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Activity of every business over 7/30 days, busiest first, from the periodically refreshed summary table (admin only)"""
+    verify_admin_key(x_admin_key)
+    if not 1 <= limit <= 1000 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000 and offset non-negative")
+
+    rows = db.query(TenantSummary, Business.name, Business.is_active).join(
+        Business, Business.id == TenantSummary.business_id
+    ).order_by(TenantSummary.messages_30d.desc(), TenantSummary.business_id).offset(offset).limit(limit).all()
+
+    return ORJSONResponse({
+        "totals": reports.summary_totals(),
+        "businesses": [
+            {
+                "business_id": s.business_id,
+                "name": name,
+                "is_active": is_active,
+                **{
+                    f"{metric}_{days}d": getattr(s, f"{metric}_{days}d") or 0
+                    for days in reports.SUMMARY_WINDOWS for metric in reports.SUMMARY_METRICS
+                },
+                "last_activity_at": s.last_activity_at,
+                "refreshed_at": s.refreshed_at
+            }
+            for s, name, is_active in rows
+        ]
+    })
+
+@app.post("/admin/summary/refresh")
+async def refresh_tenant_summary(
+    x_admin_key: str = Header(None)
+):
+    """Rebuild the tenant summary table now instead of waiting for the background refresh (admin only)"""
+    verify_admin_key(x_admin_key)
+    return await run_in_threadpool(reports.refresh_tenant_summaries)
 
 @app.get("/admin/businesses/{business_id}")
 async def get_business(
@@ -533,7 +969,12 @@ async def get_business(
         "widget_title": business.widget_title,
         "widget_subtitle": business.widget_subtitle,
         "custom_knowledge": business.custom_knowledge,
+        "llm_weight": business.llm_weight,
+        "model_routing": business.model_routing,
+        "starter_prompts": business.starter_prompts,
+        "retention_days": business.retention_days,
         "is_active": business.is_active,
+        "deleted_at": business.deleted_at,
         "created_at": business.created_at
     }
 
@@ -551,21 +992,30 @@ async def update_business(
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
 
+    if business.deleted_at is not None:
+        raise HTTPException(status_code=409, detail="Business is being deleted")
+
     update_data = updates.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(business, field, value)
 
+    # New knowledge or questions mean new starter answers; scheduled before the commit expires the business
+    if business.is_active and update_data.keys() & {"name", "business_type", "custom_knowledge", "starter_prompts"}:
+        warm_starters(business)
     db.commit()
+    invalidate_reports(business_id)
+    if update_data.get("is_active") is False:
+        relay.close_business(business_id)  # Open widgets stop chatting (and costing) now, not when guests leave
     return {"status": "success", "message": "Business updated"}
 
 
-@app.delete("/admin/businesses/{business_id}")
+@app.delete("/admin/businesses/{business_id}", status_code=202)
 async def delete_business(
     business_id: int,
     x_admin_key: str = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Delete a business and all its data (admin only)"""
+    """Disable a business now and delete all its data in the background (admin only)"""
     verify_admin_key(x_admin_key)
 
     business = db.query(Business).filter(Business.id == business_id).first()
@@ -574,22 +1024,37 @@ async def delete_business(
 
     business_name = business.name
 
-    try:
-        # Delete in correct order due to foreign key constraints
-        # 1. Leads first (references conversations)
-        db.query(Lead).filter(Lead.business_id == business_id).delete(synchronize_session=False)
-        # 2. Conversations
-        db.query(Conversation).filter(Conversation.business_id == business_id).delete(synchronize_session=False)
-        # 3. Analytics
-        db.query(Analytics).filter(Analytics.business_id == business_id).delete(synchronize_session=False)
-        # 4. Business
-        db.delete(business)
+    # Disabled immediately: its API key stops working before any data is removed
+    if business.deleted_at is None:
+        business.is_active = False
+        business.deleted_at = datetime.utcnow()
         db.commit()
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Failed to delete: {str(e)}")
+    relay.close_business(business_id)
+
+    retention.mark_deletion_requested(business_id)
+    # Fresh context so the job isn't counted against this request's metrics and trace
+    task = asyncio.create_task(retention.run_deletion(business_id), context=contextvars.Context())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
 
-    return {"status": "success", "message": f"Business '{business_name}' deleted"}
+    return {
+        "status": "accepted",
+        "message": f"Business '{business_name}' disabled; its data is being deleted",
+        "status_url": f"/admin/businesses/{business_id}/deletion"
+    }
+
+@app.get("/admin/businesses/{business_id}/deletion")
+async def get_business_deletion(
+    business_id: int,
+    x_admin_key: str = Header(None)
+):
+    """Progress of a business deletion: rows deleted per table so far (admin only)"""
+    verify_admin_key(x_admin_key)
+
+    progress = retention.deletion_status(business_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="No deletion found for this business")
+    return progress
 
 @app.get("/admin/businesses/{business_id}/analytics")
 async def get_business_analytics(
@@ -624,14 +1089,24 @@ async def get_business_analytics(
         "totals": {
             "conversations": total_conversations,
             "messages": total_messages,
-            "leads_captured": total_leads
+            "leads_captured": total_leads,
+            "unique_visitors": count_unique_visitors(analytics)
         },
+        "top_topics": merge_top_topics(a.top_topics for a in analytics),
+        "usage": summarize_usage(analytics),
         "daily": [
             {
                 "date": str(a.date),
                 "conversations": a.total_conversations,
+                "unique_visitors": a.unique_visitors or 0,
                 "messages": a.total_messages,
-                "leads": a.leads_captured
+                "leads": a.leads_captured,
+                "top_topics": a.top_topics or [],
+                "input_tokens": a.input_tokens or 0,
+                "output_tokens": a.output_tokens or 0,
+                "cache_read_tokens": a.cache_read_tokens or 0,
+                "estimated_cost_usd": round(a.llm_cost_usd or 0, 4),
+                "avg_response_latency_ms": round((a.response_latency_ms_total or 0) / a.total_messages) if a.total_messages else 0
             }
             for a in analytics
         ]
@@ -646,20 +1121,38 @@ async def get_business_leads(
     """Get leads for a business (admin only)"""
     verify_admin_key(x_admin_key)
 
-    leads = db.query(Lead).filter(Lead.business_id == business_id).order_by(Lead.created_at.desc()).all()
-
-    return [
-        {
-            "id": l.id,
-            "name": l.name,
-            "email": l.email,
-            "phone": l.phone,
-            "interest": l.interest,
-            "notes": l.notes,
-            "created_at": l.created_at
-        }
-        for l in leads
-    ]
+    rows = db.query(Lead).with_entities(
+        Lead.id, Lead.name, Lead.email, Lead.phone, Lead.interest, Lead.notes, Lead.created_at
+    ).filter(Lead.business_id == business_id).order_by(Lead.created_at.desc()).all()
+
+    # Row tuples straight to orjson: no ORM objects or jsonable_encoder pass over large exports
+    return ORJSONResponse([row._asdict() for row in rows])
+
+@app.post("/admin/businesses/{business_id}/sessions/{session_id}/messages")
+async def send_staff_message(
+    business_id: int,
+    session_id: str,
+    staff_message: StaffMessage,
+    x_admin_key: str = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Add a staff follow-up to a guest's conversation and push it to their open chat (admin only)"""
+    verify_admin_key(x_admin_key)
+
+    # Under the session lock, so a turn being answered right now doesn't overwrite it
+    async with session_locks.hold(business_id, session_id):
+        conversation = db.query(Conversation).filter(
+            Conversation.business_id == business_id,
+            Conversation.session_id == session_id
+        ).first()
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        # Stored as an assistant turn, so the concierge sees it as context of the guest's next message
+        conversation.messages = (conversation.messages or []) + [{"role": "assistant", "content": staff_message.message}]
+        db.commit()
+
+    relay.publish(business_id, session_id, {"type": "push", "from": "staff", "role": "assistant", "content": staff_message.message})
+    return {"status": "success", "session_id": session_id}
 
 @app.post("/admin/send-weekly-reports")
 async def send_weekly_reports(
@@ -676,69 +1169,20 @@ async def send_weekly_reports(
     import resend
     resend.api_key = resend_api_key
 
-    from datetime import timedelta
-    start_date = date.today() - timedelta(days=7)
+    # One batched pass over every business rather than a report build per business
+    businesses = db.query(Business).filter(Business.is_active == True, Business.contact_email != None).all()
+    reports = get_reports(db, businesses, "weekly")
 
-    businesses = db.query(Business).filter(Business.is_active == True).all()
     sent_count = 0
     errors = []
 
     for business in businesses:
-        if not business.contact_email:
-            continue
-
-        # Get analytics for this business
-        analytics = db.query(Analytics).filter(
-            Analytics.business_id == business.id,
-            Analytics.date >= start_date
-        ).all()
-
-        total_conversations = sum(a.total_conversations for a in analytics)
-        total_messages = sum(a.total_messages for a in analytics)
-        total_leads = sum(a.leads_captured for a in analytics)
-
-        # Get new leads this week
-        new_leads = db.query(Lead).filter(
-            Lead.business_id == business.id,
-            Lead.created_at >= datetime.combine(start_date, datetime.min.time())
-        ).all()
-
-        # Build email HTML
-        leads_html = ""
-        if new_leads:
-            leads_html = "<h3>New Leads This Week:</h3><ul>"
-            for lead in new_leads:
-                leads_html += f"<li><strong>{lead.name or 'Unknown'}</strong> - {lead.email or ''} {lead.phone or ''}</li>"
-            leads_html += "</ul>"
-
-        html_content = f"""
-        <html>
-        <body style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; padding: 20px; max-width: 600px;">
-            <h2 style="color: #722F37;">Weekly Concierge Report</h2>
-            <p>Hi! Here's your weekly summary for <strong>{business.name}</strong>:</p>
-
-            <div style="background: #f5f5f5; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                <h3 style="margin-top: 0;">This Week's Stats</h3>
-                <p><strong>Conversations:</strong> {total_conversations}</p>
-                <p><strong>Messages:</strong> {total_messages}</p>
-                <p><strong>Leads Captured:</strong> {total_leads}</p>
-            </div>
-
-            {leads_html}
-
-            <p style="color: #666; font-size: 14px; margin-top: 30px;">
-                Your 24/7 concierge is working hard for you!<br>
-                - Napa Concierge
-            </p>
-        </body>
-        </html>
-        """
-
+        subject, html_content = report_email(business.id, "weekly", reports[business.id])
         try:
             resend.Emails.send({
                 "from": "Napa Concierge <onboarding@resend.dev>",
                 "to": [business.contact_email],
-                "subject": f"Weekly Report: {total_conversations} conversations, {total_leads} new leads",
+                "subject": subject,
                 "html": html_content
             })
             sent_count += 1
@@ -765,42 +1209,7 @@ async def get_weekly_report(
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
 
-    from datetime import timedelta
-    start_date = date.today() - timedelta(days=7)
-
-    analytics = db.query(Analytics).filter(
-        Analytics.business_id == business_id,
-        Analytics.date >= start_date
-    ).all()
-
-    total_conversations = sum(a.total_conversations for a in analytics)
-    total_messages = sum(a.total_messages for a in analytics)
-    total_leads = sum(a.leads_captured for a in analytics)
-
-    new_leads = db.query(Lead).filter(
-        Lead.business_id == business_id,
-        Lead.created_at >= datetime.combine(start_date, datetime.min.time())
-    ).all()
-
-    return {
-        "business_name": business.name,
-        "period": "Last 7 days",
-        "stats": {
-            "conversations": total_conversations,
-            "messages": total_messages,
-            "leads_captured": total_leads
-        },
-        "new_leads": [
-            {
-                "name": l.name,
-                "email": l.email,
-                "phone": l.phone,
-                "interest": l.interest,
-                "created_at": l.created_at
-            }
-            for l in new_leads
-        ]
-    }
+    return get_report(db, business, "weekly")
 
 
 @app.get("/admin/businesses/{business_id}/monthly-report")
@@ -816,61 +1225,7 @@ async def get_monthly_report(
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
 
-    from datetime import timedelta
-    start_date = date.today() - timedelta(days=30)
-    prev_start_date = date.today() - timedelta(days=60)
-    prev_end_date = date.today() - timedelta(days=30)
-
-    # Current period analytics
-    analytics = db.query(Analytics).filter(
-        Analytics.business_id == business_id,
-        Analytics.date >= start_date
-    ).all()
-
-    # Previous period analytics for comparison
-    prev_analytics = db.query(Analytics).filter(
-        Analytics.business_id == business_id,
-        Analytics.date >= prev_start_date,
-        Analytics.date < prev_end_date
-    ).all()
-
-    total_conversations = sum(a.total_conversations for a in analytics)
-    total_messages = sum(a.total_messages for a in analytics)
-    total_leads = sum(a.leads_captured for a in analytics)
-
-    prev_conversations = sum(a.total_conversations for a in prev_analytics)
-    prev_messages = sum(a.total_messages for a in prev_analytics)
-    prev_leads = sum(a.leads_captured for a in prev_analytics)
-
-    new_leads = db.query(Lead).filter(
-        Lead.business_id == business_id,
-        Lead.created_at >= datetime.combine(start_date, datetime.min.time())
-    ).all()
-
-    return {
-        "business_name": business.name,
-        "period": "Last 30 days",
-        "stats": {
-            "conversations": total_conversations,
-            "messages": total_messages,
-            "leads_captured": total_leads
-        },
-        "previous_period": {
-            "conversations": prev_conversations,
-            "messages": prev_messages,
-            "leads_captured": prev_leads
-        },
-        "new_leads": [
-            {
-                "name": l.name,
-                "email": l.email,
-                "phone": l.phone,
-                "interest": l.interest,
-                "created_at": l.created_at
-            }
-            for l in new_leads
-        ]
-    }
+    return get_report(db, business, "monthly")
 
 
 class SendReportRequest(BaseModel):
@@ -901,170 +1256,25 @@ async def send_business_report(
     import resend
     resend.api_key = resend_api_key
 
-    from datetime import timedelta
-
-    # Determine period
-    if request_data.period == "monthly":
-        days = 30
-        period_label = "Monthly"
-        start_date = date.today() - timedelta(days=30)
-        prev_start_date = date.today() - timedelta(days=60)
-        prev_end_date = date.today() - timedelta(days=30)
-    else:
-        days = 7
-        period_label = "Weekly"
-        start_date = date.today() - timedelta(days=7)
-        prev_start_date = date.today() - timedelta(days=14)
-        prev_end_date = date.today() - timedelta(days=7)
-
-    # Current period analytics
-    analytics = db.query(Analytics).filter(
-        Analytics.business_id == business_id,
-        Analytics.date >= start_date
-    ).order_by(Analytics.date).all()
-
-    # Previous period for comparison
-    prev_analytics = db.query(Analytics).filter(
-        Analytics.business_id == business_id,
-        Analytics.date >= prev_start_date,
-        Analytics.date < prev_end_date
-    ).all()
-
-    total_conversations = sum(a.total_conversations for a in analytics)
-    total_messages = sum(a.total_messages for a in analytics)
-    total_leads = sum(a.leads_captured for a in analytics)
-
-    prev_conversations = sum(a.total_conversations for a in prev_analytics)
-    prev_messages = sum(a.total_messages for a in prev_analytics)
-    prev_leads = sum(a.leads_captured for a in prev_analytics)
-
-    # Calculate changes
-    def calc_change(current, previous):
-        if previous == 0:
-            return "+100%" if current > 0 else "0%"
-        change = ((current - previous) / previous) * 100
-        return f"+{change:.0f}%" if change >= 0 else f"{change:.0f}%"
-
-    conv_change = calc_change(total_conversations, prev_conversations)
-    msg_change = calc_change(total_messages, prev_messages)
-    lead_change = calc_change(total_leads, prev_leads)
-
-    # Get new leads
-    new_leads = db.query(Lead).filter(
-        Lead.business_id == business_id,
-        Lead.created_at >= datetime.combine(start_date, datetime.min.time())
-    ).all()
-
-    # Build daily breakdown
-    daily_rows = ""
-    for a in analytics:
-        daily_rows += f"""
-        <tr>
-            <td style="padding: 8px 12px; border-bottom: 1px solid #eee;">{a.date.strftime('%b %d')}</td>
-            <td style="padding: 8px 12px; border-bottom: 1px solid #eee; text-align: center;">{a.total_conversations}</td>
-            <td style="padding: 8px 12px; border-bottom: 1px solid #eee; text-align: center;">{a.total_messages}</td>
-            <td style="padding: 8px 12px; border-bottom: 1px solid #eee; text-align: center;">{a.leads_captured}</td>
-        </tr>
-        """
-
-    # Build leads HTML
-    leads_html = ""
-    if new_leads:
-        leads_html = """
-        <div style="margin-top: 30px;">
-            <h3 style="color: #333; margin-bottom: 15px;">New Leads</h3>
-            <table style="width: 100%; border-collapse: collapse;">
-                <thead>
-                    <tr style="background: #f5f5f5;">
-                        <th style="padding: 10px; text-align: left;">Name</th>
-                        <th style="padding: 10px; text-align: left;">Contact</th>
-                        <th style="padding: 10px; text-align: left;">Interest</th>
-                    </tr>
-                </thead>
-                <tbody>
-        """
-        for lead in new_leads:
-            contact = lead.email or lead.phone or "N/A"
-            leads_html += f"""
-                <tr>
-                    <td style="padding: 10px; border-bottom: 1px solid #eee;">{lead.name or 'Unknown'}</td>
-                    <td style="padding: 10px; border-bottom: 1px solid #eee;">{contact}</td>
-                    <td style="padding: 10px; border-bottom: 1px solid #eee;">{lead.interest or '-'}</td>
-                </tr>
-            """
-        leads_html += "</tbody></table></div>"
-
-    html_content = f"""
-    <html>
-    <body style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; padding: 20px; max-width: 700px; margin: 0 auto; background: #f5f5f5;">
-        <div style="background: white; border-radius: 12px; padding: 30px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-            <div style="text-align: center; margin-bottom: 30px;">
-                <h1 style="color: #722F37; margin: 0;">{period_label} Concierge Report</h1>
-                <p style="color: #666; margin-top: 5px;">{business.name}</p>
-            </div>
-
-            <div style="display: flex; gap: 15px; margin-bottom: 30px;">
-                <div style="flex: 1; background: linear-gradient(135deg, #722F37 0%, #4a1f24 100%); color: white; padding: 20px; border-radius: 10px; text-align: center;">
-                    <div style="font-size: 32px; font-weight: 700;">{total_conversations}</div>
-                    <div style="font-size: 14px; opacity: 0.9;">Conversations</div>
-                    <div style="font-size: 12px; margin-top: 5px; opacity: 0.8;">{conv_change} vs prev</div>
-                </div>
-                <div style="flex: 1; background: linear-gradient(135deg, #2c5282 0%, #1a365d 100%); color: white; padding: 20px; border-radius: 10px; text-align: center;">
-                    <div style="font-size: 32px; font-weight: 700;">{total_messages}</div>
-                    <div style="font-size: 14px; opacity: 0.9;">Messages</div>
-                    <div style="font-size: 12px; margin-top: 5px; opacity: 0.8;">{msg_change} vs prev</div>
-                </div>
-                <div style="flex: 1; background: linear-gradient(135deg, #276749 0%, #1a4731 100%); color: white; padding: 20px; border-radius: 10px; text-align: center;">
-                    <div style="font-size: 32px; font-weight: 700;">{total_leads}</div>
-                    <div style="font-size: 14px; opacity: 0.9;">Leads</div>
-                    <div style="font-size: 12px; margin-top: 5px; opacity: 0.8;">{lead_change} vs prev</div>
-                </div>
-            </div>
-
-            <div style="margin-top: 30px;">
-                <h3 style="color: #333; margin-bottom: 15px;">Daily Breakdown</h3>
-                <table style="width: 100%; border-collapse: collapse; font-size: 14px;">
-                    <thead>
-                        <tr style="background: #f5f5f5;">
-                            <th style="padding: 10px 12px; text-align: left;">Date</th>
-                            <th style="padding: 10px 12px; text-align: center;">Conversations</th>
-                            <th style="padding: 10px 12px; text-align: center;">Messages</th>
-                            <th style="padding: 10px 12px; text-align: center;">Leads</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {daily_rows}
-                    </tbody>
-                </table>
-            </div>
-
-            {leads_html}
-
-            <div style="margin-top: 40px; padding-top: 20px; border-top: 1px solid #eee; text-align: center;">
-                <p style="color: #666; font-size: 14px; margin: 0;">
-                    Your AI concierge is working 24/7 for you!<br>
-                    <span style="color: #722F37; font-weight: 600;">- Napa Concierge Team</span>
-                </p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    period = "monthly" if request_data.period == "monthly" else "weekly"
+    period_label = PERIODS[period]["label"]
+    report = get_report(db, business, period)
+    subject, html_content = report_email(business.id, period, report)
 
     try:
         resend.Emails.send({
             "from": "Napa Concierge <onboarding@resend.dev>",
             "to": [business.contact_email],
-            "subject": f"{period_label} Report: {total_conversations} conversations, {total_leads} new leads - {business.name}",
+            "subject": subject,
             "html": html_content
         })
         return {
             "status": "success",
             "message": f"{period_label} report sent to {business.contact_email}",
             "stats": {
-                "conversations": total_conversations,
-                "messages": total_messages,
-                "leads": total_leads
+                "conversations": report["stats"]["conversations"],
+                "messages": report["stats"]["messages"],
+                "leads": report["stats"]["leads_captured"]
             }
         }
     except Exception as e:
@@ -1076,6 +1286,63 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    metrics.update_llm_queue(llm_scheduler.stats())
+    payload, content_type = metrics.render()
+    return Response(content=payload, media_type=content_type)
+
+
+@app.get("/admin/llm-queue")
+async def get_llm_queue_stats(
+    x_admin_key: str = Header(None)
+):
+    """LLM scheduler queue depth and per-tenant dispatch/shed counts (admin only)"""
+    verify_admin_key(x_admin_key)
+    return llm_scheduler.stats()
+
+
+@app.get("/admin/llm-client")
+async def get_llm_client_stats(
+    x_admin_key: str = Header(None)
+):
+    """LLM attempt counts, per-attempt latency, fallbacks and circuit state (admin only)"""
+    verify_admin_key(x_admin_key)
+    return llm.stats()
+
+
+@app.get("/admin/llm-routes")
+async def get_llm_route_stats(
+    x_admin_key: str = Header(None)
+):
+    """Model routing table plus per-route latency, tokens and estimated cost (admin only)"""
+    verify_admin_key(x_admin_key)
+    return model_router.stats()
+
+@app.post("/admin/retention/run")
+async def run_retention_now(
+    x_admin_key: str = Header(None)
+):
+    """Archive expired conversations now instead of waiting for the background task (admin only)"""
+    verify_admin_key(x_admin_key)
+    return await run_in_threadpool(retention.run_retention)
+
+@app.post("/admin/leads/backfill")
+async def backfill_leads(
+    after_id: int = 0,
+    business_id: Optional[int] = None,
+    limit: int = BACKFILL_BATCH_SIZE,
+    x_admin_key: str = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Extract leads from one page of stored conversations; repeat with next_after_id until it is null (admin only)"""
+    verify_admin_key(x_admin_key)
+    if not 1 <= limit <= 10000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 10000")
+    return await run_in_threadpool(backfill_leads_page, db, after_id, business_id, limit)
+
+
 # ============== Contract Signing ==============
 
 @app.post("/contract/sign")
@@ -1113,20 +1380,11 @@ async def list_contracts(
     """List all signed contracts (admin only)"""
     verify_admin_key(x_admin_key)
 
-    signatures = db.query(ContractSignature).order_by(ContractSignature.signed_at.desc()).all()
-    return [
-        {
-            "id": s.id,
-            "signer_name": s.signer_name,
-            "signer_email": s.signer_email,
-            "company_name": s.company_name,
-            "company_type": s.company_type,
-            "contract_version": s.contract_version,
-            "signed_at": s.signed_at,
-            "ip_address": s.ip_address
-        }
-        for s in signatures
-    ]
+    rows = db.query(ContractSignature).with_entities(
+        ContractSignature.id, ContractSignature.signer_name, ContractSignature.signer_email, ContractSignature.company_name,
+        ContractSignature.company_type, ContractSignature.contract_version, ContractSignature.signed_at, ContractSignature.ip_address
+    ).order_by(ContractSignature.signed_at.desc()).all()
+    return ORJSONResponse([row._asdict() for row in rows])
 
 
 if __name__ == "__main__":
@@ -1136,4 +1394,8 @@ if __name__ == "__main__":
     print(ADMIN_API_KEY)
     print(f"{'='*50}\n")
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    if worker_count() > 1:
+        # Workers import the app themselves; WEB_CONCURRENCY in the environment keeps their shared state consistent
+        uvicorn.run("main:app", host="0.0.0.0", port=port, workers=worker_count())
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
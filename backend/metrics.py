@@ -0,0 +1,151 @@
+"""
+Prometheus metrics for the hot path
+
+Request latency per route (and per WebSocket chat turn), LLM latency and time to first token, DB query
+counts/durations per request (via SQLAlchemy cursor events), connection pool
+wait time, cache hit rates and in-flight requests. Served at /metrics.
+
+Tenant labels use the business id and can be turned off with
+METRICS_TENANT_LABELS=false if the number of businesses grows too large.
+
+With several workers (WEB_CONCURRENCY > 1) each process writes its samples to
+PROMETHEUS_MULTIPROC_DIR and /metrics aggregates all of them, whichever
+worker answers the scrape. If the variable isn't set, a directory per server
+(keyed by the parent process id) is used.
+"""
+
+import os
+import tempfile
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from shared_state import worker_count
+
+# Must be configured before prometheus_client is imported
+if worker_count() > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = os.path.join(tempfile.gettempdir(), f"napa_metrics_{os.getppid()}")
+MULTIPROCESS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if MULTIPROCESS_DIR:
+    os.makedirs(MULTIPROCESS_DIR, exist_ok=True)
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+
+TENANT_LABELS = os.getenv("METRICS_TENANT_LABELS", "true").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "napa_http_request_duration_seconds", "HTTP request latency", ["route", "method", "status"], buckets=LATENCY_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge("napa_http_requests_in_flight", "HTTP requests currently being served", multiprocess_mode="livesum")
+WS_CONNECTIONS = Gauge("napa_ws_connections", "Open widget WebSocket connections", multiprocess_mode="livesum")
+WS_TURN_DURATION = Histogram("napa_ws_turn_duration_seconds", "Chat turn latency over WebSocket", ["outcome"], buckets=LATENCY_BUCKETS)
+
+LLM_CALL_DURATION = Histogram(
+    "napa_llm_call_duration_seconds", "Claude call latency per attempt", ["model", "outcome", "tenant"], buckets=LATENCY_BUCKETS
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "napa_llm_time_to_first_token_seconds", "Time to first streamed token", ["model", "tenant"], buckets=LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter("napa_llm_tokens_total", "LLM tokens by kind", ["model", "kind", "tenant"])
+LLM_QUEUE_DEPTH = Gauge("napa_llm_queue_depth", "Chats waiting for an LLM slot", ["tenant"], multiprocess_mode="livesum")
+LLM_IN_FLIGHT = Gauge("napa_llm_calls_in_flight", "LLM calls currently running", multiprocess_mode="livesum")
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "napa_db_queries_per_request", "SQL statements executed per request", ["route"],
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50, 100)
+)
+DB_QUERY_DURATION = Histogram("napa_db_query_duration_seconds", "SQL statement duration", ["route"], buckets=DB_BUCKETS)
+DB_POOL_WAIT = Histogram("napa_db_pool_wait_seconds", "Time waiting to check out a pooled connection", buckets=DB_BUCKETS)
+
+# cache: report, report_email, starter_answers, idempotency (replayed vs computed), system_prompt
+CACHE_REQUESTS = Counter("napa_cache_requests_total", "Cache lookups", ["cache", "result"])
+
+# Per-request DB counters; set by the HTTP middleware, read by the SQLAlchemy hooks
+_request_db_stats: ContextVar[Optional[dict]] = ContextVar("request_db_stats", default=None)
+
+
+def tenant_label(business_id) -> str:
+    return str(business_id) if TENANT_LABELS and business_id is not None else "all"
+
+
+def instrument_engine(engine):
+    """Count and time every SQL statement against the current request"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _request_db_stats.get()
+        if stats is not None:
+            stats["queries"] += 1
+            stats["duration"] += elapsed
+            DB_QUERY_DURATION.labels(route_label(stats["scope"])).observe(elapsed)
+
+
+def route_label(scope: dict) -> str:
+    """Route template (e.g. /admin/businesses/{business_id}) to keep label cardinality bounded"""
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+def start_request_db_stats(scope: dict) -> dict:
+    stats = {"scope": scope, "queries": 0, "duration": 0.0}
+    _request_db_stats.set(stats)
+    return stats
+
+
+def current_db_stats() -> Optional[dict]:
+    return _request_db_stats.get()
+
+
+def observe_pool_wait(seconds: float):
+    DB_POOL_WAIT.observe(seconds)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_llm_attempts(attempts: list, business_id=None):
+    """Observe per-attempt latency from a ResilientLLMClient attempt log"""
+    tenant = tenant_label(business_id)
+    for attempt in attempts:
+        if attempt.get("outcome") in ("circuit_open", "cancelled"):
+            continue
+        LLM_CALL_DURATION.labels(attempt["model"], attempt["outcome"], tenant).observe(attempt["latency_ms"] / 1000)
+        if attempt.get("ttft_ms") is not None:
+            LLM_TIME_TO_FIRST_TOKEN.labels(attempt["model"], tenant).observe(attempt["ttft_ms"] / 1000)
+
+
+def record_llm_usage(model: str, business_id, input_tokens: int, output_tokens: int, cache_creation_tokens: int, cache_read_tokens: int):
+    tenant = tenant_label(business_id)
+    LLM_TOKENS.labels(model, "input", tenant).inc(input_tokens)
+    LLM_TOKENS.labels(model, "output", tenant).inc(output_tokens)
+    LLM_TOKENS.labels(model, "cache_creation", tenant).inc(cache_creation_tokens)
+    LLM_TOKENS.labels(model, "cache_read", tenant).inc(cache_read_tokens)
+
+
+def update_llm_queue(scheduler_stats: dict):
+    """Refresh scheduler gauges from LLMScheduler.stats() at scrape time"""
+    LLM_IN_FLIGHT.set(scheduler_stats["in_flight"])
+    if TENANT_LABELS:
+        for tenant, stats in scheduler_stats["tenants"].items():
+            LLM_QUEUE_DEPTH.labels(tenant).set(stats["queued"])
+    else:
+        LLM_QUEUE_DEPTH.labels("all").set(scheduler_stats["queued"])
+
+
+def render() -> tuple:
+    """Exposition payload and content type for /metrics (summed over all workers in multiprocess mode)"""
+    if MULTIPROCESS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, MULTIPROCESS_DIR)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
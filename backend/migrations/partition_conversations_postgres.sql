@@ -0,0 +1,60 @@
+-- Convert `conversations` into a table range-partitioned by month on started_at (Postgres 12+).
+--
+-- Run once during a maintenance window:  psql "$DATABASE_URL" -f migrations/partition_conversations_postgres.sql
+-- Afterwards the retention task (retention.py) keeps creating upcoming monthly
+-- partitions and drops past ones once archiving has emptied them.
+--
+-- A primary key on a partitioned table must include the partition key, so it
+-- becomes (id, started_at) and the foreign keys from leads/message_usage to
+-- conversations are dropped (the app never relies on them for cascades).
+-- For the same reason the unique (business_id, session_id) index can't be
+-- kept; the per-session locks still serialize turns, and init_db logs that
+-- the index is missing.
+
+BEGIN;
+
+ALTER TABLE leads DROP CONSTRAINT IF EXISTS leads_conversation_id_fkey;
+ALTER TABLE message_usage DROP CONSTRAINT IF EXISTS message_usage_conversation_id_fkey;
+
+UPDATE conversations SET started_at = COALESCE(last_message_at, now()) WHERE started_at IS NULL;
+
+ALTER TABLE conversations RENAME TO conversations_unpartitioned;
+ALTER INDEX IF EXISTS conversations_pkey RENAME TO conversations_unpartitioned_pkey;
+ALTER INDEX IF EXISTS ix_conversations_business_last_message RENAME TO ix_conversations_unpartitioned_business_last_message;
+ALTER INDEX IF EXISTS ix_conversations_session_id RENAME TO ix_conversations_unpartitioned_session_id;
+ALTER INDEX IF EXISTS ix_conversations_id RENAME TO ix_conversations_unpartitioned_id;
+ALTER INDEX IF EXISTS uq_conversations_business_session RENAME TO uq_conversations_unpartitioned_business_session;
+
+CREATE TABLE conversations (LIKE conversations_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (started_at);
+ALTER TABLE conversations ADD PRIMARY KEY (id, started_at);
+CREATE INDEX ix_conversations_id ON conversations (id);
+CREATE INDEX ix_conversations_session_id ON conversations (session_id);
+CREATE INDEX ix_conversations_business_last_message ON conversations (business_id, last_message_at);
+
+-- One partition per month from the oldest conversation to three months ahead
+DO $$
+DECLARE
+    month date;
+BEGIN
+    FOR month IN
+        SELECT generate_series(
+            date_trunc('month', COALESCE(MIN(started_at), now())),
+            date_trunc('month', now()) + interval '3 months',
+            interval '1 month'
+        )::date
+        FROM conversations_unpartitioned
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF conversations FOR VALUES FROM (%L) TO (%L)',
+            'conversations_' || to_char(month, 'YYYY_MM'), month, (month + interval '1 month')::date
+        );
+    END LOOP;
+END $$;
+
+INSERT INTO conversations SELECT * FROM conversations_unpartitioned;
+
+-- Keep the id sequence when the old table goes away
+ALTER SEQUENCE conversations_id_seq OWNED BY conversations.id;
+DROP TABLE conversations_unpartitioned;
+
+COMMIT;
@@ -0,0 +1,172 @@
+"""
+Widget WebSocket connections and server-initiated messages
+
+/ws/chat keeps one socket per open widget: the API key is checked once when
+it connects, and each turn is a small JSON frame answered with streamed
+reply deltas. Sockets live in the worker that accepted them, so a message
+the server sends on its own (a staff follow-up posted to the admin API,
+which may land on any worker) goes through the shared store as an outbox:
+
+    publish()   takes the next sequence number and stores the message under
+                it for REALTIME_OUTBOX_TTL seconds
+    run()       every worker reads the entries it hasn't seen yet and hands
+                them to the sockets it holds for that session
+
+Publishing wakes the local relay at once; other workers see the message
+within REALTIME_POLL_INTERVAL seconds. close_business() goes through the
+same outbox, so disabling or deleting a business closes its sockets (code
+1008) on every worker instead of leaving them answering until the guest
+leaves. A worker without open sockets only
+reads the sequence number. Callers also save such messages to the stored
+conversation, so a guest who isn't connected still gets them as context of
+their next turn.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from responses import dumps
+from shared_state import store
+import metrics
+
+logger = logging.getLogger(__name__)
+
+REALTIME_POLL_INTERVAL = float(os.getenv("REALTIME_POLL_INTERVAL", 0.5))  # Seconds before another worker's messages arrive
+REALTIME_OUTBOX_TTL = int(os.getenv("REALTIME_OUTBOX_TTL", 60))
+SEQUENCE_KEY = "realtime:seq"
+MISSING_GRACE = 2.0  # Seconds an outbox entry may lag its sequence number before it's given up on
+
+
+def _outbox_key(seq: int) -> str:
+    return f"realtime:outbox:{seq}"
+
+
+class Connection:
+    """One accepted socket; sends are serialized and never raise"""
+
+    def __init__(self, websocket, business_id: int, session_id: str):
+        self.websocket = websocket
+        self.business_id = business_id
+        self.session_id = session_id
+        self.open = True
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, message: dict) -> bool:
+        """Send one JSON frame; False once the socket is gone"""
+        async with self._send_lock:
+            if not self.open:
+                return False
+            try:
+                await self.websocket.send_text(dumps(message).decode("utf-8"))
+            except Exception:
+                self.open = False  # The guest left; the turn still finishes and is saved
+        return self.open
+
+    async def close(self, code: int = 1008):
+        """Close the socket from our side; the receive loop then ends with a disconnect"""
+        async with self._send_lock:
+            if not self.open:
+                return
+            self.open = False
+            try:
+                await self.websocket.close(code=code)
+            except Exception:
+                pass
+
+
+class Relay:
+    """Open sockets of this worker, and delivery of messages published by any worker"""
+
+    def __init__(self):
+        self._connections: Dict[Tuple[int, str], Set[Connection]] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._last_seq: Optional[int] = None
+        self._missing_since: Optional[float] = None
+        self.delivered = 0
+
+    def connect(self, websocket, business_id: int, session_id: str) -> Connection:
+        connection = Connection(websocket, business_id, session_id)
+        self._connections.setdefault((business_id, session_id), set()).add(connection)
+        metrics.WS_CONNECTIONS.inc()
+        return connection
+
+    def disconnect(self, connection: Connection):
+        connection.open = False
+        key = (connection.business_id, connection.session_id)
+        sessions = self._connections.get(key)
+        if sessions is not None and connection in sessions:
+            sessions.discard(connection)
+            metrics.WS_CONNECTIONS.dec()
+            if not sessions:
+                del self._connections[key]
+
+    def stats(self) -> dict:
+        return {"connections": sum(len(c) for c in self._connections.values()), "sessions": len(self._connections), "delivered": self.delivered}
+
+    def publish(self, business_id: int, session_id: Optional[str], message: Optional[dict], close: bool = False) -> int:
+        """Queue a message for the session's sockets on every worker; returns its sequence number"""
+        seq = store.incr(SEQUENCE_KEY)
+        entry = {"business_id": business_id, "session_id": session_id, "message": message, "close": close}
+        store.set(_outbox_key(seq), entry, ttl=REALTIME_OUTBOX_TTL)
+        if self._wake is not None:
+            self._wake.set()
+        return seq
+
+    def close_business(self, business_id: int) -> int:
+        """Close a disabled or deleted business's sockets on every worker; returns the sequence number"""
+        return self.publish(business_id, None, None, close=True)
+
+    async def close_local(self, business_id: int, code: int = 1008) -> int:
+        """Close this worker's sockets of a business; returns how many"""
+        closing = [c for (owner, _), connections in self._connections.items() if owner == business_id for c in connections]
+        for connection in closing:
+            await connection.close(code)
+        return len(closing)
+
+    async def deliver(self, business_id: int, session_id: str, message: dict) -> int:
+        """Send to this worker's sockets for the session; returns how many got it"""
+        sent = 0
+        for connection in list(self._connections.get((business_id, session_id), ())):
+            sent += await connection.send(message)
+        self.delivered += sent
+        return sent
+
+    async def poll(self):
+        """Deliver outbox entries published since the last poll"""
+        head = store.get(SEQUENCE_KEY, 0)
+        if self._last_seq is None or not self._connections:
+            self._last_seq = head  # Nobody here to deliver to; older entries are never replayed
+            return
+        while self._last_seq < head:
+            seq = self._last_seq + 1
+            entry = store.get(_outbox_key(seq))
+            if entry is None:
+                # Its publisher has taken the number but not stored the message yet (or it expired)
+                now = time.monotonic()
+                if self._missing_since is None:
+                    self._missing_since = now
+                if now - self._missing_since < MISSING_GRACE:
+                    return
+            self._missing_since = None
+            self._last_seq = seq
+            if entry is not None and entry.get("close"):
+                await self.close_local(entry["business_id"])
+            elif entry is not None:
+                await self.deliver(entry["business_id"], entry["session_id"], entry["message"])
+
+    async def run(self, interval: float = REALTIME_POLL_INTERVAL):
+        """Background loop started with the app"""
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("Realtime relay poll failed")
+            try:
+                await asyncio.wait_for(self._wake.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
@@ -0,0 +1,401 @@
+"""
+Weekly and monthly business reports
+
+A report's dataset (stats with the previous period for comparison, unique
+visitors, top topics, usage, daily breakdown and new leads) is built once
+and shared by the JSON report endpoints and the report emails. Reports for
+many businesses are built in one batched pass: one Analytics query covering
+both periods and one Lead query for every business at once.
+
+Finished reports (and their rendered emails) are cached per (business,
+period, day). Anything that writes a business's analytics or leads calls
+invalidate_reports(), which bumps a version counter in the shared store, so
+every worker rebuilds that business's reports on next use and serves the
+cached copy until then.
+
+The admin overview of all tenants reads the tenant_summaries table, which a
+background task rebuilds every SUMMARY_REFRESH_INTERVAL seconds from one
+grouped Analytics query, so the overview costs one indexed query however many
+businesses there are.
+"""
+
+import asyncio
+import html
+import logging
+import os
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from string import Template
+from typing import Dict, Tuple
+
+from sqlalchemy import case, func
+from starlette.concurrency import run_in_threadpool
+
+from shared_state import store
+from sketches import HyperLogLog
+from topics import merge_top_topics
+import metrics
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", 2048))
+SUMMARY_REFRESH_INTERVAL = float(os.getenv("SUMMARY_REFRESH_INTERVAL", 300))  # 0 disables the background refresh
+
+PERIODS = {
+    "weekly": {"days": 7, "label": "Weekly", "description": "Last 7 days"},
+    "monthly": {"days": 30, "label": "Monthly", "description": "Last 30 days"},
+}
+
+
+def invalidate_reports(business_id: int):
+    """Mark a business's cached reports stale (called after its analytics or leads change)"""
+    store.incr(f"report_version:{business_id}")
+
+
+def _version(business_id: int) -> int:
+    return int(store.get(f"report_version:{business_id}", 0))
+
+
+# ============== Dataset ==============
+
+def count_unique_visitors(analytics: list) -> int:
+    """Distinct visitors over several days, merging the daily sketches"""
+    merged = HyperLogLog.union(a.visitor_sketch for a in analytics)
+    # Days recorded before sketches existed only have a count; add those as-is
+    return merged.count() + sum(a.unique_visitors or 0 for a in analytics if not a.visitor_sketch)
+
+
+def summarize_usage(analytics: list) -> dict:
+    """Token, cost and latency totals/averages over a list of Analytics rows"""
+    messages = sum(a.total_messages or 0 for a in analytics)
+    input_tokens = sum(a.input_tokens or 0 for a in analytics)
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": sum(a.output_tokens or 0 for a in analytics),
+        "cache_creation_tokens": sum(a.cache_creation_tokens or 0 for a in analytics),
+        "cache_read_tokens": sum(a.cache_read_tokens or 0 for a in analytics),
+        "estimated_cost_usd": round(sum(a.llm_cost_usd or 0 for a in analytics), 4),
+        "avg_input_tokens_per_message": round(input_tokens / messages) if messages else 0,
+        "avg_llm_latency_ms": round(sum(a.llm_latency_ms_total or 0 for a in analytics) / messages) if messages else 0,
+        "avg_response_latency_ms": round(sum(a.response_latency_ms_total or 0 for a in analytics) / messages) if messages else 0,
+    }
+
+
+def _period_stats(analytics: list) -> dict:
+    return {
+        "conversations": sum(a.total_conversations or 0 for a in analytics),
+        "messages": sum(a.total_messages or 0 for a in analytics),
+        "leads_captured": sum(a.leads_captured or 0 for a in analytics),
+        "unique_visitors": count_unique_visitors(analytics),
+    }
+
+
+def build_reports(db, businesses: list, period: str) -> Dict[int, dict]:
+    """Report datasets for several businesses in two queries"""
+    from database import Analytics, Lead
+
+    days = PERIODS[period]["days"]
+    start = datetime.combine(date.today() - timedelta(days=days), datetime.min.time())
+    prev_start = start - timedelta(days=days)
+    ids = [b.id for b in businesses]
+
+    current, previous = {b: [] for b in ids}, {b: [] for b in ids}
+    for a in db.query(Analytics).filter(
+        Analytics.business_id.in_(ids), Analytics.date >= prev_start
+    ).order_by(Analytics.date):
+        (current if a.date >= start else previous)[a.business_id].append(a)
+
+    new_leads = {b: [] for b in ids}
+    for lead in db.query(Lead).filter(Lead.business_id.in_(ids), Lead.created_at >= start).order_by(Lead.created_at):
+        new_leads[lead.business_id].append({
+            "name": lead.name,
+            "email": lead.email,
+            "phone": lead.phone,
+            "interest": lead.interest,
+            "created_at": lead.created_at.isoformat() if lead.created_at else None,
+        })
+
+    return {
+        business.id: {
+            "business_name": business.name,
+            "period": PERIODS[period]["description"],
+            "stats": _period_stats(current[business.id]),
+            "previous_period": _period_stats(previous[business.id]),
+            "top_topics": merge_top_topics(a.top_topics for a in current[business.id]),
+            "usage": summarize_usage(current[business.id]),
+            "previous_usage": summarize_usage(previous[business.id]),
+            "daily": [
+                {"date": a.date.date().isoformat(), "conversations": a.total_conversations or 0,
+                 "messages": a.total_messages or 0, "leads": a.leads_captured or 0}
+                for a in current[business.id]
+            ],
+            "new_leads": new_leads[business.id],
+        }
+        for business in businesses
+    }
+
+
+# ============== Cache ==============
+
+_cache: "OrderedDict[Tuple[int, str, date], dict]" = OrderedDict()  # key -> {"version", "report", "email"}
+
+
+def get_reports(db, businesses: list, period: str) -> Dict[int, dict]:
+    """Reports for several businesses, building only the stale ones (in one batch)"""
+    today = date.today()
+    reports, stale, versions = {}, [], {}
+    for business in businesses:
+        versions[business.id] = _version(business.id)
+        entry = _cache.get((business.id, period, today))
+        hit = entry is not None and entry["version"] == versions[business.id]
+        metrics.record_cache("report", hit)
+        if hit:
+            _cache.move_to_end((business.id, period, today))
+            reports[business.id] = entry["report"]
+        else:
+            stale.append(business)
+
+    if stale:
+        for business_id, report in build_reports(db, stale, period).items():
+            _cache[(business_id, period, today)] = {"version": versions[business_id], "report": report, "email": None}
+            reports[business_id] = report
+        while len(_cache) > REPORT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return reports
+
+
+def get_report(db, business, period: str) -> dict:
+    return get_reports(db, [business], period)[business.id]
+
+
+# ============== Email ==============
+
+EMAIL_TEMPLATE = Template("""
+    <html>
+    <body style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; padding: 20px; max-width: 700px; margin: 0 auto; background: #f5f5f5;">
+        <div style="background: white; border-radius: 12px; padding: 30px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
+            <div style="text-align: center; margin-bottom: 30px;">
+                <h1 style="color: #722F37; margin: 0;">$period_label Concierge Report</h1>
+                <p style="color: #666; margin-top: 5px;">$business_name</p>
+            </div>
+
+            <div style="display: flex; gap: 15px; margin-bottom: 30px;">
+                $stat_cards
+            </div>
+
+            <div style="margin-top: 30px;">
+                <h3 style="color: #333; margin-bottom: 15px;">Daily Breakdown</h3>
+                <table style="width: 100%; border-collapse: collapse; font-size: 14px;">
+                    <thead>
+                        <tr style="background: #f5f5f5;">
+                            <th style="padding: 10px 12px; text-align: left;">Date</th>
+                            <th style="padding: 10px 12px; text-align: center;">Conversations</th>
+                            <th style="padding: 10px 12px; text-align: center;">Messages</th>
+                            <th style="padding: 10px 12px; text-align: center;">Leads</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+                        $daily_rows
+                    </tbody>
+                </table>
+            </div>
+
+            $topics_section
+
+            $leads_section
+
+            <div style="margin-top: 40px; padding-top: 20px; border-top: 1px solid #eee; text-align: center;">
+                <p style="color: #666; font-size: 14px; margin: 0;">
+                    Your AI concierge is working 24/7 for you!<br>
+                    <span style="color: #722F37; font-weight: 600;">- Napa Concierge Team</span>
+                </p>
+            </div>
+        </div>
+    </body>
+    </html>
+""")
+
+STAT_CARD_TEMPLATE = Template("""
+                <div style="flex: 1; background: linear-gradient(135deg, $color_from 0%, $color_to 100%); color: white; padding: 20px; border-radius: 10px; text-align: center;">
+                    <div style="font-size: 32px; font-weight: 700;">$value</div>
+                    <div style="font-size: 14px; opacity: 0.9;">$label</div>
+                    <div style="font-size: 12px; margin-top: 5px; opacity: 0.8;">$change vs prev</div>
+                </div>""")
+
+DAILY_ROW_TEMPLATE = Template("""
+                        <tr>
+                            <td style="padding: 8px 12px; border-bottom: 1px solid #eee;">$date</td>
+                            <td style="padding: 8px 12px; border-bottom: 1px solid #eee; text-align: center;">$conversations</td>
+                            <td style="padding: 8px 12px; border-bottom: 1px solid #eee; text-align: center;">$messages</td>
+                            <td style="padding: 8px 12px; border-bottom: 1px solid #eee; text-align: center;">$leads</td>
+                        </tr>""")
+
+TOPICS_TEMPLATE = Template("""
+            <div style="margin-top: 30px;">
+                <h3 style="color: #333; margin-bottom: 15px;">What Guests Asked About</h3>
+                <p style="color: #555; font-size: 14px; margin: 0;">$topics</p>
+            </div>""")
+
+LEADS_TEMPLATE = Template("""
+            <div style="margin-top: 30px;">
+                <h3 style="color: #333; margin-bottom: 15px;">New Leads</h3>
+                <table style="width: 100%; border-collapse: collapse;">
+                    <thead>
+                        <tr style="background: #f5f5f5;">
+                            <th style="padding: 10px; text-align: left;">Name</th>
+                            <th style="padding: 10px; text-align: left;">Contact</th>
+                            <th style="padding: 10px; text-align: left;">Interest</th>
+                        </tr>
+                    </thead>
+                    <tbody>$rows
+                    </tbody>
+                </table>
+            </div>""")
+
+LEAD_ROW_TEMPLATE = Template("""
+                        <tr>
+                            <td style="padding: 10px; border-bottom: 1px solid #eee;">$name</td>
+                            <td style="padding: 10px; border-bottom: 1px solid #eee;">$contact</td>
+                            <td style="padding: 10px; border-bottom: 1px solid #eee;">$interest</td>
+                        </tr>""")
+
+STAT_CARDS = (
+    ("conversations", "Conversations", "#722F37", "#4a1f24"),
+    ("unique_visitors", "Visitors", "#6b46c1", "#44337a"),
+    ("messages", "Messages", "#2c5282", "#1a365d"),
+    ("leads_captured", "Leads", "#276749", "#1a4731"),
+)
+
+
+def calc_change(current: int, previous: int) -> str:
+    """Period-over-period change, e.g. "+12%\""""
+    if previous == 0:
+        return "+100%" if current > 0 else "0%"
+    change = ((current - previous) / previous) * 100
+    return f"+{change:.0f}%" if change >= 0 else f"{change:.0f}%"
+
+
+def render_email(report: dict, period: str) -> Tuple[str, str]:
+    """(subject, html) for a report; every value from the database is escaped"""
+    escape = html.escape
+    stats, previous = report["stats"], report["previous_period"]
+    label = PERIODS[period]["label"]
+
+    stat_cards = "".join(
+        STAT_CARD_TEMPLATE.substitute(
+            color_from=color_from, color_to=color_to, value=stats[key], label=title,
+            change=calc_change(stats[key], previous[key])
+        )
+        for key, title, color_from, color_to in STAT_CARDS
+    )
+    daily_rows = "".join(
+        DAILY_ROW_TEMPLATE.substitute(
+            date=datetime.fromisoformat(day["date"]).strftime("%b %d"),
+            conversations=day["conversations"], messages=day["messages"], leads=day["leads"]
+        )
+        for day in report["daily"]
+    )
+    topics_section = ""
+    if report["top_topics"]:
+        topics_section = TOPICS_TEMPLATE.substitute(topics=" &middot; ".join(
+            f"{escape(t['topic'].replace('_', ' ').title())} ({t['count']})" for t in report["top_topics"]
+        ))
+    leads_section = ""
+    if report["new_leads"]:
+        leads_section = LEADS_TEMPLATE.substitute(rows="".join(
+            LEAD_ROW_TEMPLATE.substitute(
+                name=escape(lead["name"] or "Unknown"),
+                contact=escape(lead["email"] or lead["phone"] or "N/A"),
+                interest=escape(lead["interest"] or "-")
+            )
+            for lead in report["new_leads"]
+        ))
+
+    body = EMAIL_TEMPLATE.substitute(
+        period_label=label, business_name=escape(report["business_name"]), stat_cards=stat_cards,
+        daily_rows=daily_rows, topics_section=topics_section, leads_section=leads_section
+    )
+    subject = f"{label} Report: {stats['conversations']} conversations, {stats['leads_captured']} new leads - {report['business_name']}"
+    return subject, body
+
+
+def report_email(business_id: int, period: str, report: dict) -> Tuple[str, str]:
+    """render_email(), reusing the rendering cached alongside the report"""
+    entry = _cache.get((business_id, period, date.today()))
+    if entry is not None and entry["report"] is report:
+        metrics.record_cache("report_email", entry["email"] is not None)
+        if entry["email"] is None:
+            entry["email"] = render_email(report, period)
+        return entry["email"]
+    metrics.record_cache("report_email", False)
+    return render_email(report, period)
+
+
+# ============== Tenant summaries ==============
+
+SUMMARY_WINDOWS = (7, 30)
+SUMMARY_METRICS = ("conversations", "messages", "leads", "tokens", "cost_usd")
+
+
+def refresh_tenant_summaries() -> dict:
+    """Rebuild tenant_summaries for every business in one grouped query and one transaction"""
+    from database import SessionLocal, Analytics, Business, TenantSummary
+
+    today = datetime.combine(date.today(), datetime.min.time())
+    columns = {
+        "conversations": Analytics.total_conversations,
+        "messages": Analytics.total_messages,
+        "leads": Analytics.leads_captured,
+        "tokens": func.coalesce(Analytics.input_tokens, 0) + func.coalesce(Analytics.output_tokens, 0),
+        "cost_usd": Analytics.llm_cost_usd,
+    }
+    windowed = [
+        func.coalesce(func.sum(case((Analytics.date >= today - timedelta(days=days), column), else_=0)), 0).label(f"{name}_{days}d")
+        for days in SUMMARY_WINDOWS for name, column in columns.items()
+    ]
+    last_activity = func.max(case((Analytics.total_messages > 0, Analytics.date))).label("last_activity_at")
+
+    db = SessionLocal()
+    try:
+        rows = db.query(Business.id, *windowed, last_activity).outerjoin(
+            Analytics, Analytics.business_id == Business.id
+        ).filter(Business.deleted_at.is_(None)).group_by(Business.id).all()
+
+        refreshed_at = datetime.utcnow()
+        summaries = [{"business_id": row.id, **{k: v for k, v in row._mapping.items() if k != "id"}, "refreshed_at": refreshed_at} for row in rows]
+        for summary in summaries:
+            summary["cost_usd_7d"], summary["cost_usd_30d"] = round(summary["cost_usd_7d"], 4), round(summary["cost_usd_30d"], 4)
+        # Readers see the old rows until the swap commits
+        db.execute(TenantSummary.__table__.delete())
+        if summaries:
+            db.execute(TenantSummary.__table__.insert(), summaries)
+        db.commit()
+    finally:
+        db.close()
+
+    totals = {
+        "businesses": len(summaries),
+        "active_7d": sum(1 for s in summaries if s["messages_7d"]),
+        "active_30d": sum(1 for s in summaries if s["messages_30d"]),
+        **{f"{name}_{days}d": sum(s[f"{name}_{days}d"] for s in summaries) for days in SUMMARY_WINDOWS for name in SUMMARY_METRICS},
+        "refreshed_at": refreshed_at.isoformat(),
+    }
+    totals["cost_usd_7d"], totals["cost_usd_30d"] = round(totals["cost_usd_7d"], 4), round(totals["cost_usd_30d"], 4)
+    store.set("tenant_summaries:totals", totals)
+    return totals
+
+
+def summary_totals() -> dict:
+    """All-tenant totals saved by the last refresh (empty before the first one)"""
+    return store.get("tenant_summaries:totals", {})
+
+
+async def summary_loop(interval: float = SUMMARY_REFRESH_INTERVAL):
+    """Refresh tenant summaries now and then every `interval` seconds; with several workers only one runs each pass"""
+    while True:
+        if store.add("tenant_summaries:lock", os.getpid(), ttl=interval / 2):
+            try:
+                await run_in_threadpool(refresh_tenant_summaries)
+            except Exception:
+                logger.exception("Tenant summary refresh failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,24 @@
+"""
+JSON response classes
+
+ORJSONResponse renders with orjson (several times faster than the standard
+library and handles datetimes natively) and accepts non-string dict keys.
+FastAPI ships the same class but deprecates it, warning on every response,
+so it is kept here. Routes with a response_model (e.g. /chat) keep FastAPI's
+own Pydantic serializer, which is just as fast.
+"""
+
+from typing import Any
+
+import orjson
+from starlette.responses import JSONResponse
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact JSON bytes"""
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,288 @@
+"""
+Conversation retention and archival
+
+Each business keeps transcripts for `retention_days` (RETENTION_DAYS when
+unset, 0 to keep forever, the default). A background task periodically moves older
+conversations out of the hot `conversations` table, a bounded batch per
+transaction, into either:
+
+    ARCHIVE_TARGET=table   the archived_conversations table (the default)
+    ARCHIVE_TARGET=files   compressed JSONL segments under ARCHIVE_DIR
+                           (gzip, or zstd with ARCHIVE_COMPRESSION=zstd and
+                           the `zstandard` package)
+
+so the hot table only holds each tenant's retention window regardless of
+uptime. Files are only written when ARCHIVE_DIR is an absolute path (a
+persistent volume); otherwise nothing is archived, since segments in the
+working directory of a host with an ephemeral disk vanish on the next deploy. Leads and usage records keep their business but lose the link to an
+archived conversation.
+
+On Postgres, `conversations` can also be range-partitioned by month on
+started_at (migrations/partition_conversations_postgres.sql); the archiver
+then creates upcoming partitions and drops old ones once they are empty.
+
+Deleting a business works the same way: the business is disabled right away
+and a background job removes its rows in small batches (pausing between
+them so live chats keep getting the database), with progress kept in the
+shared store. Deletions interrupted by a restart are resumed by the archiver.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import func, select, text, update
+from starlette.concurrency import run_in_threadpool
+
+from database import engine, Analytics, Business, Conversation, ArchivedConversation, Lead, MessageUsage, TenantSummary
+from shared_state import store
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", 0))  # 0 keeps transcripts unless a business sets retention_days
+ARCHIVE_TARGET = os.getenv("ARCHIVE_TARGET", "table")
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "")  # Required (absolute, persistent) for ARCHIVE_TARGET=files
+ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "gzip")
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 500))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", 3600))  # Seconds between runs; 0 disables the task
+DELETE_BATCH_SIZE = int(os.getenv("DELETE_BATCH_SIZE", 1000))
+DELETE_BATCH_PAUSE = float(os.getenv("DELETE_BATCH_PAUSE", 0.05))  # Seconds between delete batches
+DELETION_STATUS_TTL = 7 * 24 * 3600
+PARTITION_MONTHS_AHEAD = 3
+MONTHLY_PARTITION = re.compile(r"^conversations_\d{4}_\d{2}$")
+
+
+def delete_in_batches(table, condition, batch_size: int = 1000, pause: float = 0.0, on_batch: Optional[Callable[[int], None]] = None) -> int:
+    """Delete matching rows one batch per transaction so locks stay short; returns rows deleted"""
+    total = 0
+    while True:
+        batch = select(table.c.id).where(condition).limit(batch_size).scalar_subquery()
+        with engine.begin() as conn:
+            deleted = conn.execute(table.delete().where(table.c.id.in_(batch))).rowcount
+        total += deleted
+        if on_batch:
+            on_batch(total)
+        if deleted < batch_size:
+            return total
+        if pause:
+            time.sleep(pause)  # Let other writers in between batches (SQLite has a single writer)
+
+
+def _open_segment(path: str):
+    if ARCHIVE_COMPRESSION == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("ARCHIVE_COMPRESSION=zstd needs the `zstandard` package")
+        return zstandard.open(path, "wt", encoding="utf-8")
+    return gzip.open(path, "wt", encoding="utf-8")
+
+
+def write_segment(rows: list) -> str:
+    """Write conversations to a new compressed JSONL segment; returns its path"""
+    now = datetime.utcnow()
+    directory = os.path.join(ARCHIVE_DIR, "conversations", now.strftime("%Y/%m/%d"))
+    os.makedirs(directory, exist_ok=True)
+    extension = "zst" if ARCHIVE_COMPRESSION == "zstd" else "gz"
+    path = os.path.join(directory, f"{now:%H%M%S}-{rows[0]['id']}-{rows[-1]['id']}.jsonl.{extension}")
+
+    # Written under a temporary name so a crash never leaves a truncated segment behind
+    with _open_segment(path + ".tmp") as f:
+        for row in rows:
+            f.write(json.dumps(dict(row), default=str) + "\n")
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def retention_periods() -> list:
+    """Distinct retention periods (days) in use; businesses that keep everything are left out"""
+    days = func.coalesce(Business.retention_days, RETENTION_DAYS)
+    with engine.connect() as conn:
+        return [d for d in conn.execute(select(days).distinct()).scalars() if d and d > 0]
+
+
+def archive_batch(days: int, cutoff: datetime, batch_size: int) -> int:
+    """Archive and delete one batch of expired conversations for businesses keeping `days`; returns how many were moved"""
+    conversations = Conversation.__table__
+    businesses = select(Business.id).where(func.coalesce(Business.retention_days, RETENTION_DAYS) == days)
+    with engine.begin() as conn:
+        rows = conn.execute(
+            select(conversations)
+            .where(conversations.c.business_id.in_(businesses), conversations.c.last_message_at < cutoff)
+            .order_by(conversations.c.id)
+            .limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            return 0
+
+        ids = [row["id"] for row in rows]
+        if ARCHIVE_TARGET == "table":
+            conn.execute(ArchivedConversation.__table__.insert(), [dict(row, archived_at=datetime.utcnow()) for row in rows])
+        else:
+            # The segment is on disk before the rows are deleted, so a failure can only duplicate, never lose
+            write_segment(rows)
+
+        conn.execute(update(Lead).where(Lead.conversation_id.in_(ids)).values(conversation_id=None))
+        conn.execute(update(MessageUsage).where(MessageUsage.conversation_id.in_(ids)).values(conversation_id=None))
+        conn.execute(conversations.delete().where(conversations.c.id.in_(ids)))
+    return len(rows)
+
+
+def archive_config_error() -> Optional[str]:
+    """Why archiving can't run with the current settings, or None"""
+    if ARCHIVE_TARGET not in ("files", "table"):
+        return f"ARCHIVE_TARGET must be 'files' or 'table', not {ARCHIVE_TARGET!r}"
+    if ARCHIVE_TARGET == "files" and not os.path.isabs(ARCHIVE_DIR):
+        return "ARCHIVE_TARGET=files needs ARCHIVE_DIR set to an absolute path on persistent storage"
+    return None
+
+
+def archive_expired_conversations(now: Optional[datetime] = None, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move every conversation past its business's retention out of the hot table; returns the count"""
+    if archive_config_error():
+        return 0  # Keep everything rather than delete rows with nowhere safe to put them
+    now = now or datetime.utcnow()
+    archived = 0
+    for days in retention_periods():
+        cutoff = now - timedelta(days=days)
+        while True:
+            moved = archive_batch(days, cutoff, batch_size)
+            archived += moved
+            if moved < batch_size:
+                break
+    return archived
+
+
+def is_partitioned() -> bool:
+    if engine.dialect.name != "postgresql":
+        return False
+    with engine.connect() as conn:
+        return bool(conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = 'conversations'"
+        )).scalar())
+
+
+def maintain_partitions(now: Optional[datetime] = None, months_ahead: int = PARTITION_MONTHS_AHEAD) -> dict:
+    """Create the next monthly partitions and drop past ones that archiving has emptied"""
+    if not is_partitioned():
+        return {"ensured": [], "dropped": []}
+
+    now = now or datetime.utcnow()
+    month = datetime(now.year, now.month, 1)
+    ensured, dropped = [], []
+    with engine.begin() as conn:
+        for _ in range(months_ahead + 1):
+            following = datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+            name = f"conversations_{month:%Y_%m}"
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF conversations "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{following:%Y-%m-%d}')"
+            ))
+            ensured.append(name)
+            month = following
+
+        current = f"conversations_{now:%Y_%m}"
+        partitions = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'conversations'"
+        )).scalars().all()
+        for name in partitions:
+            # Only whole past months (conversations_YYYY_MM), and only once nothing is left in them
+            if MONTHLY_PARTITION.match(name) and name < current and not conn.execute(text(f"SELECT 1 FROM {name} LIMIT 1")).scalar():
+                conn.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+    return {"ensured": ensured, "dropped": dropped}
+
+
+def deletion_status(business_id: int) -> Optional[dict]:
+    """Progress of a business deletion, from any worker"""
+    return store.get(f"deletion:{business_id}")
+
+
+def _save_deletion_status(status: dict):
+    store.set(f"deletion:{status['business_id']}", status, ttl=DELETION_STATUS_TTL)
+
+
+def mark_deletion_requested(business_id: int):
+    """Record a queued deletion so its status is visible before the job starts"""
+    status = deletion_status(business_id)
+    if status is None or status["status"] in ("completed", "failed"):
+        _save_deletion_status({"business_id": business_id, "status": "queued", "requested_at": datetime.utcnow().isoformat(), "deleted": {}})
+
+
+def delete_business_data(business_id: int) -> dict:
+    """Delete a disabled business's rows in batches, then the business itself; returns the final status"""
+    status = deletion_status(business_id) or {"business_id": business_id, "requested_at": datetime.utcnow().isoformat(), "deleted": {}}
+    status.update(status="running", started_at=datetime.utcnow().isoformat(), error=None)
+    _save_deletion_status(status)
+
+    # Leads and usage records first (they reference conversations)
+    for table in (Lead.__table__, MessageUsage.__table__, Conversation.__table__, ArchivedConversation.__table__, Analytics.__table__):
+        def progress(total, name=table.name):
+            status["deleted"][name] = total
+            _save_deletion_status(status)
+            store.set(f"deletion:{business_id}:lock", os.getpid(), ttl=600)  # Still alive
+
+        delete_in_batches(table, table.c.business_id == business_id, DELETE_BATCH_SIZE, DELETE_BATCH_PAUSE, on_batch=progress)
+
+    with engine.begin() as conn:
+        conn.execute(TenantSummary.__table__.delete().where(TenantSummary.business_id == business_id))
+        conn.execute(Business.__table__.delete().where(Business.id == business_id))
+    status.update(status="completed", finished_at=datetime.utcnow().isoformat())
+    _save_deletion_status(status)
+    return status
+
+
+async def run_deletion(business_id: int):
+    """Background job for one business; a no-op if another worker is already deleting it"""
+    lock = f"deletion:{business_id}:lock"
+    if not store.add(lock, os.getpid(), ttl=600):
+        return
+    try:
+        status = await run_in_threadpool(delete_business_data, business_id)
+        logger.info("Deleted business %s: %s", business_id, status["deleted"])
+    except Exception as e:
+        logger.exception("Deleting business %s failed", business_id)
+        status = deletion_status(business_id) or {"business_id": business_id, "deleted": {}}
+        status.update(status="failed", error=str(e))
+        _save_deletion_status(status)
+    finally:
+        store.delete(lock)
+
+
+def pending_deletions() -> list:
+    """Businesses whose deletion was requested but never finished (e.g. interrupted by a restart)"""
+    with engine.connect() as conn:
+        return list(conn.execute(select(Business.id).where(Business.deleted_at.is_not(None))).scalars())
+
+
+def run_retention(now: Optional[datetime] = None) -> dict:
+    """One archiver pass: archive expired transcripts, then maintain Postgres partitions"""
+    error = archive_config_error()
+    if error:
+        logger.error("Archiving skipped: %s", error)
+    archived = archive_expired_conversations(now)
+    partitions = maintain_partitions(now)
+    if archived or partitions["dropped"]:
+        logger.info("Archived %d conversations, dropped partitions %s", archived, partitions["dropped"])
+    return {"archived": archived, "target": ARCHIVE_TARGET, "error": error, "partitions": partitions}
+
+
+async def retention_loop(interval: float = ARCHIVE_INTERVAL):
+    """Run the archiver every `interval` seconds; with several workers only one runs each pass"""
+    while True:
+        await asyncio.sleep(interval)
+        if not store.add("retention:lock", os.getpid(), ttl=interval / 2):
+            continue
+        try:
+            await run_in_threadpool(run_retention)
+            for business_id in await run_in_threadpool(pending_deletions):
+                await run_deletion(business_id)
+        except Exception:
+            logger.exception("Retention pass failed")
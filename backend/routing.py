@@ -0,0 +1,113 @@
+"""
+Model routing by request complexity
+
+Quick factual questions ("what time does Oxbow open?") don't need the large
+model or a 1024-token budget. ModelRouter classifies each guest message with
+cheap local heuristics and picks a route (model + max_tokens); businesses can
+override the mapping per route via Business.model_routing.
+"""
+
+import re
+from typing import Dict, Optional, Tuple
+
+DEFAULT_ROUTES = {
+    "simple": {"model": "claude-3-5-haiku-20241022", "max_tokens": 400},
+    "complex": {"model": "claude-sonnet-4-20250514", "max_tokens": 1024},
+}
+
+# USD per million tokens (input, output); cache writes cost 1.25x input, cache reads 0.1x
+MODEL_PRICING = {
+    "claude-sonnet-4-20250514": (3.00, 15.00),
+    "claude-3-5-haiku-20241022": (0.80, 4.00),
+}
+
+COMPLEX_PATTERN = re.compile(
+    r"\b(itinerar\w*|plan(ning)?|schedule|day trip|weekend|\d+\s*(day|night)s?|honeymoon|anniversary|"
+    r"birthday|bachelorette|wedding|proposal|compare|group of|party of|budget|suggest\w*|ideas?)\b",
+    re.IGNORECASE,
+)
+
+SIMPLE_PATTERN = re.compile(
+    r"\b(what time|hours?|open(s|ing)?|close[sd]?|address|where is|located|phone|parking|check[- ]?(in|out)|"
+    r"how far|distance|dress code|dogs?|pets?|wi-?fi|reservations? required|walk-?ins?)\b",
+    re.IGNORECASE,
+)
+
+SIMPLE_MAX_WORDS = 12  # Short messages are simple unless they look like planning
+FACTUAL_MAX_WORDS = 20  # Factual keywords only count as simple up to this length
+COMPLEX_MIN_WORDS = 40
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int, cache_creation_tokens: int = 0, cache_read_tokens: int = 0) -> float:
+    """Estimated USD cost of a call; unknown models are priced like the large model"""
+    input_price, output_price = MODEL_PRICING.get(model, MODEL_PRICING["claude-sonnet-4-20250514"])
+    input_cost = input_tokens + 1.25 * cache_creation_tokens + 0.1 * cache_read_tokens
+    return (input_cost * input_price + output_tokens * output_price) / 1_000_000
+
+
+def classify_message(message: str, history: Optional[list] = None) -> str:
+    """Classify a guest message as "simple" or "complex" """
+    words = len(message.split())
+
+    if COMPLEX_PATTERN.search(message):
+        return "complex"
+    if words >= COMPLEX_MIN_WORDS or message.count("?") > 2:
+        return "complex"
+
+    # A short "yes please" after we offered to build an itinerary is itinerary work
+    if history:
+        last = history[-1]
+        if last.get("role") == "assistant" and "itinerar" in str(last.get("content", "")).lower() and words <= 6:
+            return "complex"
+
+    if words <= SIMPLE_MAX_WORDS or (words <= FACTUAL_MAX_WORDS and SIMPLE_PATTERN.search(message)):
+        return "simple"
+    return "complex"
+
+
+class ModelRouter:
+    """Maps messages to a route's model/max_tokens and keeps per-route latency and cost"""
+
+    def __init__(self, routes: Optional[Dict[str, dict]] = None):
+        self.routes = {name: dict(config) for name, config in (routes or DEFAULT_ROUTES).items()}
+        self._stats: Dict[str, dict] = {}
+
+    def route(self, message: str, history: Optional[list] = None, overrides: Optional[dict] = None) -> Tuple[str, dict]:
+        """Pick a route, applying a business's per-route overrides"""
+        name = classify_message(message, history)
+        if name not in self.routes:
+            name = "complex"
+        config = dict(self.routes[name])
+        if overrides and isinstance(overrides.get(name), dict):
+            config.update({k: v for k, v in overrides[name].items() if k in ("model", "max_tokens")})
+        return name, config
+
+    def record(self, route: str, model: str, latency: float, input_tokens: int = 0, output_tokens: int = 0):
+        """Record one completed call on a route"""
+        stats = self._stats.get(route)
+        if stats is None:
+            stats = self._stats[route] = {"requests": 0, "latency_total": 0.0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0, "models": {}}
+        stats["requests"] += 1
+        stats["latency_total"] += latency
+        stats["input_tokens"] += input_tokens
+        stats["output_tokens"] += output_tokens
+        stats["cost_usd"] += estimate_cost(model, input_tokens, output_tokens)
+        stats["models"][model] = stats["models"].get(model, 0) + 1
+
+    def stats(self) -> dict:
+        """Per-route request counts, average latency, tokens and estimated cost"""
+        return {
+            "routes": self.routes,
+            "usage": {
+                route: {
+                    "requests": s["requests"],
+                    "avg_latency_ms": round(1000 * s["latency_total"] / s["requests"], 1) if s["requests"] else 0.0,
+                    "input_tokens": s["input_tokens"],
+                    "output_tokens": s["output_tokens"],
+                    "cost_usd": round(s["cost_usd"], 4),
+                    "avg_cost_usd": round(s["cost_usd"] / s["requests"], 6) if s["requests"] else 0.0,
+                    "models": s["models"],
+                }
+                for route, s in self._stats.items()
+            },
+        }
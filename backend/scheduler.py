@@ -0,0 +1,158 @@
+"""
+Fair scheduler for outbound LLM calls
+
+Every Claude call goes through a single LLMScheduler. It caps how many calls are
+in flight at once (to stay inside our Anthropic rate limits) and, when that cap
+is reached, queues callers per tenant and dispatches them with start-time fair
+queuing so one busy hotel can't starve everyone else.
+
+Virtual time follows the start tag of the latest granted call, uncontended
+ones included, so a tenant's earlier solo traffic doesn't put it behind
+newcomers once the cap is reached; calls shed as queue-full take no tag.
+"""
+
+import asyncio
+import heapq
+import inspect
+import itertools
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+
+class LLMQueueTimeout(Exception):
+    """Raised when a call waited longer than the queue deadline for a slot"""
+
+
+class LLMQueueFull(Exception):
+    """Raised when a tenant already has too many calls waiting"""
+
+
+class _TenantState:
+    def __init__(self):
+        self.last_finish = 0.0  # Virtual finish time of the tenant's latest call
+        self.queued = 0
+        self.in_flight = 0
+        self.dispatched = 0
+        self.shed = 0
+        self.total_wait = 0.0
+
+
+class LLMScheduler:
+    """Weighted fair queue with a global concurrency cap and queue deadline"""
+
+    def __init__(self, max_concurrency: int = 8, queue_timeout: float = 20.0, max_queue_per_tenant: int = 50):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.max_queue_per_tenant = max_queue_per_tenant
+
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        self._heap: List[list] = []  # [start_tag, seq, tenant_id, future]
+        self._seq = itertools.count()
+        self._tenants: Dict[Any, _TenantState] = {}
+
+    def _tenant(self, tenant_id) -> _TenantState:
+        state = self._tenants.get(tenant_id)
+        if state is None:
+            state = self._tenants[tenant_id] = _TenantState()
+        return state
+
+    def _tag(self, state: _TenantState, weight: float) -> float:
+        """Assign a virtual start tag; heavier weights advance more slowly"""
+        start = max(self._virtual_time, state.last_finish)
+        state.last_finish = start + 1.0 / max(weight, 0.01)
+        return start
+
+    async def acquire(self, tenant_id, weight: float = 1.0):
+        """Wait for an in-flight slot; raises LLMQueueTimeout/LLMQueueFull when shedding"""
+        state = self._tenant(tenant_id)
+        waited_since = time.monotonic()
+
+        if self._in_flight < self.max_concurrency and not self._heap:
+            self._virtual_time = self._tag(state, weight)
+            self._grant(state, waited_since)
+            return
+
+        if state.queued >= self.max_queue_per_tenant:
+            state.shed += 1
+            raise LLMQueueFull(f"Too many queued LLM calls for tenant {tenant_id}")
+
+        start = self._tag(state, weight)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, [start, next(self._seq), tenant_id, future])
+        state.queued += 1
+
+        try:
+            done, _ = await asyncio.wait({future}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # Caller went away; give the slot back if it was granted meanwhile
+            if future.done() and not future.cancelled():
+                self.release(tenant_id)
+            else:
+                future.cancel()
+                state.queued -= 1
+            raise
+
+        if not done:
+            future.cancel()
+            state.queued -= 1
+            state.shed += 1
+            raise LLMQueueTimeout(f"LLM queue deadline of {self.queue_timeout}s expired")
+
+        state.total_wait += time.monotonic() - waited_since
+
+    def _grant(self, state: _TenantState, waited_since: float):
+        self._in_flight += 1
+        state.in_flight += 1
+        state.dispatched += 1
+        state.total_wait += time.monotonic() - waited_since
+
+    def release(self, tenant_id):
+        """Free a slot and hand it to the queued call with the lowest start tag"""
+        self._in_flight -= 1
+        self._tenant(tenant_id).in_flight -= 1
+
+        while self._heap and self._in_flight < self.max_concurrency:
+            start, _, next_tenant, future = heapq.heappop(self._heap)
+            if future.done():
+                continue  # Timed out or cancelled while waiting
+            state = self._tenant(next_tenant)
+            state.queued -= 1
+            self._virtual_time = start
+            self._in_flight += 1
+            state.in_flight += 1
+            state.dispatched += 1
+            future.set_result(None)
+
+    async def run(self, tenant_id, func: Callable, *args, weight: float = 1.0, **kwargs):
+        """Run an LLM call once the scheduler grants a slot (blocking calls go to the threadpool)"""
+        await self.acquire(tenant_id, weight)
+        try:
+            if inspect.iscoroutinefunction(func):
+                return await func(*args, **kwargs)
+            return await run_in_threadpool(func, *args, **kwargs)
+        finally:
+            self.release(tenant_id)
+
+    def stats(self, tenant_id: Optional[Any] = None) -> dict:
+        """Queue depth and throughput counters, overall and per tenant"""
+        tenants = {
+            str(tid): {
+                "queued": s.queued,
+                "in_flight": s.in_flight,
+                "dispatched": s.dispatched,
+                "shed": s.shed,
+                "avg_wait_ms": round(1000 * s.total_wait / s.dispatched, 1) if s.dispatched else 0.0,
+            }
+            for tid, s in self._tenants.items()
+            if tenant_id is None or tid == tenant_id
+        }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queue_timeout_seconds": self.queue_timeout,
+            "in_flight": self._in_flight,
+            "queued": sum(s.queued for s in self._tenants.values()),
+            "tenants": tenants,
+        }
@@ -0,0 +1,111 @@
+"""
+Per-session serialization of chat turns
+
+Two /chat requests for the same session (a guest sending a second message
+before the first is answered, or two tabs) would otherwise both read the
+conversation, both call the LLM and both save, the later commit dropping
+the other's turn. Each turn holds its session's lock from reading the
+conversation until its reply is committed, so turns are appended in order.
+
+    SESSION_LOCKS=local     asyncio locks, per worker process (default)
+    SESSION_LOCKS=advisory  additionally a Postgres advisory lock, so turns
+                            are serialized across workers and hosts
+
+The advisory lock is taken with pg_try_advisory_lock polling on its own
+connection, so waiting never ties up a threadpool thread; it is only
+attempted once the local lock is held, so a worker uses at most one
+connection per busy session. Without Postgres the advisory backend falls
+back to local locks.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+SESSION_LOCKS = os.getenv("SESSION_LOCKS", "local")
+SESSION_LOCK_TIMEOUT = float(os.getenv("SESSION_LOCK_TIMEOUT", 60))  # Seconds a turn waits for the previous one
+ADVISORY_POLL_INTERVAL = 0.05
+BUSY_DETAIL = "The previous message in this conversation is still being answered"
+
+
+def advisory_key(business_id: int, session_id: str) -> int:
+    """Signed 64-bit key for pg_advisory_lock"""
+    digest = hashlib.sha1(f"{business_id}:{session_id}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+class SessionLocks:
+    def __init__(self, backend: str = SESSION_LOCKS, timeout: float = SESSION_LOCK_TIMEOUT):
+        self.engine = engine
+        self.timeout = timeout
+        self.advisory = backend == "advisory" and engine.dialect.name == "postgresql"
+        if backend == "advisory" and not self.advisory:
+            logger.warning("SESSION_LOCKS=advisory needs Postgres; using per-process locks")
+        self._locks: Dict[Tuple[int, str], list] = {}  # key -> [lock, requests holding or waiting]
+        self.waits = 0
+
+    def _try_advisory(self, conn, key: int) -> bool:
+        return bool(conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar())
+
+    def _release_advisory(self, conn, key: int):
+        try:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+        finally:
+            conn.close()
+
+    async def _acquire_advisory(self, key: int, deadline: float):
+        conn = await run_in_threadpool(self.engine.connect)
+        try:
+            while not await run_in_threadpool(self._try_advisory, conn, key):
+                if asyncio.get_running_loop().time() >= deadline:
+                    raise asyncio.TimeoutError
+                await asyncio.sleep(ADVISORY_POLL_INTERVAL)
+        except BaseException:
+            await run_in_threadpool(conn.close)
+            raise
+        return conn
+
+    @asynccontextmanager
+    async def hold(self, business_id: int, session_id: str):
+        """Hold the session's lock; 409 if the previous turn doesn't finish within the timeout"""
+        key = (business_id, session_id)
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        lock = entry[0]
+        if lock.locked():
+            self.waits += 1
+        try:
+            deadline = asyncio.get_running_loop().time() + self.timeout
+            try:
+                await asyncio.wait_for(lock.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=409, detail=BUSY_DETAIL)
+            try:
+                conn = None
+                if self.advisory:
+                    try:
+                        conn = await self._acquire_advisory(advisory_key(business_id, session_id), deadline)
+                    except asyncio.TimeoutError:
+                        raise HTTPException(status_code=409, detail=BUSY_DETAIL)
+                try:
+                    yield
+                finally:
+                    if conn is not None:
+                        await run_in_threadpool(self._release_advisory, conn, advisory_key(business_id, session_id))
+            finally:
+                lock.release()
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
@@ -0,0 +1,207 @@
+"""
+Pluggable key/value store for state shared between worker processes
+
+With several uvicorn workers (WEB_CONCURRENCY > 1) anything kept in a module
+global exists once per process. Values that every worker must agree on
+(the generated admin key, caches, idempotency records, counters) go through
+`store` instead. SHARED_STORE_URL picks the backend:
+
+    memory://                       per-process dict (single worker only)
+    sqlite:////var/run/napa.db      SQLite file shared by workers on one host
+    redis://localhost:6379/0        Redis or any Redis-compatible server
+
+Without SHARED_STORE_URL a single worker uses memory:// and several workers
+share a SQLite file in the temp directory. Values are anything JSON can
+serialize; `ttl` is in seconds.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+
+class MemoryStore:
+    """Process-local store; fine for one worker and for tests"""
+
+    def __init__(self):
+        self._data = {}  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def _live(self, key: str):
+        item = self._data.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.time():
+            del self._data[key]
+            return None
+        return item
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            item = self._live(key)
+            return default if item is None else item[0]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set only if the key is absent; True if this call stored the value"""
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            return True
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Add to a counter, creating it (with ttl) if absent"""
+        with self._lock:
+            item = self._live(key)
+            if item is None:
+                self._data[key] = (amount, time.time() + ttl if ttl else None)
+                return amount
+            self._data[key] = (item[0] + amount, item[1])
+            return item[0] + amount
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class SQLiteStore:
+    """Store in a local SQLite file (WAL mode), shared by every worker on the host"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _purge_expired(self, conn: sqlite3.Connection):
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            conn.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self._connect().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, time.time())
+        ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + ttl if ttl else None)
+        )
+        self._purge_expired(conn)
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set only if the key is absent; True if this call stored the value"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM kv WHERE key = ? AND expires_at IS NOT NULL AND expires_at <= ?", (key, now))
+            added = conn.execute(
+                "INSERT OR IGNORE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now + ttl if ttl else None)
+            ).rowcount == 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Add to a counter, creating it (with ttl) if absent"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM kv WHERE key = ? AND expires_at IS NOT NULL AND expires_at <= ?", (key, now))
+            conn.execute(
+                "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value",
+                (key, amount, now + ttl if ttl else None)
+            )
+            value = conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return int(value)
+
+    def delete(self, key: str):
+        self._connect().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+
+class RedisStore:
+    """Store in Redis (or a compatible server); needs the optional `redis` package"""
+
+    def __init__(self, url: str, prefix: str = "napa:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SHARED_STORE_URL points at Redis but the `redis` package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.client.get(self.prefix + key)
+        return default if value is None else json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set only if the key is absent; True if this call stored the value"""
+        return bool(self.client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000) if ttl else None, nx=True))
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Add to a counter, creating it (with ttl) if absent"""
+        pipe = self.client.pipeline()
+        pipe.incrby(self.prefix + key, amount)
+        if ttl:
+            pipe.pexpire(self.prefix + key, int(ttl * 1000), nx=True)
+        return int(pipe.execute()[0])
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+
+def worker_count() -> int:
+    """Worker processes this deployment runs (uvicorn and gunicorn both read WEB_CONCURRENCY)"""
+    return max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+def create_store(url: Optional[str] = None):
+    """Build the store for SHARED_STORE_URL (or the default for the worker count)"""
+    url = url or os.getenv("SHARED_STORE_URL")
+    if not url:
+        if worker_count() == 1:
+            return MemoryStore()
+        url = "sqlite:///" + os.path.join(tempfile.gettempdir(), "napa_concierge_shared.db")
+
+    if url.startswith("memory://"):
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(url)
+    raise ValueError(f"Unsupported SHARED_STORE_URL: {url}")
+
+
+store = create_store()
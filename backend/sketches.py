@@ -0,0 +1,90 @@
+"""
+Probabilistic sketches for analytics
+
+HyperLogLog counts distinct visitors per (business, day) in a fixed 4 KB of
+registers (about 1.6% standard error) instead of remembering every visitor.
+Sketches for different days merge by taking the register-wise maximum, so a
+30-day unique-visitor count is a merge of 30 stored sketches rather than a
+scan of every conversation. Stored zlib-compressed in Analytics.visitor_sketch;
+small days compress to a few hundred bytes.
+"""
+
+import hashlib
+import math
+import zlib
+from typing import Iterable, Optional
+
+DEFAULT_PRECISION = 12
+
+# 2^-r for every possible register value, so count() is a table lookup per register
+_INVERSE_POWERS = [2.0 ** -r for r in range(65)]
+
+
+def visitor_fingerprint(ip: Optional[str], user_agent: Optional[str]) -> str:
+    """Stable visitor identity from IP and user agent (only its hash ever reaches a sketch)"""
+    return f"{ip or ''}|{user_agent or ''}"
+
+
+class HyperLogLog:
+    """Mergeable distinct counter with 2^precision one-byte registers"""
+
+    def __init__(self, precision: int = DEFAULT_PRECISION, registers: Optional[bytearray] = None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = registers if registers is not None else bytearray(self.size)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def add(self, value: str) -> bool:
+        """Add a value; True if the sketch changed"""
+        hashed = self._hash(value)
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Union another sketch into this one"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        """Estimated number of distinct values added"""
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(_INVERSE_POWERS[r] for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # Linear counting is more accurate for small sets
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        return zlib.compress(bytes([self.precision]) + bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes]) -> "HyperLogLog":
+        """Decode a stored sketch; an empty sketch for None"""
+        if not data:
+            return cls()
+        raw = zlib.decompress(data)
+        return cls(raw[0], bytearray(raw[1:]))
+
+    @classmethod
+    def union(cls, sketches: Iterable[Optional[bytes]]) -> "HyperLogLog":
+        """Merge stored sketches (e.g. one per day) into one"""
+        decoded = [cls.from_bytes(data) for data in sketches if data]
+        if not decoded:
+            return cls()
+        if len({sketch.precision for sketch in decoded}) > 1:
+            raise ValueError("Cannot merge sketches with different precision")
+        if len(decoded) == 1:
+            return decoded[0]
+        # One pass over all sketches at once is much faster than pairwise merges
+        return cls(decoded[0].precision, bytearray(map(max, *(sketch.registers for sketch in decoded))))
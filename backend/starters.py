@@ -0,0 +1,260 @@
+"""
+Starter prompts with pre-generated answers
+
+The widget offers a few one-tap starter questions under its welcome message
+(Business.starter_prompts, or defaults for the business type). Their answers
+are generated in the background with the business's own system prompt and
+kept in the shared store under a hash of that prompt and the questions, so
+changing custom_knowledge, the name or the questions makes fresh answers get
+generated; chips are only offered once their answers are ready.
+
+A chip sends its question as the first message of a conversation. /chat
+answers it from the cache with no LLM call and hands the conversation to
+ConversationWriter, which creates conversations and bumps Analytics in
+batches off the request path, so an instant answer doesn't wait on writes.
+A follow-up that arrives before the next flush calls settle() while holding
+its session lock, which writes that session's buffered turns first (or waits
+for the flush already writing them), so the session still gets one
+conversation. Turns of a failed flush go back into the buffer and are
+retried, up to CONVERSATION_WRITE_ATTEMPTS times.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from collections import Counter, defaultdict, deque
+from datetime import date, datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from shared_state import store
+from sketches import HyperLogLog
+import metrics
+
+logger = logging.getLogger(__name__)
+
+STARTER_MAX = int(os.getenv("STARTER_MAX", 4))
+STARTER_TTL = int(os.getenv("STARTER_TTL", 30 * 24 * 3600))  # Answers are regenerated at least this often (seconds)
+CONVERSATION_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_FLUSH_INTERVAL", 2))
+CONVERSATION_BUFFER_SIZE = int(os.getenv("CONVERSATION_BUFFER_SIZE", 5000))
+CONVERSATION_WRITE_ATTEMPTS = 5  # Flushes a turn is retried in before it's dropped
+
+DEFAULT_STARTERS = {
+    "hotel": [
+        "Plan a first-time wine tasting day for us",
+        "Where should we go for dinner tonight?",
+        "What is there to do besides wine tasting?",
+        "How do we get around without driving?",
+    ],
+    "winery": [
+        "Do I need a reservation for a tasting?",
+        "Which nearby restaurants pair well with a visit?",
+        "What else should we see in the area?",
+        "Plan a relaxed day of tastings around here",
+    ],
+    "restaurant": [
+        "Which wineries are close by for an afternoon visit?",
+        "What can we do before dinner?",
+        "Plan a first-time wine tasting day for us",
+        "How do we get around without driving?",
+    ],
+}
+
+# Answers already read from the store; keyed by content hash, so entries never go stale
+_answers: Dict[tuple, Dict[str, str]] = {}
+_ANSWER_CACHE_SIZE = 4096
+
+
+def normalize(question: str) -> str:
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+def starter_questions(business) -> List[str]:
+    """The business's starter questions, or the defaults for its type"""
+    questions = business.starter_prompts or DEFAULT_STARTERS.get(business.business_type) or DEFAULT_STARTERS["hotel"]
+    return [q.strip() for q in questions if isinstance(q, str) and q.strip()][:STARTER_MAX]
+
+
+def starters_version(system_prompt: str, questions: List[str]) -> str:
+    """Content hash of everything the answers depend on"""
+    return hashlib.sha1("\x00".join([system_prompt, *questions]).encode("utf-8")).hexdigest()[:16]
+
+
+def _key(business_id: int, version: str) -> str:
+    return f"starters:{business_id}:{version}"
+
+
+def cached_answers(business_id: int, version: str) -> Optional[Dict[str, str]]:
+    """Ready answers by normalized question, or None while they haven't been generated"""
+    answers = _answers.get((business_id, version))
+    if answers is None:
+        answers = store.get(_key(business_id, version))
+        if answers is not None:
+            if len(_answers) >= _ANSWER_CACHE_SIZE:
+                _answers.clear()
+            _answers[(business_id, version)] = answers
+    metrics.record_cache("starter_answers", answers is not None)
+    return answers
+
+
+def starter_answer(business_id: int, version: str, message: str) -> Optional[str]:
+    answers = cached_answers(business_id, version)
+    return answers.get(normalize(message)) if answers else None
+
+
+async def generate_answers(business_id: int, version: str, questions: List[str], ask: Callable[[str], Awaitable[str]]) -> bool:
+    """Answer each question with `ask` and cache the set; a no-op if another worker is already on it"""
+    lock = _key(business_id, version) + ":lock"
+    if store.get(_key(business_id, version)) is not None or not store.add(lock, os.getpid(), ttl=300):
+        return False
+    try:
+        answers = {}
+        for question in questions:
+            answers[normalize(question)] = await ask(question)
+    except Exception:
+        # The lock is left to expire, so widget loads don't retry against a failing LLM every time
+        logger.exception("Generating starter answers for business %s failed", business_id)
+        return False
+    store.set(_key(business_id, version), answers, ttl=STARTER_TTL)
+    store.delete(lock)
+    logger.info("Generated %d starter answers for business %s", len(answers), business_id)
+    return True
+
+
+class ConversationWriter:
+    """Buffers LLM-free conversation turns and writes them in batches"""
+
+    def __init__(self, buffer_size: int = CONVERSATION_BUFFER_SIZE):
+        self._buffer: deque = deque()
+        self._buffer_size = buffer_size
+        self._sessions: Counter = Counter()  # (business_id, session_id) of turns buffered or being written
+        self._flush_lock = asyncio.Lock()
+        self.dropped = 0
+
+    def submit(self, business_id: int, session_id: str, messages: list, fingerprint: str,
+               visitor_ip: Optional[str], user_agent: str, referrer: str):
+        """Queue one answered turn; O(1) and never touches the database"""
+        if len(self._buffer) >= self._buffer_size:
+            self._drop([self._buffer.popleft()])
+        self._buffer.append({
+            "business_id": business_id, "session_id": session_id, "messages": messages, "fingerprint": fingerprint,
+            "visitor_ip": visitor_ip, "user_agent": user_agent, "referrer": referrer,
+            "at": datetime.utcnow(), "day": datetime.combine(date.today(), datetime.min.time()), "attempts": 0
+        })
+        self._sessions[(business_id, session_id)] += 1
+
+    def _drop(self, turns: list):
+        self.dropped += len(turns)
+        self._sessions.subtract((t["business_id"], t["session_id"]) for t in turns)
+        self._sessions += Counter()  # Forget sessions with nothing left
+
+    def _requeue(self, turns: list):
+        """Put a failed batch back at the front, oldest first, dropping turns out of attempts or room"""
+        retry, expired = [], []
+        for turn in turns:
+            turn["attempts"] += 1
+            (retry if turn["attempts"] < CONVERSATION_WRITE_ATTEMPTS else expired).append(turn)
+        overflow = max(0, len(retry) + len(self._buffer) - self._buffer_size)
+        expired, retry = expired + retry[:overflow], retry[overflow:]
+        if expired:
+            logger.error("Dropping %d conversation turns that couldn't be written", len(expired))
+            self._drop(expired)
+        self._buffer.extendleft(reversed(retry))
+
+    def _write(self, turns: list):
+        from database import SessionLocal, Analytics, Business, Conversation
+        from reports import invalidate_reports
+
+        db = SessionLocal()
+        try:
+            # A business deleted since these turns were answered gets nothing written back
+            live = {business_id for (business_id,) in db.query(Business.id).filter(
+                Business.id.in_({t["business_id"] for t in turns}), Business.deleted_at.is_(None)
+            )}
+            turns = [t for t in turns if t["business_id"] in live]
+            existing = {
+                (c.business_id, c.session_id): c
+                for c in db.query(Conversation).filter(Conversation.session_id.in_({t["session_id"] for t in turns}))
+            }
+            daily = defaultdict(lambda: {"conversations": 0, "messages": 0, "visitors": []})
+            for turn in turns:
+                day = turn["day"]
+                counts = daily[(turn["business_id"], day)]
+                counts["messages"] += 1
+                conversation = existing.get((turn["business_id"], turn["session_id"]))
+                if conversation is None:
+                    conversation = Conversation(
+                        business_id=turn["business_id"], session_id=turn["session_id"], visitor_ip=turn["visitor_ip"],
+                        user_agent=turn["user_agent"], referrer=turn["referrer"], started_at=turn["at"], message_count=0
+                    )
+                    db.add(conversation)
+                    existing[(turn["business_id"], turn["session_id"])] = conversation
+                    counts["conversations"] += 1
+                    counts["visitors"].append(turn["fingerprint"])
+                elif conversation.last_message_at and conversation.last_message_at < day:
+                    counts["visitors"].append(turn["fingerprint"])
+
+                conversation.message_count = (conversation.message_count or 0) + 1
+                # A /chat reply that landed before this flush already holds the newer transcript
+                if not conversation.last_message_at or conversation.last_message_at <= turn["at"]:
+                    conversation.messages = (conversation.messages or []) + turn["messages"]
+                    conversation.last_message_at = turn["at"]
+
+            for (business_id, day), counts in daily.items():
+                analytics = db.query(Analytics).filter(
+                    Analytics.business_id == business_id, Analytics.date == day
+                ).with_for_update().first()
+                if analytics is None:
+                    analytics = Analytics(business_id=business_id, date=day, total_conversations=0, total_messages=0, unique_visitors=0, leads_captured=0)
+                    db.add(analytics)
+                analytics.total_conversations = (analytics.total_conversations or 0) + counts["conversations"]
+                analytics.total_messages = (analytics.total_messages or 0) + counts["messages"]
+                sketch = HyperLogLog.from_bytes(analytics.visitor_sketch)
+                if any([sketch.add(fingerprint) for fingerprint in counts["visitors"]]):
+                    analytics.visitor_sketch = sketch.to_bytes()
+                    analytics.unique_visitors = sketch.count()
+            db.commit()
+        finally:
+            db.close()
+        for business_id in {business_id for business_id, _ in daily}:
+            invalidate_reports(business_id)
+
+    async def _write_batch(self, turns: list) -> int:
+        try:
+            await run_in_threadpool(self._write, turns)
+        except Exception:
+            self._requeue(turns)
+            raise
+        self._sessions.subtract((t["business_id"], t["session_id"]) for t in turns)
+        self._sessions += Counter()
+        return len(turns)
+
+    async def flush(self) -> int:
+        """Write everything buffered; returns turns written"""
+        async with self._flush_lock:
+            turns = list(self._buffer)
+            self._buffer.clear()
+            return await self._write_batch(turns) if turns else 0
+
+    async def settle(self, business_id: int, session_id: str) -> int:
+        """Write a session's buffered turns now (call holding its session lock, before reading the conversation)"""
+        key = (business_id, session_id)
+        if not self._sessions[key]:
+            return 0  # The usual case: nothing buffered for this session, no waiting
+        async with self._flush_lock:  # A flush already writing them finishes first
+            turns = [t for t in self._buffer if (t["business_id"], t["session_id"]) == key]
+            if not turns:
+                return 0
+            self._buffer = deque(t for t in self._buffer if (t["business_id"], t["session_id"]) != key)
+            return await self._write_batch(turns)
+
+    async def run(self, interval: float = CONVERSATION_FLUSH_INTERVAL):
+        """Background loop started with the app"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Conversation flush failed")
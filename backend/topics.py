@@ -0,0 +1,190 @@
+"""
+Guest message topics for analytics
+
+Messages are classified against a keyword table (wineries, dining, balloons,
+spas, transportation, ...) compiled into one regex. Classification happens
+off the request path: /chat only appends the message to a bounded buffer,
+and a background task periodically classifies the buffer, keeps per
+(business, day) counts in Space-Saving heavy-hitter summaries, and merges
+them into Analytics.top_topics as [{"topic": ..., "count": ...}], most
+frequent first.
+
+Memory stays bounded: the buffer has a fixed size (the oldest messages are
+dropped if the flusher falls behind) and each summary keeps at most
+TOPIC_CAPACITY counters. A batch whose write fails goes back to the front of
+the buffer for the next flush, as far as there is room; messages for a
+business deleted meanwhile are discarded.
+"""
+
+import asyncio
+import logging
+import os
+import re
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+TOPIC_CAPACITY = int(os.getenv("TOPIC_CAPACITY", 20))  # Counters kept per business per day
+TOPIC_FLUSH_INTERVAL = float(os.getenv("TOPIC_FLUSH_INTERVAL", 10))
+TOPIC_BUFFER_SIZE = int(os.getenv("TOPIC_BUFFER_SIZE", 10000))
+
+TOPIC_KEYWORDS = {
+    "wineries": ["winery", "wineries", "wine tasting", "tasting", "tastings", "vineyard", "vineyards", "cabernet", "cab",
+                 "chardonnay", "pinot", "zinfandel", "sparkling", "champagne", "cellar", "sommelier", "wine club"],
+    "dining": ["restaurant", "restaurants", "dinner", "lunch", "brunch", "breakfast", "eat", "food", "reservation",
+               "michelin", "tasting menu", "chef", "cafe", "bakery", "picnic", "oxbow"],
+    "balloons": ["hot air balloon", "balloon", "balloons", "balloon ride"],
+    "spas": ["spa", "spas", "massage", "mud bath", "mud baths", "hot springs", "facial", "wellness"],
+    "transportation": ["uber", "lyft", "taxi", "limo", "limousine", "driver", "shuttle", "car service", "parking",
+                       "drive", "driving", "airport", "sfo", "bike rental", "wine train"],
+    "outdoors": ["hike", "hiking", "trail", "bike", "biking", "cycling", "park", "golf", "kayak", "outdoor"],
+    "lodging": ["hotel", "room", "check-in", "check in", "checkout", "check-out", "pool", "late checkout", "wifi"],
+    "events": ["event", "events", "concert", "festival", "live music", "wedding", "anniversary", "birthday", "proposal"],
+    "shopping": ["shop", "shopping", "boutique", "gift", "souvenir", "market", "olive oil"],
+    "art_culture": ["museum", "gallery", "art", "history", "castle", "castello", "architecture"],
+    "kids_pets": ["kids", "children", "family", "family-friendly", "dog", "dogs", "pet", "pets"],
+}
+
+_KEYWORD_TOPICS = {keyword: topic for topic, keywords in TOPIC_KEYWORDS.items() for keyword in keywords}
+# Longest keywords first so "hot air balloon" wins over "balloon"
+TOPIC_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(k) for k in sorted(_KEYWORD_TOPICS, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+
+
+def classify_topics(message: str) -> List[str]:
+    """Topics a guest message touches on (each at most once)"""
+    topics = []
+    for match in TOPIC_PATTERN.finditer(message):
+        topic = _KEYWORD_TOPICS[match.group(1).lower()]
+        if topic not in topics:
+            topics.append(topic)
+    return topics
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitters: approximate top-k counts in at most `capacity` counters"""
+
+    def __init__(self, capacity: int = TOPIC_CAPACITY):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+
+    def add(self, item: str, count: int = 1):
+        if item in self.counts or len(self.counts) < self.capacity:
+            self.counts[item] = self.counts.get(item, 0) + count
+            return
+        # Replace the smallest counter; its count becomes an overestimate for the new item
+        smallest = min(self.counts, key=self.counts.get)
+        self.counts[item] = self.counts.pop(smallest) + count
+
+    def update(self, items: Iterable[Tuple[str, int]]):
+        for item, count in items:
+            self.add(item, count)
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        return sorted(self.counts.items(), key=lambda kv: (-kv[1], kv[0]))[:n]
+
+
+def merge_top_topics(stored_lists: Iterable[Optional[list]], n: int = 5) -> List[dict]:
+    """Combine stored top_topics lists (e.g. one per day) into the period's top n"""
+    totals: Dict[str, int] = {}
+    for stored in stored_lists:
+        for entry in stored or []:
+            totals[entry["topic"]] = totals.get(entry["topic"], 0) + entry["count"]
+    return [{"topic": topic, "count": count} for topic, count in sorted(totals.items(), key=lambda kv: (-kv[1], kv[0]))[:n]]
+
+
+class TopicTracker:
+    """Buffers guest messages and periodically folds their topics into Analytics.top_topics"""
+
+    def __init__(self, buffer_size: int = TOPIC_BUFFER_SIZE, capacity: int = TOPIC_CAPACITY):
+        self.capacity = capacity
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self.dropped = 0
+
+    def submit(self, business_id: int, day: datetime, message: str):
+        """Queue a message for classification; O(1) and never touches the database"""
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append((business_id, day, message))
+
+    def _summarize(self, messages: list) -> Dict[Tuple[int, datetime], SpaceSaving]:
+        summaries: Dict[Tuple[int, datetime], SpaceSaving] = {}
+        for business_id, day, message in messages:
+            topics = classify_topics(message)
+            if topics:
+                summary = summaries.setdefault((business_id, day), SpaceSaving(self.capacity))
+                for topic in topics:
+                    summary.add(topic)
+        return summaries
+
+    def _requeue(self, messages: list):
+        """Put a failed batch back at the front, oldest first, dropping the oldest if there isn't room"""
+        room = self._buffer.maxlen - len(self._buffer)
+        retry = messages[len(messages) - room:] if room < len(messages) else messages
+        self.dropped += len(messages) - len(retry)
+        self._buffer.extendleft(reversed(retry))
+
+    def _write(self, summaries: Dict[Tuple[int, datetime], SpaceSaving]) -> set:
+        """Merge the summaries into Analytics; returns the businesses written"""
+        from database import SessionLocal, Analytics, Business
+
+        db = SessionLocal()
+        try:
+            # A business deleted since these messages were sent gets nothing written back
+            live = {business_id for (business_id,) in db.query(Business.id).filter(
+                Business.id.in_({business_id for business_id, _ in summaries}), Business.deleted_at.is_(None)
+            )}
+            for (business_id, day), summary in summaries.items():
+                if business_id not in live:
+                    continue
+                analytics = db.query(Analytics).filter(
+                    Analytics.business_id == business_id, Analytics.date == day
+                ).with_for_update().first()
+                if analytics is None:
+                    analytics = Analytics(business_id=business_id, date=day, total_conversations=0, total_messages=0, unique_visitors=0, leads_captured=0)
+                    db.add(analytics)
+
+                merged = SpaceSaving(self.capacity)
+                merged.update((entry["topic"], entry["count"]) for entry in analytics.top_topics or [])
+                merged.update(summary.counts.items())
+                analytics.top_topics = [{"topic": topic, "count": count} for topic, count in merged.top()]
+            db.commit()
+        finally:
+            db.close()
+        return live
+
+    def flush_sync(self) -> int:
+        """Classify everything buffered and write it; returns messages processed"""
+        from reports import invalidate_reports
+
+        messages = []
+        while self._buffer:
+            messages.append(self._buffer.popleft())
+        summaries = self._summarize(messages)
+        if summaries:
+            try:
+                written = self._write(summaries)
+            except Exception:
+                self._requeue(messages)
+                raise
+            for business_id in written:
+                invalidate_reports(business_id)
+        return len(messages)
+
+    async def flush(self) -> int:
+        return await run_in_threadpool(self.flush_sync)
+
+    async def run(self, interval: float = TOPIC_FLUSH_INTERVAL):
+        """Background loop started with the app"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Topic flush failed")
@@ -0,0 +1,199 @@
+"""
+Lightweight request tracing
+
+Spans follow the OpenTelemetry data model (trace/span ids, parent links,
+nanosecond timestamps, typed attributes) and honor incoming W3C `traceparent`
+headers. Finished traces can be exported as OTLP/HTTP JSON to a collector
+(OTEL_EXPORTER_OTLP_ENDPOINT) and/or appended to a JSONL file (TRACE_FILE).
+Stages marked with a timing name are also summarized in a `Server-Timing`
+response header, so a slow answer can be broken down straight from the
+browser's network tab.
+"""
+
+import json
+import logging
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "napa-concierge")
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, root: Optional["Span"] = None, timing: Optional[str] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.root = root or self
+        self.timing = timing  # Server-Timing metric name, if this stage should be summarized
+        self.attributes = {}
+        self.status_error = False
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.children: List["Span"] = []  # Only populated on root spans
+
+    def set_attribute(self, key: str, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> dict:
+        """OTLP/JSON span representation"""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 2 if self.root is self else 1,  # SERVER for the request, INTERNAL for stages
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2 if self.status_error else 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class TraceExporter:
+    """Ships finished traces from a background thread so exporting never blocks a request"""
+
+    def __init__(self, otlp_endpoint: Optional[str] = None, trace_file: Optional[str] = None, max_queue: int = 10000):
+        self.otlp_endpoint = otlp_endpoint.rstrip("/") + "/v1/traces" if otlp_endpoint else None
+        self.trace_file = trace_file
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, daemon=True, name="trace-exporter")
+        self._thread.start()
+
+    def export(self, spans: List[Span]):
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            pass  # Drop traces rather than slow requests down
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 100:
+                try:
+                    batch.append(self._queue.get(timeout=0.5))
+                except queue.Empty:
+                    break
+            spans = [span.to_otlp() for trace in batch for span in trace]
+            try:
+                self._write(spans)
+            except Exception:
+                logger.exception("Trace export failed")
+
+    def _write(self, spans: List[dict]):
+        if self.trace_file:
+            with open(self.trace_file, "a") as f:
+                for span in spans:
+                    f.write(json.dumps(span) + "\n")
+        if self.otlp_endpoint:
+            import httpx
+            httpx.post(self.otlp_endpoint, json={
+                "resourceSpans": [{
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                    "scopeSpans": [{"scope": {"name": "napa_concierge"}, "spans": spans}],
+                }]
+            }, timeout=5)
+
+
+def _configure_exporter() -> Optional[TraceExporter]:
+    endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+    trace_file = os.getenv("TRACE_FILE")
+    if endpoint or trace_file:
+        return TraceExporter(endpoint, trace_file)
+    return None
+
+
+exporter = _configure_exporter()
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes) -> Span:
+    """Start a root span for a request, continuing the caller's trace if given"""
+    match = TRACEPARENT_RE.match(traceparent or "")
+    trace_id, parent_id = (match.group(1), match.group(2)) if match else (secrets.token_hex(16), None)
+    span = Span(name, trace_id, parent_id)
+    span.set_attributes(**attributes)
+    _current_span.set(span)
+    return span
+
+
+def end_trace(span: Span):
+    """Finish a root span and hand the whole trace to the exporter"""
+    span.end()
+    if exporter is not None:
+        exporter.export([span] + span.children)
+
+
+@contextmanager
+def span(name: str, timing: Optional[str] = None, **attributes):
+    """Time a stage as a child of the current span (no-op outside a trace)"""
+    parent = _current_span.get()
+    if parent is None:
+        yield Span(name, "0" * 32)
+        return
+
+    child = Span(name, parent.trace_id, parent.span_id, parent.root, timing)
+    child.set_attributes(**attributes)
+    parent.root.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException:
+        child.status_error = True
+        raise
+    finally:
+        child.end()
+        _current_span.reset(token)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def server_timing(root: Span) -> str:
+    """Server-Timing header value for the stages of a trace"""
+    entries = [f"{child.timing};dur={child.duration_ms:.1f}" for child in root.children if child.timing]
+    entries.append(f"total;dur={root.duration_ms:.1f}")
+    return ", ".join(entries)
+
+
+def traceparent(span: Span) -> str:
+    return f"00-{span.trace_id}-{span.span_id}-01"
@@ -0,0 +1,270 @@
+"""
+Widget asset pipeline
+
+Hotel pages load the widget on every view, so it is served as a tiny loader
+plus content-hashed bundles:
+
+    /widget/loader.js                  draws the chat bubble and fetches the
+                                       widget when a guest reaches for it;
+                                       cached for WIDGET_LOADER_MAX_AGE seconds
+    /widget/assets/widget.<hash>.js    minified widget.js and widget.css,
+    /widget/assets/widget.<hash>.css   cached for a year as immutable
+
+They are built from frontend/ (WIDGET_SOURCE_DIR) on first request and kept
+in memory with gzip (and Brotli, when installed) versions compressed once at
+the highest levels, so requests only pick an encoding. Editing the sources
+changes the hashes on the next deploy and the loader points at the new
+files. `python widget_assets.py --out DIR` writes the same files, with .gz/.br
+siblings and a manifest.json, for a CDN or static host.
+
+The minifiers only drop comments and layout whitespace (no renaming), which
+keeps them safe on hand-written code without a Node toolchain; compression
+does most of the remaining work.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+from starlette.responses import Response
+
+from compression import brotli, choose_encoding
+
+logger = logging.getLogger(__name__)
+
+WIDGET_SOURCE_DIR = os.getenv("WIDGET_SOURCE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend"))
+WIDGET_LOADER_MAX_AGE = int(os.getenv("WIDGET_LOADER_MAX_AGE", 300))  # Seconds pages may use a loader pointing at old bundles
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+CONTENT_TYPES = {".js": "application/javascript; charset=utf-8", ".css": "text/css; charset=utf-8"}
+
+# After these (or at the start) a "/" begins a regex literal rather than a division
+_REGEX_PREFIX_WORDS = {"return", "typeof", "case", "in", "of", "do", "else", "new", "delete", "void", "throw", "instanceof"}
+# A line break after one of these can't end a statement, so it can go
+_JOIN_AFTER = set("{([,;=:?&|*<>!")
+# A line break before one of these never triggers automatic semicolon insertion
+_JOIN_BEFORE = set("})],;.?:")
+_PUNCTUATION = set("{}()[];,:=<>?!&|+-*/%^~.")
+
+
+def _literal_end(source: str, start: int) -> int:
+    """Index just past the string, template or regex literal starting at `start`"""
+    quote = source[start]
+    i, in_class = start + 1, False
+    while i < len(source):
+        c = source[i]
+        if c == "\\":
+            i += 2
+            continue
+        if quote == "/":
+            if c == "[":
+                in_class = True
+            elif c == "]":
+                in_class = False
+            elif c == "/" and not in_class:
+                i += 1
+                while i < len(source) and (source[i].isalnum() or source[i] in "_$"):
+                    i += 1  # Flags
+                return i
+        elif c == quote:
+            return i + 1
+        i += 1
+    raise ValueError(f"Unterminated literal at offset {start}")
+
+
+def _regex_allowed(code: str, after_literal: bool = False) -> bool:
+    """Whether a "/" following `code` (the code since the last literal) starts a regex literal"""
+    code = code.rstrip()
+    if not code:
+        return not after_literal  # Right after a string or regex it's a division
+    if code[-1] in ")]":
+        return False
+    if code[-1].isalnum() or code[-1] in "_$":
+        word = re.search(r"[\w$]+$", code).group(0)
+        return word in _REGEX_PREFIX_WORDS
+    return True
+
+
+def _squeeze_code(code: str) -> str:
+    """Collapse layout whitespace in a run of code (no literals inside)"""
+    code = re.sub(r"[ \t]*\n\s*", "\n", code)
+    code = re.sub(r"[ \t]+", " ", code)
+    out: List[str] = []
+    for i, c in enumerate(code):
+        if c not in " \n":
+            out.append(c)
+            continue
+        before = out[-1] if out else ""
+        after = code[i + 1] if i + 1 < len(code) else ""
+        if not before or not after:
+            out.append(c)  # Decided when the neighbouring run is joined
+            continue
+        if c == " ":
+            joinable = before in _PUNCTUATION or after in _PUNCTUATION
+            if before + after in ("++", "--", "+-", "-+", "//", "/*", "*/"):
+                joinable = False
+        else:
+            joinable = before in _JOIN_AFTER or (after in _JOIN_BEFORE and not (after == "." and before.isdigit()))
+        if not joinable:
+            out.append(c)
+    return "".join(out)
+
+
+def _squeeze_template(template: str) -> str:
+    """Drop the indentation between tags of a multi-line HTML template literal"""
+    template = re.sub(r">\s*\n\s*<", "><", template)
+    return re.sub(r"\s*\n\s*", " ", template)
+
+
+def minify_js(source: str) -> str:
+    """Strip comments and layout whitespace from hand-written JavaScript"""
+    pieces: List[str] = []  # Alternating code runs and literals, code first
+    code: List[str] = []
+    i = 0
+    while i < len(source):
+        c = source[i]
+        if c == "/" and source.startswith("//", i):
+            end = source.find("\n", i)
+            i = len(source) if end == -1 else end
+        elif c == "/" and source.startswith("/*", i):
+            i = source.index("*/", i + 2) + 2
+            code.append(" ")
+        elif c in "'\"`" or (c == "/" and _regex_allowed("".join(code), after_literal=bool(pieces))):
+            end = _literal_end(source, i)
+            literal = source[i:end]
+            pieces.extend(["".join(code), _squeeze_template(literal) if c == "`" else literal])
+            code = []
+            i = end
+        else:
+            code.append(c)
+            i += 1
+    pieces.append("".join(code))
+
+    out = ""
+    for index, piece in enumerate(pieces):
+        if index % 2:
+            out += piece
+            continue
+        # Squeeze with one character of context on each side, so edges next to literals are decided too
+        prefix = out[-1:] if out else ""
+        suffix = pieces[index + 1][:1] if index + 1 < len(pieces) else ""
+        squeezed = _squeeze_code(prefix + piece + suffix)
+        out += squeezed[len(prefix):len(squeezed) - len(suffix)]
+    return out.strip() + "\n"
+
+
+def minify_css(source: str) -> str:
+    """Strip comments and layout whitespace from CSS"""
+    css = re.sub(r"/\*.*?\*/", "", source, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)  # Only after colons; a space before one is a descendant selector
+    return css.replace(";}", "}").strip() + "\n"
+
+
+class Asset:
+    """One built file with its precompressed variants"""
+
+    def __init__(self, name: str, body: bytes, cache_control: str):
+        self.name = name
+        self.body = body
+        self.cache_control = cache_control
+        self.content_type = CONTENT_TYPES[os.path.splitext(name)[1]]
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        self.encoded = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.encoded["br"] = brotli.compress(body, quality=11)
+
+    def response(self, accept_encoding: str = "", if_none_match: Optional[str] = None) -> Response:
+        headers = {"Cache-Control": self.cache_control, "ETag": self.etag, "Vary": "Accept-Encoding"}
+        if if_none_match and self.etag in if_none_match:
+            return Response(status_code=304, headers=headers)
+        encoding = choose_encoding(accept_encoding)
+        if encoding in self.encoded:
+            headers["Content-Encoding"] = encoding
+            return Response(self.encoded[encoding], media_type=self.content_type, headers=headers)
+        return Response(self.body, media_type=self.content_type, headers=headers)
+
+
+def hashed_name(stem: str, body: bytes, extension: str) -> str:
+    return f"{stem}.{hashlib.sha256(body).hexdigest()[:10]}{extension}"
+
+
+def build(source_dir: str = WIDGET_SOURCE_DIR) -> Dict[str, Asset]:
+    """Loader and hashed bundles by path relative to /widget/"""
+    def read(name: str) -> str:
+        with open(os.path.join(source_dir, name), encoding="utf-8") as f:
+            return f.read()
+
+    widget_js = minify_js(read("widget.js")).encode("utf-8")
+    widget_css = minify_css(read("widget.css")).encode("utf-8")
+    js_name, css_name = hashed_name("widget", widget_js, ".js"), hashed_name("widget", widget_css, ".css")
+    loader = minify_js(read("loader.js").replace("__WIDGET_JS__", js_name).replace("__WIDGET_CSS__", css_name)).encode("utf-8")
+
+    return {
+        "loader.js": Asset("loader.js", loader, f"public, max-age={WIDGET_LOADER_MAX_AGE}"),
+        f"assets/{js_name}": Asset(js_name, widget_js, IMMUTABLE),
+        f"assets/{css_name}": Asset(css_name, widget_css, IMMUTABLE),
+    }
+
+
+class WidgetAssets:
+    """Builds the assets once per process, on first use"""
+
+    def __init__(self, source_dir: str = WIDGET_SOURCE_DIR):
+        self.source_dir = source_dir
+        self._assets: Optional[Dict[str, Asset]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def built(self) -> bool:
+        return self._assets is not None
+
+    def get(self, path: str) -> Optional[Asset]:
+        """Asset at a path relative to /widget/, building everything on first call"""
+        if self._assets is None:
+            with self._lock:
+                if self._assets is None:
+                    try:
+                        self._assets = build(self.source_dir)
+                    except OSError:
+                        logger.exception("Widget sources not found in %s", self.source_dir)
+                        self._assets = {}
+                    else:
+                        logger.info("Built widget assets: %s", ", ".join(self._assets))
+        return self._assets.get(path)
+
+
+def write(out_dir: str, source_dir: str = WIDGET_SOURCE_DIR) -> dict:
+    """Write the built assets (and their .gz/.br files) for static hosting; returns the manifest"""
+    assets = build(source_dir)
+    for path, asset in assets.items():
+        target = os.path.join(out_dir, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(asset.body)
+        for encoding, body in asset.encoded.items():
+            with open(target + (".br" if encoding == "br" else ".gz"), "wb") as f:
+                f.write(body)
+    manifest = {
+        path: {"bytes": len(asset.body), **{f"{encoding}_bytes": len(body) for encoding, body in asset.encoded.items()}, "cache_control": asset.cache_control}
+        for path, asset in assets.items()
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the widget loader and hashed bundles for static hosting")
+    parser.add_argument("--out", required=True, help="Output directory (upload its contents under /widget/)")
+    parser.add_argument("--source", default=WIDGET_SOURCE_DIR)
+    args = parser.parse_args()
+    for path, sizes in write(args.out, args.source).items():
+        print(f"{path:<32}{sizes['bytes']:>8} bytes{sizes['gzip_bytes']:>8} gzip")
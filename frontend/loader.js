@@ -0,0 +1,68 @@
+/**
+ * Napa Valley AI Concierge - Widget loader
+ * Draws the chat bubble and fetches the full widget only when a guest reaches for it,
+ * so hotel pages don't pay for the widget on every view.
+ *
+ * Usage: <script src="https://api.your-domain.com/widget/loader.js" data-api-key="nc_xxx" async></script>
+ * Optional: data-api-url (defaults to this script's origin), data-primary-color for the bubble.
+ *
+ * Served by the API (backend/widget_assets.py), which fills in the hashed bundle names below.
+ */
+
+(function() {
+    'use strict';
+
+    var script = document.currentScript;
+    var WIDGET_JS = '__WIDGET_JS__';
+    var WIDGET_CSS = '__WIDGET_CSS__';
+    var requested = false;
+
+    function assetUrl(name) {
+        return new URL('assets/' + name, script.src).href;
+    }
+
+    // Stylesheet and widget bundle, once; the widget replaces the bubble when it starts
+    function loadWidget() {
+        if (requested) return;
+        requested = true;
+
+        var link = document.createElement('link');
+        link.id = 'napa-concierge-styles';
+        link.rel = 'stylesheet';
+        link.href = assetUrl(WIDGET_CSS);
+        document.head.appendChild(link);
+
+        var widget = document.createElement('script');
+        widget.src = assetUrl(WIDGET_JS);
+        widget.setAttribute('data-api-key', script.getAttribute('data-api-key') || '');
+        widget.setAttribute('data-api-url', script.getAttribute('data-api-url') || new URL(script.src).origin);
+        document.head.appendChild(widget);
+    }
+
+    function drawBubble() {
+        var bubble = document.createElement('button');
+        bubble.id = 'napa-concierge-launcher';
+        bubble.setAttribute('aria-label', 'Open chat');
+        bubble.style.cssText = 'position:fixed;bottom:24px;right:24px;width:60px;height:60px;border-radius:50%;border:none;cursor:pointer;' +
+            'display:flex;align-items:center;justify-content:center;z-index:9998;box-shadow:0 4px 24px rgba(0,0,0,.15);background:' +
+            (script.getAttribute('data-primary-color') || '#722F37');
+        bubble.innerHTML = '<svg viewBox="0 0 24 24" width="28" height="28" fill="#fff"><path d="M12 2C6.48 2 2 6.48 2 12c0 1.85.5 3.58 1.36 5.07L2 22l4.93-1.36C8.42 21.5 10.15 22 12 22c5.52 0 10-4.48 10-10S17.52 2 12 2zm-1 15h-2v-2h2v2zm2.07-7.75l-.9.92C11.45 10.9 11 11.5 11 13h-2v-.5c0-1.1.45-2.1 1.17-2.83l1.24-1.26c.37-.36.59-.86.59-1.41 0-1.1-.9-2-2-2s-2 .9-2 2H6c0-2.21 1.79-4 4-4s4 1.79 4 4c0 .88-.36 1.68-.93 2.25z"/></svg>';
+
+        // Start fetching on intent, so the widget is usually ready by the time the click lands
+        bubble.addEventListener('pointerenter', loadWidget);
+        bubble.addEventListener('focus', loadWidget);
+        bubble.addEventListener('click', function() {
+            window.NAPA_CONCIERGE_OPEN = true;
+            bubble.disabled = true;
+            bubble.style.opacity = '0.8';
+            loadWidget();
+        });
+        document.body.appendChild(bubble);
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', drawBubble);
+    } else {
+        drawBubble();
+    }
+})();
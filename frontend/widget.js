@@ -3,6 +3,7 @@
  * Multi-tenant embeddable chat widget with analytics & lead capture
  *
  * Usage: <script src="https://your-domain.com/widget.js" data-api-key="nc_xxx"></script>
+ * (or the lighter loader: <script src="https://api.your-domain.com/widget/loader.js" data-api-key="nc_xxx" async></script>)
  */
 
 (function() {
@@ -24,7 +25,8 @@
         businessName: 'Concierge',
         widgetTitle: 'Concierge',
         widgetSubtitle: 'Your personal wine country guide',
-        welcomeMessage: "Hello! I'm your Napa Valley concierge. How can I help you today?"
+        welcomeMessage: "Hello! I'm your Napa Valley concierge. How can I help you today?",
+        starters: []
     };
 
     let conversationHistory = [];
@@ -33,6 +35,13 @@
     let configLoaded = false;
     let proactiveShown = false;
 
+    // Realtime connection: replies stream in as they're written and staff follow-ups arrive; /chat over HTTP is the fallback
+    let socket = null;
+    let socketConnecting = false;
+    let socketFailures = 0;
+    let pendingTurn = null;
+    const SOCKET_MAX_FAILURES = 3;
+
     // Generate or retrieve session ID
     function getSessionId() {
         if (sessionId) return sessionId;
@@ -41,6 +50,114 @@
         return sessionId;
     }
 
+    // One key per message or form submission; retries reuse it so the server answers only once
+    function newIdempotencyKey() {
+        if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+        return 'nc_' + Date.now().toString(36) + Math.random().toString(36).substr(2, 12);
+    }
+
+    // POST that retries network failures (not HTTP errors) with the same Idempotency-Key
+    async function postWithRetry(path, body, attempts, idempotencyKey) {
+        idempotencyKey = idempotencyKey || newIdempotencyKey();
+        for (let attempt = 1; ; attempt++) {
+            try {
+                return await fetch(`${CONFIG.apiUrl}${path}`, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'X-API-Key': API_KEY,
+                        'Idempotency-Key': idempotencyKey
+                    },
+                    body: JSON.stringify(body)
+                });
+            } catch (error) {
+                if (attempt >= attempts) throw error;
+                await new Promise(function(resolve) { setTimeout(resolve, 500 * attempt); });
+            }
+        }
+    }
+
+    // Open the chat socket in the background; turns use HTTP until it's ready
+    function connectSocket() {
+        if (socket || socketConnecting || !window.WebSocket || socketFailures >= SOCKET_MAX_FAILURES) return;
+        socketConnecting = true;
+        let ws;
+        try {
+            ws = new WebSocket(`${CONFIG.apiUrl.replace(/^http/, 'ws')}/ws/chat?api_key=${encodeURIComponent(API_KEY)}&session_id=${encodeURIComponent(getSessionId())}`);
+        } catch (error) {
+            socketConnecting = false;
+            socketFailures++;
+            return;
+        }
+        const timer = setTimeout(function() { ws.close(); }, 5000);
+
+        ws.onmessage = function(event) {
+            const frame = JSON.parse(event.data);
+            if (frame.type === 'ready') {
+                clearTimeout(timer);
+                socketConnecting = false;
+                socket = ws;
+                socketFailures = 0;
+            } else {
+                handleSocketFrame(frame);
+            }
+        };
+        ws.onclose = function() {
+            clearTimeout(timer);
+            const wasOpen = socket === ws;
+            socket = null;
+            socketConnecting = false;
+            socketFailures++;
+            // A reply that was still on its way is fetched over HTTP with the same key, which replays it
+            if (pendingTurn) pendingTurn.resolve(null);
+            if (wasOpen) setTimeout(connectSocket, 2000);
+        };
+    }
+
+    function handleSocketFrame(frame) {
+        if (frame.type === 'push') {
+            addMessage(frame.content, 'assistant');
+            conversationHistory.push({ role: 'assistant', content: frame.content });
+            return;
+        }
+        const turn = pendingTurn;
+        if (!turn || frame.id !== turn.id) return;
+        if (frame.type === 'delta' || frame.type === 'reset') {
+            turn.text = frame.type === 'delta' ? turn.text + frame.text : '';
+            if (!turn.bubble) {
+                hideTyping();
+                turn.bubble = addMessage('', 'assistant');
+            }
+            turn.bubble.innerHTML = formatMessage(turn.text);
+            turn.bubble.parentNode.scrollTop = turn.bubble.parentNode.scrollHeight;
+        } else if (frame.type === 'message') {
+            turn.resolve(frame);
+        } else if (frame.type === 'error') {
+            turn.reject(new Error(frame.detail));
+        }
+    }
+
+    // One turn over the socket; null when there's no socket or it dropped, so the caller uses HTTP
+    function sendOverSocket(message, id) {
+        if (!socket) {
+            connectSocket();
+            return Promise.resolve(null);
+        }
+        return new Promise(function(resolve, reject) {
+            pendingTurn = { id: id, text: '', bubble: null, resolve: resolve, reject: reject };
+            socket.send(JSON.stringify({ type: 'message', message: message, id: id }));
+        }).then(function(frame) {
+            const bubble = pendingTurn && pendingTurn.bubble;
+            pendingTurn = null;
+            if (!frame && bubble) bubble.remove();
+            return frame && { response: frame.response, session_id: frame.session_id, bubble: bubble };
+        }, function(error) {
+            if (pendingTurn && pendingTurn.bubble) pendingTurn.bubble.remove();
+            pendingTurn = null;
+            throw error;
+        });
+    }
+
     // Load configuration from server
     async function loadConfig() {
         try {
@@ -52,6 +169,7 @@
                 CONFIG.widgetTitle = config.widget_title || CONFIG.widgetTitle;
                 CONFIG.widgetSubtitle = config.widget_subtitle || CONFIG.widgetSubtitle;
                 CONFIG.welcomeMessage = config.welcome_message || CONFIG.welcomeMessage;
+                CONFIG.starters = config.starters || [];
                 configLoaded = true;
                 applyBranding();
             }
@@ -157,308 +275,21 @@
         document.body.appendChild(container);
     }
 
-    // Load CSS (inject inline to avoid external file dependency)
+    // Link the stylesheet (served next to this script, or already added by the loader or the page)
     function loadStyles() {
-        const existingStyle = document.getElementById('napa-concierge-styles');
-        if (existingStyle) return;
-
-        const style = document.createElement('style');
-        style.id = 'napa-concierge-styles';
-        style.textContent = `
-            #napa-concierge-widget {
-                --nc-primary: ${CONFIG.primaryColor};
-                --nc-primary-dark: ${adjustColor(CONFIG.primaryColor, -20)};
-                --nc-secondary: #8B7355;
-                --nc-light: #F5F0EB;
-                --nc-white: #FFFFFF;
-                --nc-text: #333333;
-                --nc-text-light: #666666;
-                --nc-shadow: 0 4px 24px rgba(0, 0, 0, 0.15);
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, sans-serif;
-                font-size: 14px;
-                line-height: 1.5;
-            }
-            #napa-concierge-toggle {
-                position: fixed;
-                bottom: 24px;
-                right: 24px;
-                width: 60px;
-                height: 60px;
-                border-radius: 50%;
-                background: linear-gradient(135deg, var(--nc-primary) 0%, var(--nc-primary-dark) 100%);
-                border: none;
-                cursor: pointer;
-                box-shadow: var(--nc-shadow);
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                transition: transform 0.3s ease, box-shadow 0.3s ease;
-                z-index: 9998;
-            }
-            #napa-concierge-toggle:hover {
-                transform: scale(1.05);
-                box-shadow: 0 6px 32px rgba(0, 0, 0, 0.2);
-            }
-            #napa-concierge-toggle svg {
-                width: 28px;
-                height: 28px;
-                fill: var(--nc-white);
-            }
-            #napa-concierge-chat {
-                position: fixed;
-                bottom: 100px;
-                right: 24px;
-                width: 380px;
-                max-width: calc(100vw - 48px);
-                height: 520px;
-                max-height: calc(100vh - 140px);
-                background: var(--nc-white);
-                border-radius: 16px;
-                box-shadow: var(--nc-shadow);
-                display: none;
-                flex-direction: column;
-                overflow: hidden;
-                z-index: 9999;
-                animation: ncSlideUp 0.3s ease;
-            }
-            #napa-concierge-chat.open { display: flex; }
-            @keyframes ncSlideUp {
-                from { opacity: 0; transform: translateY(20px); }
-                to { opacity: 1; transform: translateY(0); }
-            }
-            #napa-concierge-header {
-                background: linear-gradient(135deg, var(--nc-primary) 0%, var(--nc-primary-dark) 100%);
-                color: var(--nc-white);
-                padding: 16px 20px;
-                display: flex;
-                align-items: center;
-                gap: 12px;
-            }
-            #napa-concierge-header-icon {
-                width: 40px;
-                height: 40px;
-                background: rgba(255, 255, 255, 0.2);
-                border-radius: 50%;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-            }
-            #napa-concierge-header-icon svg {
-                width: 24px;
-                height: 24px;
-                fill: var(--nc-white);
-            }
-            #napa-concierge-header-text h3 {
-                margin: 0;
-                font-size: 16px;
-                font-weight: 600;
-            }
-            #napa-concierge-header-text p {
-                margin: 2px 0 0 0;
-                font-size: 12px;
-                opacity: 0.9;
-            }
-            #napa-concierge-close {
-                margin-left: auto;
-                background: none;
-                border: none;
-                color: var(--nc-white);
-                cursor: pointer;
-                padding: 4px;
-                opacity: 0.8;
-                transition: opacity 0.2s;
-            }
-            #napa-concierge-close:hover { opacity: 1; }
-            #napa-concierge-messages {
-                flex: 1;
-                overflow-y: auto;
-                padding: 16px;
-                background: var(--nc-light);
-                display: flex;
-                flex-direction: column;
-                gap: 12px;
-            }
-            .nc-message {
-                max-width: 85%;
-                padding: 12px 16px;
-                border-radius: 16px;
-                word-wrap: break-word;
-            }
-            .nc-message.assistant {
-                background: var(--nc-white);
-                color: var(--nc-text);
-                align-self: flex-start;
-                border-bottom-left-radius: 4px;
-                box-shadow: 0 1px 3px rgba(0, 0, 0, 0.08);
-            }
-            .nc-message.user {
-                background: var(--nc-primary);
-                color: var(--nc-white);
-                align-self: flex-end;
-                border-bottom-right-radius: 4px;
-            }
-            .nc-message.assistant a {
-                color: var(--nc-primary);
-                text-decoration: underline;
-            }
-            .nc-message.assistant strong { color: var(--nc-primary); }
-            .nc-typing {
-                display: flex;
-                gap: 4px;
-                padding: 12px 16px;
-                background: var(--nc-white);
-                border-radius: 16px;
-                border-bottom-left-radius: 4px;
-                align-self: flex-start;
-                box-shadow: 0 1px 3px rgba(0, 0, 0, 0.08);
-            }
-            .nc-typing span {
-                width: 8px;
-                height: 8px;
-                background: var(--nc-secondary);
-                border-radius: 50%;
-                animation: ncBounce 1.4s infinite ease-in-out;
-            }
-            .nc-typing span:nth-child(1) { animation-delay: -0.32s; }
-            .nc-typing span:nth-child(2) { animation-delay: -0.16s; }
-            @keyframes ncBounce {
-                0%, 80%, 100% { transform: scale(0.8); opacity: 0.5; }
-                40% { transform: scale(1); opacity: 1; }
-            }
-            #napa-concierge-input-area {
-                padding: 12px 16px;
-                background: var(--nc-white);
-                border-top: 1px solid #eee;
-                display: flex;
-                gap: 8px;
-            }
-            #napa-concierge-input {
-                flex: 1;
-                padding: 10px 14px;
-                border: 1px solid #ddd;
-                border-radius: 24px;
-                outline: none;
-                font-size: 14px;
-                transition: border-color 0.2s;
-            }
-            #napa-concierge-input:focus { border-color: var(--nc-primary); }
-            #napa-concierge-send {
-                width: 40px;
-                height: 40px;
-                border-radius: 50%;
-                background: var(--nc-primary);
-                border: none;
-                cursor: pointer;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                transition: background 0.2s;
-            }
-            #napa-concierge-send:hover { background: var(--nc-primary-dark); }
-            #napa-concierge-send:disabled { background: #ccc; cursor: not-allowed; }
-            #napa-concierge-send svg { width: 18px; height: 18px; fill: var(--nc-white); }
-            #napa-concierge-footer {
-                padding: 8px;
-                text-align: center;
-                font-size: 11px;
-                color: var(--nc-text-light);
-                background: var(--nc-white);
-                border-top: 1px solid #eee;
-            }
-            #napa-concierge-footer a { color: var(--nc-primary); text-decoration: none; }
-
-            /* Lead capture form */
-            #napa-concierge-lead-form {
-                position: absolute;
-                bottom: 60px;
-                left: 0;
-                right: 0;
-                background: var(--nc-white);
-                padding: 16px;
-                border-top: 1px solid #eee;
-                box-shadow: 0 -4px 12px rgba(0,0,0,0.1);
-            }
-            .nc-lead-content p { margin: 0 0 12px 0; font-weight: 500; }
-            .nc-lead-content input {
-                width: 100%;
-                padding: 8px 12px;
-                margin-bottom: 8px;
-                border: 1px solid #ddd;
-                border-radius: 8px;
-                font-size: 14px;
-            }
-            .nc-lead-buttons { display: flex; gap: 8px; margin-top: 8px; }
-            .nc-lead-buttons button {
-                flex: 1;
-                padding: 10px;
-                border-radius: 8px;
-                border: none;
-                cursor: pointer;
-                font-size: 14px;
-            }
-            #nc-lead-submit { background: var(--nc-primary); color: white; }
-            #nc-lead-cancel { background: #eee; color: #666; }
-
-            /* Proactive popup */
-            #napa-concierge-proactive {
-                position: fixed;
-                bottom: 94px;
-                right: 24px;
-                background: var(--nc-white);
-                padding: 16px 20px;
-                border-radius: 12px;
-                box-shadow: var(--nc-shadow);
-                max-width: 260px;
-                z-index: 9997;
-                animation: ncFadeIn 0.4s ease;
-            }
-            #napa-concierge-proactive p {
-                margin: 0;
-                font-size: 14px;
-                color: var(--nc-text);
-                line-height: 1.5;
-            }
-            #napa-concierge-proactive-close {
-                position: absolute;
-                top: 8px;
-                right: 12px;
-                font-size: 18px;
-                color: #999;
-                cursor: pointer;
-                line-height: 1;
-            }
-            #napa-concierge-proactive-close:hover { color: #666; }
-            #napa-concierge-proactive::after {
-                content: '';
-                position: absolute;
-                bottom: -8px;
-                right: 28px;
-                width: 0;
-                height: 0;
-                border-left: 8px solid transparent;
-                border-right: 8px solid transparent;
-                border-top: 8px solid var(--nc-white);
-            }
-            @keyframes ncFadeIn {
-                from { opacity: 0; transform: translateY(10px); }
-                to { opacity: 1; transform: translateY(0); }
-            }
-
-            @media (max-width: 480px) {
-                #napa-concierge-chat {
-                    bottom: 0;
-                    right: 0;
-                    width: 100%;
-                    max-width: 100%;
-                    height: 100%;
-                    max-height: 100%;
-                    border-radius: 0;
-                }
-                #napa-concierge-toggle { bottom: 16px; right: 16px; }
-                #napa-concierge-proactive { right: 16px; bottom: 86px; }
-            }
-        `;
-        document.head.appendChild(style);
+        let link = document.getElementById('napa-concierge-styles') || document.querySelector('link[href$="widget.css"]');
+        if (!link) {
+            link = document.createElement('link');
+            link.id = 'napa-concierge-styles';
+            link.rel = 'stylesheet';
+            link.href = new URL('widget.css', scriptTag?.src || document.baseURI).href;
+            document.head.appendChild(link);
+        }
+        if (link.sheet) return Promise.resolve();
+        return new Promise(function(resolve) {
+            link.addEventListener('load', resolve);
+            link.addEventListener('error', resolve);
+        });
     }
 
     // Add message to chat
@@ -475,6 +306,7 @@
 
         messagesContainer.appendChild(messageDiv);
         messagesContainer.scrollTop = messagesContainer.scrollHeight;
+        return messageDiv;
     }
 
     // Markdown formatter for chat messages
@@ -490,6 +322,31 @@
             .replace(/(<br>){3,}/g, '<br><br>');
     }
 
+    // One-tap starter questions (answered from the server's cache, no wait on the AI)
+    function showStarters() {
+        if (!CONFIG.starters.length) return;
+        const messagesContainer = document.getElementById('napa-concierge-messages');
+        const chips = document.createElement('div');
+        chips.className = 'nc-starters';
+        chips.id = 'nc-starters';
+        CONFIG.starters.forEach(function(question) {
+            const chip = document.createElement('button');
+            chip.className = 'nc-starter';
+            chip.textContent = question;
+            chip.addEventListener('click', function() {
+                sendMessage(question);
+            });
+            chips.appendChild(chip);
+        });
+        messagesContainer.appendChild(chips);
+        messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    }
+
+    function hideStarters() {
+        const chips = document.getElementById('nc-starters');
+        if (chips) chips.remove();
+    }
+
     // Show typing indicator
     function showTyping() {
         const messagesContainer = document.getElementById('napa-concierge-messages');
@@ -517,32 +374,37 @@
         sendButton.disabled = true;
         input.value = '';
 
+        hideStarters();
         addMessage(message, 'user');
         showTyping();
 
         try {
-            const response = await fetch(`${CONFIG.apiUrl}/chat`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-API-Key': API_KEY
-                },
-                body: JSON.stringify({
+            const idempotencyKey = newIdempotencyKey();
+            let data = await sendOverSocket(message, idempotencyKey);
+
+            if (data) {
+                conversationHistory.push({ role: 'user', content: message }, { role: 'assistant', content: data.response });
+            } else {
+                const response = await postWithRetry('/chat', {
                     message: message,
                     conversation_history: conversationHistory,
                     session_id: getSessionId()
-                })
-            });
+                }, 3, idempotencyKey);
 
-            if (!response.ok) {
-                throw new Error('Failed to get response');
-            }
+                if (!response.ok) {
+                    throw new Error('Failed to get response');
+                }
 
-            const data = await response.json();
+                data = await response.json();
+                conversationHistory = data.conversation_history;
+            }
 
             hideTyping();
-            addMessage(data.response, 'assistant');
-            conversationHistory = data.conversation_history;
+            if (data.bubble) {
+                data.bubble.innerHTML = formatMessage(data.response);
+            } else {
+                addMessage(data.response, 'assistant');
+            }
             sessionId = data.session_id;
 
             // Check if AI mentioned contact/follow-up to show lead form
@@ -582,34 +444,37 @@
             return;
         }
 
+        const submitButton = document.getElementById('nc-lead-submit');
+        if (submitButton.disabled) return;
+        submitButton.disabled = true;
+
         try {
-            await fetch(`${CONFIG.apiUrl}/lead`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-API-Key': API_KEY
-                },
-                body: JSON.stringify({
-                    session_id: getSessionId(),
-                    name: name,
-                    email: email,
-                    phone: phone,
-                    interest: 'Chat inquiry'
-                })
-            });
+            await postWithRetry('/lead', {
+                session_id: getSessionId(),
+                name: name,
+                email: email,
+                phone: phone,
+                interest: 'Chat inquiry'
+            }, 3);
 
             hideLeadForm();
             addMessage("Thanks! Someone from our team will be in touch soon.", 'assistant');
         } catch (error) {
             console.error('Lead capture error:', error);
             alert('Sorry, there was an error. Please try again.');
+        } finally {
+            submitButton.disabled = false;
         }
     }
 
     // Initialize widget
     async function init() {
-        loadStyles();
+        const stylesLoaded = loadStyles();
         createWidget();
+        // Kept invisible until styled, so the markup never flashes unstyled on the page
+        const container = document.getElementById('napa-concierge-widget');
+        container.style.visibility = 'hidden';
+        stylesLoaded.then(function() { container.style.visibility = ''; });
         await loadConfig();
         applyBranding();
 
@@ -628,9 +493,11 @@
             const proactive = document.getElementById('napa-concierge-proactive');
             if (proactive) proactive.style.display = 'none';
 
-            if (conversationHistory.length === 0) {
+            if (conversationHistory.length === 0 && !document.querySelector('#napa-concierge-messages .nc-message')) {
                 addMessage(CONFIG.welcomeMessage, 'assistant');
+                showStarters();
             }
+            connectSocket();
 
             input.focus();
         });
@@ -657,6 +524,11 @@
         document.getElementById('nc-lead-submit').addEventListener('click', submitLead);
         document.getElementById('nc-lead-cancel').addEventListener('click', hideLeadForm);
 
+        // Loaded by loader.js: take over from its placeholder bubble, opening the chat if that's what was clicked
+        const launcher = document.getElementById('napa-concierge-launcher');
+        if (launcher) launcher.remove();
+        if (window.NAPA_CONCIERGE_OPEN) toggle.click();
+
         // Proactive popup - show after 10 seconds if chat not opened
         const proactive = document.getElementById('napa-concierge-proactive');
         const proactiveClose = document.getElementById('napa-concierge-proactive-close');